@@ -30,6 +30,13 @@ API_SERVICE_OPTS = [
                default=1000,
                help='The maximum number of items returned in a single '
                     'response from a collection resource.'),
+    cfg.StrOpt('marker_secret',
+               default=None,
+               secret=True,
+               help='Key signing the pagination markers of collection '
+                    'resources. Must be shared by all API workers behind a '
+                    'load balancer. Defaults to a key derived from the '
+                    'database connection.'),
 ]
 
 CONF = cfg.CONF
@@ -19,6 +19,7 @@ from bricks.api.controllers.v1 import brick
 from bricks.api.controllers.v1 import brickconfig
 from bricks.api.controllers.v1 import configfile
 from bricks.api.controllers.v1 import link
+from bricks.api.controllers.v1 import metrics
 
 
 class MediaType(base.APIBase):
@@ -97,6 +98,7 @@ class Controller(rest.RestController):
     brickconfigs = brickconfig.BrickConfigController()
     bricks = brick.BrickController()
     configfiles = configfile.ConfigFileController()
+    metrics = metrics.MetricsController()
 
     @wsme_pecan.wsexpose(V1)
     def get(self):
@@ -34,6 +34,11 @@ def check_policy(context, action, target_obj=None):
     policy.enforce(context, _action, target)
 
 
+# the fields of bricks in collections that are not expanded
+BRICK_SUMMARY_FIELDS = ['uuid', 'brickconfig_uuid', 'deployed_at',
+                        'instance_id', 'tenant_id', 'status']
+
+
 class BrickPatchType(types.JsonPatchType):
 
     @staticmethod
@@ -72,12 +77,11 @@ class Brick(base.APIBase):
 
     @classmethod
     def convert_with_links(cls, rpc_brick, expand=True):
-        brick = Brick(**rpc_brick.as_dict())
-
-        if not expand:
-            brick.unset_fields_except(['uuid', 'brickconfig_uuid',
-                                       'deployed_at', 'instance_id',
-                                       'tenant_id', 'status'])
+        if expand:
+            brick = Brick(**rpc_brick.as_dict())
+        else:
+            brick = Brick(**rpc_brick.as_dict(BRICK_SUMMARY_FIELDS))
+            brick.unset_fields_except(BRICK_SUMMARY_FIELDS)
         brick.links = [
             link.Link.make_link('self',
                                 pecan.request.host_url,
@@ -101,6 +105,82 @@ class BrickLog(base.APIBase):
             setattr(self, k, kwargs.get(k))
 
 
+class BrickHealth(base.APIBase):
+    """API representation of the last health check of a brick."""
+
+    instance_id = wtypes.text
+    host = wtypes.text
+    domain_state = wtypes.text
+    channel = types.boolean
+    occupant = types.boolean
+    checked_at = datetime
+
+    def __init__(self, **kwargs):
+        self.fields = objects.BrickHealth.fields.keys()
+        for k in self.fields:
+            setattr(self, k, kwargs.get(k))
+
+
+class BrickStatsSample(base.APIBase):
+    """API representation of a brick's average usage over one period."""
+
+    timestamp = datetime
+    cpu = float
+    mem_used = float
+    mem_total = float
+    disk_read = float
+    disk_write = float
+    net_rx = float
+    net_tx = float
+
+    def __init__(self, **kwargs):
+        self.fields = ['timestamp'] + list(objects.BrickStats.STATS_FIELDS)
+        for k in self.fields:
+            setattr(self, k, kwargs.get(k))
+
+
+class BrickStats(base.APIBase):
+    """API representation of a brick's resource usage history."""
+
+    uuid = types.uuid
+    instance_id = wtypes.text
+    resolution = int
+    "Seconds covered by each sample"
+
+    samples = [BrickStatsSample]
+
+    @classmethod
+    def convert(cls, rpc_brick, resolution, rpc_stats):
+        stats = BrickStats()
+        stats.uuid = rpc_brick.uuid
+        stats.instance_id = rpc_brick.instance_id
+        stats.resolution = resolution
+        stats.samples = [BrickStatsSample(**s.as_dict()) for s in rpc_stats]
+        return stats
+
+
+class BrickSummary(base.APIBase):
+    """API representation of the number of bricks per value of a field."""
+
+    group_by = wtypes.text
+    "The field bricks are counted by"
+
+    total = int
+
+    counts = {wtypes.text: int}
+    "Bricks per value, bricks without a value only count to the total"
+
+    @classmethod
+    def convert(cls, group_by, counts):
+        summary = BrickSummary()
+        summary.group_by = group_by
+        summary.total = sum(counts.values())
+        summary.counts = dict((value, count)
+                              for value, count in counts.items()
+                              if value is not None)
+        return summary
+
+
 class BricksCollection(collection.Collection):
     """API representation of a collection of Bricks."""
 
@@ -117,7 +197,11 @@ class BricksCollection(collection.Collection):
         collection.bricks = [Brick.convert_with_links(br, expand)
                              for br in brick]
         url = url or None
-        collection.next = collection.get_next(limit, url=url, **kwargs)
+        marker = None
+        if len(brick):
+            marker = api_utils.encode_marker(brick[-1], kwargs['sort_key'])
+        collection.next = collection.get_next(limit, url=url, marker=marker,
+                                              **kwargs)
         return collection
 
 
@@ -127,7 +211,10 @@ class BrickController(rest.RestController):
     _custom_actions = {
         'detail': ['GET'],
         'brick_log': ['GET'],
+        'health': ['GET'],
+        'stats': ['GET'],
         'status_update': ['POST'],
+        'summary': ['GET'],
     }
 
     def _get_brick_collection(self, tenant_id, brickconfig_uuid,
@@ -149,11 +236,9 @@ class BrickController(rest.RestController):
 
         limit = api_utils.validate_limit(limit)
         sort_dir = api_utils.validate_sort_dir(sort_dir)
-        marker_obj = None
+        marker_obj = api_utils.get_marker(objects.Brick, ctx, marker,
+                                          sort_key)
 
-        if marker:
-            marker_obj = objects.Brick.get_by_uuid(pecan.request.context,
-                                                   marker)
         if brickconfig_uuid:
             filters['brickconfig_uuid'] = brickconfig_uuid
         if instance_id:
@@ -165,14 +250,16 @@ class BrickController(rest.RestController):
             filters, limit, marker_obj, sort_key=sort_key,
             sort_dir=sort_dir)
 
+        # the next link keeps the filters of this page
         return BricksCollection.convert_with_links(bricks, limit,
                                                    url=resource_url,
                                                    expand=expand,
                                                    sort_key=sort_key,
-                                                   sort_dir=sort_dir)
+                                                   sort_dir=sort_dir,
+                                                   **filters)
 
     @wsme_pecan.wsexpose(BricksCollection, wtypes.text, types.uuid,
-                         wtypes.text, wtypes.text, types.uuid, int,
+                         wtypes.text, wtypes.text, wtypes.text, int,
                          wtypes.text, wtypes.text)
     def get_all(self, tenant_id=None, brickconfig_uuid=None,
                 instance_id=None, status=None, marker=None, limit=None,
@@ -194,7 +281,7 @@ class BrickController(rest.RestController):
             sort_key, sort_dir)
 
     @wsme_pecan.wsexpose(BricksCollection, wtypes.text, types.uuid,
-                         wtypes.text, wtypes.text, types.uuid, int,
+                         wtypes.text, wtypes.text, wtypes.text, int,
                          wtypes.text, wtypes.text)
     def detail(self, tenant_id=None, brickconfig_uuid=None,
                instance_id=None, status=None, marker=None, limit=None,
@@ -218,6 +305,27 @@ class BrickController(rest.RestController):
             tenant_id, brickconfig_uuid, instance_id, status, marker,
             limit, sort_key, sort_dir, expand, resource_url)
 
+    @wsme_pecan.wsexpose(BrickSummary, wtypes.text, wtypes.text)
+    def summary(self, group_by='status', tenant_id=None):
+        """Count the bricks by status, tenant or brickconfig.
+
+        :param group_by: status, tenant_id or brickconfig_uuid. Default:
+                         status.
+        :param tenant_id: only count the bricks of this tenant.
+        """
+        check_policy(pecan.request.context, 'get_all')
+        ctx = pecan.request.context
+        if not ctx.is_admin and not tenant_id == ctx.tenant_id:
+            # only admins can count bricks beyond their own tenant.
+            raise exception.NotAuthorized()
+
+        filters = {}
+        if tenant_id:
+            filters['tenant_id'] = tenant_id
+
+        counts = pecan.request.dbapi.get_brick_counts(group_by, filters)
+        return BrickSummary.convert(group_by, counts)
+
     @wsme_pecan.wsexpose(Brick, types.uuid)
     def get_one(self, brick_uuid):
         """Retrieve information about the given brick.
@@ -251,6 +359,42 @@ class BrickController(rest.RestController):
                                                      length=length)
         return BrickLog(**log.as_dict())
 
+    @wsme_pecan.wsexpose(BrickHealth, types.uuid)
+    def get_health(self, brick_uuid):
+        """Retrieve the last health check mortar reported for a brick.
+
+        :param brick_uuid: (uuid) a brick's identifier
+        """
+        check_policy(pecan.request.context, 'get_one')
+        req_ctx = pecan.request.context
+        tenant_id = req_ctx.tenant_id if not req_ctx.is_admin else None
+        rpc_brick = objects.Brick.get_by_uuid(pecan.request.context,
+                                              brick_uuid, tenant_id=tenant_id)
+
+        health = pecan.request.dbapi.get_brick_health(rpc_brick.instance_id)
+        return BrickHealth(**health.as_dict())
+
+    @wsme_pecan.wsexpose(BrickStats, types.uuid,
+                         wtypes.IntegerType(minimum=1))
+    def get_stats(self, brick_uuid, resolution=None):
+        """Retrieve the resource usage history of a brick.
+
+        :param brick_uuid: (uuid) a brick's identifier
+        :param resolution: (int) seconds per sample, one of the conductor's
+                           stats_archives. Default: the finest archive.
+        """
+        check_policy(pecan.request.context, 'get_one')
+        req_ctx = pecan.request.context
+        tenant_id = req_ctx.tenant_id if not req_ctx.is_admin else None
+        rpc_brick = objects.Brick.get_by_uuid(pecan.request.context,
+                                              brick_uuid, tenant_id=tenant_id)
+
+        rpc_stats = pecan.request.dbapi.get_brick_stats(
+            rpc_brick.instance_id, resolution=resolution)
+        if rpc_stats:
+            resolution = rpc_stats[0].resolution
+        return BrickStats.convert(rpc_brick, resolution, rpc_stats)
+
     @wsme_pecan.wsexpose(Brick, body=Brick, status_code=201)
     def post(self, brick):
         """Create a new brick.
@@ -31,6 +31,21 @@ def check_policy(context, action, target_obj=None):
     policy.enforce(context, _action, target)
 
 
+# the fields of brickconfigs in collections that are not expanded
+BRICKCONFIG_SUMMARY_FIELDS = ['uuid', 'version', 'name', 'tag',
+                              'description', 'app_version', 'created_at',
+                              'updated_at', 'logo']
+
+# updated_at only counts seconds on MySQL, so the ETag of a brickconfig
+# hashes its contents too.
+BRICKCONFIG_ETAG_FIELDS = sorted(set(objects.BrickConfig.fields) -
+                                 set(['created_at', 'updated_at']))
+
+
+def _brickconfig_etag(rpc_brickconfig, fields=BRICKCONFIG_ETAG_FIELDS):
+    return api_utils.object_etag(rpc_brickconfig, *fields)
+
+
 class BrickConfigPatchType(types.JsonPatchType):
 
     @staticmethod
@@ -75,11 +90,12 @@ class BrickConfig(base.APIBase):
 
     @classmethod
     def convert_with_links(cls, rpc_brickconfig, expand=True):
-        brickconfig = BrickConfig(**rpc_brickconfig.as_dict())
-        if not expand:
-            brickconfig.unset_fields_except([
-                'uuid', 'version', 'name', 'tag', 'description',
-                'app_version', 'created_at', 'updated_at', 'logo'])
+        if expand:
+            brickconfig = BrickConfig(**rpc_brickconfig.as_dict())
+        else:
+            brickconfig = BrickConfig(
+                **rpc_brickconfig.as_dict(BRICKCONFIG_SUMMARY_FIELDS))
+            brickconfig.unset_fields_except(BRICKCONFIG_SUMMARY_FIELDS)
 
         # never expose the node_id attribute
         brickconfig.node_id = wtypes.Unset
@@ -121,7 +137,12 @@ class BrickConfigCollection(collection.Collection):
         collection = BrickConfigCollection()
         collection.brickconfigs = [BrickConfig.convert_with_links(bc, expand)
                                    for bc in rpc_brickconfigs]
-        collection.next = collection.get_next(limit, url=url, **kwargs)
+        marker = None
+        if len(rpc_brickconfigs):
+            marker = api_utils.encode_marker(rpc_brickconfigs[-1],
+                                             kwargs['sort_key'])
+        collection.next = collection.get_next(limit, url=url, marker=marker,
+                                              **kwargs)
         return collection
 
     @classmethod
@@ -145,10 +166,8 @@ class BrickConfigController(rest.RestController):
         limit = api_utils.validate_limit(limit)
         sort_dir = api_utils.validate_sort_dir(sort_dir)
 
-        marker_obj = None
-        if marker:
-            marker_obj = objects.BrickConfig.get_by_uuid(
-                pecan.request.context, marker)
+        marker_obj = api_utils.get_marker(
+            objects.BrickConfig, pecan.request.context, marker, sort_key)
 
         filters = {}
 
@@ -174,12 +193,22 @@ class BrickConfigController(rest.RestController):
             filters, limit, marker_obj, sort_key=sort_key,
             sort_dir=sort_dir)
 
+        # summaries are tagged by the fields they show, not to load the
+        # lazy ones of every brickconfig
+        fields = BRICKCONFIG_ETAG_FIELDS
+        if not expand:
+            fields = BRICKCONFIG_SUMMARY_FIELDS
+        api_utils.check_not_modified(api_utils.etag(
+            *[_brickconfig_etag(bc, fields) for bc in brickconfigs]))
+
+        # the next link keeps the filters of this page
         return BrickConfigCollection.convert_with_links(
             brickconfigs, limit, url=resource_url, expand=expand,
-            sort_key=sort_key, sort_dir=sort_dir)
+            sort_key=sort_key, sort_dir=sort_dir, **filters)
 
     @wsme_pecan.wsexpose(BrickConfigCollection, wtypes.text, wtypes.text,
-                         types.boolean, types.uuid, int, wtypes.text, wtypes.text)
+                         types.boolean, wtypes.text, int, wtypes.text,
+                         wtypes.text)
     def get_all(self, tenant_id=None, tag=None, is_public=None, marker=None,
                 limit=None, sort_key='id', sort_dir='asc'):
         """Retrieve a list of brickconfigs.
@@ -194,10 +223,12 @@ class BrickConfigController(rest.RestController):
         """
         check_policy(pecan.request.context, 'get_all')
         return self._get_brickconfigs_collection(tenant_id, tag, is_public,
-                                                 marker, limit, sort_key, sort_dir)
+                                                 marker, limit, sort_key,
+                                                 sort_dir)
 
     @wsme_pecan.wsexpose(BrickConfigCollection, wtypes.text, wtypes.text,
-                         types.boolean, types.uuid, int, wtypes.text, wtypes.text)
+                         types.boolean, wtypes.text, int, wtypes.text,
+                         wtypes.text)
     def detail(self, tenant_id=None, tag=None, is_public=None, marker=None,
                limit=None, sort_key='id', sort_dir='asc'):
         """Retrieve a list of brickconfigs with detail.
@@ -219,19 +250,23 @@ class BrickConfigController(rest.RestController):
         expand = True
         resource_url = '/'.join(['brickconfigs', 'detail'])
         return self._get_brickconfigs_collection(tenant_id, tag, is_public,
-                                                 marker, limit, sort_key, sort_dir,
-                                                 expand, resource_url)
+                                                 marker, limit, sort_key,
+                                                 sort_dir, expand,
+                                                 resource_url)
 
     @wsme_pecan.wsexpose(BrickConfig, types.uuid)
     def get_one(self, brickconfig_uuid):
         """Retrieve information about the given bc.
 
+        Answers 304 Not Modified when If-None-Match holds its ETag.
+
         :param brickconfig_uuid: UUID of a bc.
         """
         check_policy(pecan.request.context, 'get_one')
 
         rpc_brickconfig = objects.BrickConfig.get_by_uuid(
             pecan.request.context, brickconfig_uuid)
+        api_utils.check_not_modified(_brickconfig_etag(rpc_brickconfig))
         return BrickConfig.convert_with_links(rpc_brickconfig)
 
     @wsme_pecan.wsexpose(BrickConfig, body=BrickConfig, status_code=201)
@@ -248,6 +283,7 @@ class BrickConfigController(rest.RestController):
         except Exception as e:
             with excutils.save_and_reraise_exception():
                 LOG.exception(e)
+        pecan.response.etag = _brickconfig_etag(new_bc)
         return BrickConfig.convert_with_links(new_bc)
 
     @wsme.validate(types.uuid, [BrickConfigPatchType])
@@ -255,13 +291,19 @@ class BrickConfigController(rest.RestController):
     def patch(self, brickconfig_uuid, patch):
         """Update an existing bc.
 
+        Fails with 412 Precondition Failed when If-Match does not hold
+        its ETag, or the bc changes before the update is made.
+
         :param brickconfig_uuid: UUID of a bc.
         :param patch: a json PATCH document to apply to this bc.
         """
         check_policy(pecan.request.context, 'update')
 
-        rpc_brickconfig = objects.BrickConfig.get_by_uuid(
-            pecan.request.context, brickconfig_uuid)
+        with pecan.request.dbapi.primary_reads():
+            rpc_brickconfig = objects.BrickConfig.get_by_uuid(
+                pecan.request.context, brickconfig_uuid)
+        api_utils.check_if_match(_brickconfig_etag(rpc_brickconfig))
+        expected = {'updated_at': rpc_brickconfig.updated_at}
         try:
             bc = BrickConfig(**jsonpatch.apply_patch(
                 rpc_brickconfig.as_dict(), jsonpatch.JsonPatch(patch)))
@@ -273,7 +315,8 @@ class BrickConfigController(rest.RestController):
             if rpc_brickconfig[field] != getattr(bc, field):
                 rpc_brickconfig[field] = getattr(bc, field)
 
-        rpc_brickconfig.save()
+        rpc_brickconfig.save(expected=expected)
+        pecan.response.etag = _brickconfig_etag(rpc_brickconfig)
         return BrickConfig.convert_with_links(rpc_brickconfig)
 
     @wsme_pecan.wsexpose(None, types.uuid, status_code=204)
@@ -1,4 +1,6 @@
 import pecan
+import six
+from six.moves.urllib import parse
 from wsme import types as wtypes
 
 from bricks.api.controllers.v1 import base
@@ -18,17 +20,23 @@ class Collection(base.APIBase):
         """Return whether collection has more items."""
         return len(self.collection) and len(self.collection) == limit
 
-    def get_next(self, limit, url=None, **kwargs):
-        """Return a link to the next subset of the collection."""
+    def get_next(self, limit, url=None, marker=None, **kwargs):
+        """Return a link to the next subset of the collection.
+
+        :param marker: marker of the next subset, the uuid of the last item
+                       of this one if not given.
+        :param kwargs: query arguments of the link, filters and sorting.
+        """
         if not self.has_next(limit):
             return wtypes.Unset
 
         resource_url = url or self._type
-        q_args = ''.join(['%s=%s&' % (key, kwargs[key]) for key in kwargs])
-        next_args = '?%(args)slimit=%(limit)d&marker=%(marker)s' % {
-            'args': q_args,
-            'limit': limit,
-            'marker': self.collection[-1].uuid}
+        q_args = sorted(kwargs.items())
+        q_args.append(('limit', limit))
+        q_args.append(('marker', marker or self.collection[-1].uuid))
+        next_args = '?' + parse.urlencode(
+            [(key, six.text_type(value).encode('utf-8'))
+             for key, value in q_args])
 
         return link.Link.make_link('next', pecan.request.host_url,
                                    resource_url, next_args).href
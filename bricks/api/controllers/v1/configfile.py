@@ -31,8 +31,27 @@ def check_policy(context, action, target_obj=None):
     policy.enforce(context, _action, target)
 
 
+# the fields of configfiles in collections that are not expanded
+CONFIGFILE_SUMMARY_FIELDS = ['uuid', 'brickconfig_uuid', 'name',
+                             'description', 'contents_sha256']
+
+
+# updated_at only counts seconds on MySQL, so the ETag of a configfile
+# hashes every field a PATCH can change, contents by their digest.
+CONFIGFILE_ETAG_FIELDS = ['brickconfig_uuid', 'contents_sha256',
+                          'description', 'name']
+
+
+def _configfile_etag(rpc_configfile):
+    return api_utils.object_etag(rpc_configfile, *CONFIGFILE_ETAG_FIELDS)
+
+
 class ConfigFilePatchType(types.JsonPatchType):
-    pass
+
+    @staticmethod
+    def internal_attrs():
+        defaults = types.JsonPatchType.internal_attrs()
+        return defaults + ['/contents_sha256']
 
 
 class ConfigFile(base.APIBase):
@@ -49,6 +68,9 @@ class ConfigFile(base.APIBase):
     description = wtypes.text
     contents = wtypes.text
 
+    contents_sha256 = wtypes.text
+    "The sha256 of the contents, set by the server"
+
     links = [link.Link]
 
     def __init__(self, **kwargs):
@@ -58,10 +80,12 @@ class ConfigFile(base.APIBase):
 
     @classmethod
     def convert_with_links(cls, rpc_cfgfile, expand=True):
-        configfile = ConfigFile(**rpc_cfgfile.as_dict())
-        if not expand:
-            configfile.unset_fields_except([
-                'uuid', 'brickconfig_uuid', 'name', 'description'])
+        if expand:
+            configfile = ConfigFile(**rpc_cfgfile.as_dict())
+        else:
+            configfile = ConfigFile(
+                **rpc_cfgfile.as_dict(CONFIGFILE_SUMMARY_FIELDS))
+            configfile.unset_fields_except(CONFIGFILE_SUMMARY_FIELDS)
 
         configfile.links = [
             link.Link.make_link('self', pecan.request.host_url,
@@ -89,7 +113,12 @@ class ConfigFileCollection(collection.Collection):
         collection.configfiles = [
             ConfigFile.convert_with_links(bc, expand)
             for bc in rpc_cfgfiles]
-        collection.next = collection.get_next(limit, url=url, **kwargs)
+        marker = None
+        if len(rpc_cfgfiles):
+            marker = api_utils.encode_marker(rpc_cfgfiles[-1],
+                                             kwargs['sort_key'])
+        collection.next = collection.get_next(limit, url=url, marker=marker,
+                                              **kwargs)
         return collection
 
     @classmethod
@@ -113,10 +142,8 @@ class ConfigFileController(rest.RestController):
         limit = api_utils.validate_limit(limit)
         sort_dir = api_utils.validate_sort_dir(sort_dir)
 
-        marker_obj = None
-        if marker:
-            marker_obj = objects.ConfigFile.get_by_uuid(
-                pecan.request.context, marker)
+        marker_obj = api_utils.get_marker(
+            objects.ConfigFile, pecan.request.context, marker, sort_key)
 
         filters = {}
 
@@ -127,12 +154,16 @@ class ConfigFileController(rest.RestController):
             filters, limit, marker_obj, sort_key=sort_key,
             sort_dir=sort_dir)
 
+        api_utils.check_not_modified(api_utils.etag(
+            *[_configfile_etag(cf) for cf in configfiles]))
+
+        # the next link keeps the filters of this page
         return ConfigFileCollection.convert_with_links(
             configfiles, limit, url=resource_url, expand=expand,
-            sort_key=sort_key, sort_dir=sort_dir)
+            sort_key=sort_key, sort_dir=sort_dir, **filters)
 
     @wsme_pecan.wsexpose(ConfigFileCollection, types.uuid,
-                         types.uuid, int, wtypes.text, wtypes.text)
+                         wtypes.text, int, wtypes.text, wtypes.text)
     def get_all(self, brickconfig_uuid, marker=None,
                 limit=None, sort_key='id', sort_dir='asc'):
         """Retrieve a list of configfiles.
@@ -148,7 +179,7 @@ class ConfigFileController(rest.RestController):
                                                limit, sort_key, sort_dir)
 
     @wsme_pecan.wsexpose(ConfigFileCollection, types.uuid,
-                         types.uuid, int, wtypes.text, wtypes.text)
+                         wtypes.text, int, wtypes.text, wtypes.text)
     def detail(self, brickconfig_uuid, marker=None, limit=None,
                sort_key='id', sort_dir='asc'):
         """Retrieve a list of configfiles with detail.
@@ -175,12 +206,15 @@ class ConfigFileController(rest.RestController):
     def get_one(self, configfile_uuid):
         """Retrieve information about the given bc.
 
+        Answers 304 Not Modified when If-None-Match holds its ETag.
+
         :param configfile_uuid: UUID of a config file.
         """
         check_policy(pecan.request.context, 'get_one')
 
         rpc_configfile = objects.ConfigFile.get_by_uuid(
             pecan.request.context, configfile_uuid)
+        api_utils.check_not_modified(_configfile_etag(rpc_configfile))
 
         return ConfigFile.convert_with_links(rpc_configfile)
 
@@ -198,6 +232,7 @@ class ConfigFileController(rest.RestController):
         except Exception as e:
             with excutils.save_and_reraise_exception():
                 LOG.exception(e)
+        pecan.response.etag = _configfile_etag(new_configfile)
         return ConfigFile.convert_with_links(new_configfile)
 
     @wsme.validate(types.uuid, [ConfigFilePatchType])
@@ -205,13 +240,21 @@ class ConfigFileController(rest.RestController):
     def patch(self, configfile_uuid, patch):
         """Update an existing configfile.
 
+        Fails with 412 Precondition Failed when If-Match does not hold
+        its ETag, or the configfile changes before the update is made.
+
         :param configfile_uuid: UUID of a configfile.
         :param patch: a json PATCH document to apply to this configfile.
         """
         check_policy(pecan.request.context, 'update')
 
-        rpc_configfile = objects.ConfigFile.get_by_uuid(
-            pecan.request.context, configfile_uuid)
+        with pecan.request.dbapi.primary_reads():
+            rpc_configfile = objects.ConfigFile.get_by_uuid(
+                pecan.request.context, configfile_uuid)
+        api_utils.check_if_match(_configfile_etag(rpc_configfile))
+        expected = dict((field, rpc_configfile[field])
+                        for field in CONFIGFILE_ETAG_FIELDS)
+        expected['updated_at'] = rpc_configfile.updated_at
         try:
             cf = ConfigFile(**jsonpatch.apply_patch(
                 rpc_configfile.as_dict(), jsonpatch.JsonPatch(patch)))
@@ -223,7 +266,8 @@ class ConfigFileController(rest.RestController):
             if rpc_configfile[field] != getattr(cf, field):
                 rpc_configfile[field] = getattr(cf, field)
 
-        rpc_configfile.save()
+        rpc_configfile.save(expected=expected)
+        pecan.response.etag = _configfile_etag(rpc_configfile)
         return ConfigFile.convert_with_links(rpc_configfile)
 
     @wsme_pecan.wsexpose(None, types.uuid, status_code=204)
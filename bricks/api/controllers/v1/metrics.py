@@ -0,0 +1,68 @@
+import pecan
+from pecan import rest
+
+from wsme import types as wtypes
+import wsmeext.pecan as wsme_pecan
+
+from bricks.api.controllers.v1 import base
+from bricks.common import policy
+
+
+def check_policy(context, action, target_obj=None):
+    target = {
+        'project_id': context.tenant,
+        'user_id': context.user,
+    }
+    target.update(target_obj or {})
+    _action = 'metrics:%s' % action
+    policy.enforce(context, _action, target)
+
+
+class EngineMetrics(wtypes.Base):
+    """Statements run against one database engine since start up."""
+
+    statements = int
+    seconds = float
+
+
+class ScopeMetrics(wtypes.Base):
+    """Statements run by one API route since start up."""
+
+    calls = int
+    statements = int
+    seconds = float
+
+    n_plus_one = int
+    "Runs with a statement repeated n_plus_one_threshold times or more"
+
+
+class Metrics(base.APIBase):
+    """API representation of the database counters of this API process."""
+
+    engines = {wtypes.text: EngineMetrics}
+    "Counters per database engine, primary or slave"
+
+    scopes = {wtypes.text: ScopeMetrics}
+    "Counters per method and route"
+
+    @classmethod
+    def convert(cls, engines, scopes):
+        metrics = Metrics()
+        metrics.engines = dict((role, EngineMetrics(**counters))
+                               for role, counters in engines.items())
+        metrics.scopes = dict((name, ScopeMetrics(**counters))
+                              for name, counters in scopes.items())
+        return metrics
+
+
+class MetricsController(rest.RestController):
+    """REST controller for the database counters, to be scraped."""
+
+    @wsme_pecan.wsexpose(Metrics)
+    def get_all(self):
+        """Retrieve the database counters of the API process serving the
+        request.
+        """
+        check_policy(pecan.request.context, 'get_all')
+        return Metrics.convert(pecan.request.dbapi.get_query_metrics(),
+                               pecan.request.dbapi.get_scope_metrics())
@@ -15,12 +15,30 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import base64
+import datetime
+import hashlib
+import hmac
+
 import jsonpatch
+import pecan
 import wsme
 
 from oslo.config import cfg
 
+from bricks.common import exception
+from bricks.common import utils
+from bricks.objects import utils as obj_utils
+from bricks.openstack.common import jsonutils
+from bricks.openstack.common import timeutils
+
 CONF = cfg.CONF
+CONF.import_opt('connection',
+                'bricks.openstack.common.db.sqlalchemy.session',
+                group='database')
+
+# object fields that cannot be sorted on, their values are not scalars
+_UNSORTABLE_FIELDS = (obj_utils.dict_or_none, obj_utils.list_or_none)
 
 
 JSONPATCH_EXCEPTIONS = (jsonpatch.JsonPatchException,
@@ -41,3 +59,146 @@ def validate_sort_dir(sort_dir):
                                          "Acceptable values are "
                                          "'asc' or 'desc'") % sort_dir)
     return sort_dir
+
+
+class Marker(object):
+    """The sort key values of the last item of a page, in place of the
+    item itself for paginate_query.
+    """
+
+    def __init__(self, values):
+        for key, value in values:
+            setattr(self, key, value)
+
+
+def validate_sort_key(obj_cls, sort_key):
+    if obj_cls.fields.get(sort_key) in _UNSORTABLE_FIELDS:
+        raise wsme.exc.ClientSideError(_("Invalid sort key: %s") %
+                                       sort_key)
+    return sort_key
+
+
+def _marker_keys(sort_key):
+    # the sort keys of _paginate_query, id makes them unique
+    return [sort_key] if sort_key == 'id' else [sort_key, 'id']
+
+
+def _marker_secret():
+    if CONF.api.marker_secret:
+        return CONF.api.marker_secret.encode('utf-8')
+    # every worker and restart of the API shares the database, and the
+    # credentials in its connection
+    connection = u'marker:%s' % (CONF.database.connection or '')
+    return hashlib.sha256(connection.encode('utf-8')).digest()
+
+
+def _marker_signature(payload):
+    return hmac.new(_marker_secret(), payload, hashlib.sha256).digest()[:16]
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip('=')
+
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(str(data) + '=' * (-len(data) % 4))
+
+
+def encode_marker(obj, sort_key):
+    """Return an opaque, signed pagination marker following obj.
+
+    :param obj: the last item of a page.
+    :param sort_key: the key the page was sorted by.
+    """
+    values = []
+    for key in _marker_keys(sort_key):
+        value = getattr(obj, key)
+        if isinstance(value, datetime.datetime):
+            values.append([key, timeutils.strtime(value), 'datetime'])
+        else:
+            values.append([key, value])
+
+    payload = jsonutils.dumps(values)
+    return '%s.%s' % (_b64encode(payload),
+                      _b64encode(_marker_signature(payload)))
+
+
+def decode_marker(marker, sort_key):
+    """Check and decode a marker made by encode_marker.
+
+    :returns: a Marker holding the sort key values it encodes.
+    """
+    try:
+        payload, signature = marker.split('.')
+        payload = _b64decode(payload)
+        signature = _b64decode(signature)
+    except (ValueError, TypeError):
+        raise wsme.exc.ClientSideError(_("Invalid marker: %s") % marker)
+
+    expected = _marker_signature(payload)
+    if (len(signature) != len(expected) or
+            sum(ord(a) ^ ord(b) for a, b in zip(signature, expected))):
+        raise wsme.exc.ClientSideError(_("Invalid marker: %s") % marker)
+
+    values = []
+    for item in jsonutils.loads(payload):
+        key, value = item[:2]
+        if item[2:] == ['datetime']:
+            value = timeutils.parse_strtime(value)
+        values.append((key, value))
+
+    if [name for name, _value in values] != _marker_keys(sort_key):
+        raise wsme.exc.ClientSideError(
+            _("Marker does not match sort key %s") % sort_key)
+    return Marker(values)
+
+
+def get_marker(obj_cls, context, marker, sort_key):
+    """Resolve the marker of a paginated request.
+
+    Markers are the opaque values of encode_marker, which cost no query to
+    resolve. Item uuids are still accepted as markers, and looked up.
+    The sort key is checked whether or not there is a marker.
+    """
+    validate_sort_key(obj_cls, sort_key)
+    if not marker:
+        return None
+    if utils.is_uuid_like(marker):
+        return obj_cls.get_by_uuid(context, marker)
+    return decode_marker(marker, sort_key)
+
+
+def etag(*parts):
+    """Return a strong ETag of the values a representation is built
+    from.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update((u'%s\0' % (part,)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def object_etag(obj, *fields):
+    """Return the ETag of an object, from its uuid and timestamps, and
+    the given fields.
+    """
+    return etag(obj.uuid, obj.created_at, obj.updated_at,
+                *[jsonutils.dumps(getattr(obj, field), sort_keys=True)
+                  for field in fields])
+
+
+def check_not_modified(tag):
+    """Tag the response, and answer 304 Not Modified when the request's
+    If-None-Match holds the tag, before any of the body is built.
+    """
+    pecan.response.etag = tag
+    if tag in pecan.request.if_none_match:
+        raise exception.NotModified()
+
+
+def check_if_match(tag):
+    """Refuse a write when the request's If-Match does not hold the tag:
+    the resource has changed since the client read it.
+    """
+    if tag not in pecan.request.if_match:
+        raise exception.PreconditionFailed()
@@ -8,6 +8,7 @@ from bricks.common import context
 from bricks.common import utils
 from bricks.conductor import rpcapi
 from bricks.db import api as dbapi
+from bricks.openstack.common import local
 from bricks.openstack.common import policy
 
 
@@ -18,11 +19,36 @@ class ConfigHook(hooks.PecanHook):
         state.request.cfg = cfg.CONF
 
 
+def _route_name(request):
+    """The method and path of request, with ids and uuids left out so
+    that requests of the same route share it.
+    """
+    parts = []
+    for part in utils.safe_rstrip(request.path, '/').split('/'):
+        if utils.is_int_like(part) or utils.is_uuid_like(part):
+            part = '*'
+        parts.append(part)
+    return '%s %s' % (request.method, '/'.join(parts))
+
+
 class DBHook(hooks.PecanHook):
-    """Attach the dbapi object to the request so controllers can get to it."""
+    """Attach the dbapi object to the request so controllers can get to it.
+
+    The request runs in a unit of work of the dbapi named after its route,
+    so that its calls share their sessions and its statements are counted.
+    """
 
     def before(self, state):
         state.request.dbapi = dbapi.get_instance()
+        state.request.unit_of_work = state.request.dbapi.unit_of_work(
+            _route_name(state.request))
+        state.request.unit_of_work.__enter__()
+
+    def after(self, state):
+        unit_of_work = getattr(state.request, 'unit_of_work', None)
+        if unit_of_work is not None:
+            unit_of_work.__exit__(None, None, None)
+            del state.request.unit_of_work
 
 
 class ContextHook(hooks.PecanHook):
@@ -73,6 +99,8 @@ class ContextHook(hooks.PecanHook):
             domain_name=domain_name,
             is_admin=is_admin,
             is_public_api=is_public_api)
+        # the db api finds the context of the request here
+        local.store.context = state.request.context
 
 
 class RPCHook(hooks.PecanHook):
@@ -117,3 +145,15 @@ class NoExceptionTracebackHook(hooks.PecanHook):
             # generated on the fly.
             state.response.json = json_body
 
+
+class NotModifiedHook(hooks.PecanHook):
+    """Send 304 Not Modified responses without a body.
+
+    Controllers raise exception.NotModified, which wsme renders as a fault
+    like any other error.
+    """
+
+    def after(self, state):
+        if state.response.status_int == 304:
+            state.response.body = ''
+            del state.response.content_type
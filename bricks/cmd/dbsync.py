@@ -3,15 +3,21 @@
 Run storage database migration.
 """
 
+import datetime
 import sys
 
 from oslo.config import cfg
 
 from bricks.common import service
+from bricks.db import api as dbapi
 from bricks.db import migration
+from bricks.openstack.common import timeutils
 
 
 CONF = cfg.CONF
+for opt in ('archive_after_days', 'archive_batch_size',
+            'archive_batch_delay'):
+    CONF.import_opt(opt, 'bricks.conductor.manager', group='conductor')
 
 
 class DBCommand(object):
@@ -31,6 +37,29 @@ class DBCommand(object):
     def version(self):
         print(migration.version())
 
+    def archive(self):
+        conn = dbapi.get_instance()
+        now = timeutils.utcnow()
+        days = CONF.command.older_than
+        if days is None:
+            days = CONF.conductor.archive_after_days
+        batch_size = (CONF.command.batch_size or
+                      CONF.conductor.archive_batch_size)
+        delay = CONF.command.delay
+        if delay is None:
+            delay = CONF.conductor.archive_batch_delay
+
+        archived = conn.archive_deleted_bricks(
+            now - datetime.timedelta(days=days), batch_size,
+            max_rows=CONF.command.max_rows, delay=delay)
+        print('Archived %d deleted bricks.' % archived)
+
+        if CONF.command.purge_older_than is not None:
+            purged = conn.purge_shadow_bricks(
+                now - datetime.timedelta(days=CONF.command.purge_older_than),
+                batch_size, max_rows=CONF.command.max_rows, delay=delay)
+            print('Purged %d archived bricks.' % purged)
+
 
 def add_command_parsers(subparsers):
     command_object = DBCommand()
@@ -55,6 +84,21 @@ def add_command_parsers(subparsers):
     parser = subparsers.add_parser('version')
     parser.set_defaults(func=command_object.version)
 
+    parser = subparsers.add_parser('archive')
+    parser.add_argument('--older-than', type=int,
+                        help='Archive bricks deleted more than this many '
+                             'days ago.')
+    parser.add_argument('--batch-size', type=int,
+                        help='Bricks moved per transaction.')
+    parser.add_argument('--max-rows', type=int,
+                        help='Stop after this many bricks.')
+    parser.add_argument('--delay', type=float,
+                        help='Seconds to sleep between batches.')
+    parser.add_argument('--purge-older-than', type=int,
+                        help='Also purge archived bricks deleted more than '
+                             'this many days ago.')
+    parser.set_defaults(func=command_object.archive)
+
 
 command_opt = cfg.SubCommandOpt('command',
                                 title='Command',
@@ -69,7 +113,7 @@ def main():
     # pls change it to bricks-dbsync upgrade
     valid_commands = set([
         'upgrade', 'downgrade', 'revision',
-        'version', 'stamp'
+        'version', 'stamp', 'archive'
     ])
     if not set(sys.argv) & valid_commands:
         sys.argv.append('upgrade')
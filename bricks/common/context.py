@@ -9,7 +9,7 @@ class RequestContext(context.RequestContext):
     def __init__(self, auth_token=None, domain_id=None, domain_name=None,
                  user=None, tenant=None, tenant_id=None, is_admin=False,
                  is_public_api=False, read_only=False, show_deleted=False,
-                 request_id=None):
+                 request_id=None, last_write_at=None):
         """Stores several additional request parameters:
 
         :param domain_id: The ID of the domain.
@@ -17,12 +17,15 @@ class RequestContext(context.RequestContext):
         :param is_public_api: Specifies whether the request should be processed
                               without authentication.
         :param tenant_id: the tenant's ID
+        :param last_write_at: timestamp of the last database write made in
+                              this context.
 
         """
         self.is_public_api = is_public_api
         self.domain_id = domain_id
         self.domain_name = domain_name
         self.tenant_id = tenant_id
+        self.last_write_at = last_write_at
 
         super(RequestContext, self).__init__(auth_token=auth_token,
                                              user=user, tenant=tenant,
@@ -35,7 +38,8 @@ class RequestContext(context.RequestContext):
         result = {'domain_id': self.domain_id,
                   'domain_name': self.domain_name,
                   'is_public_api': self.is_public_api,
-                  'tenant_id': self.tenant_id}
+                  'tenant_id': self.tenant_id,
+                  'last_write_at': self.last_write_at}
 
         result.update(super(RequestContext, self).to_dict())
 
@@ -106,6 +106,16 @@ class TemporaryFailure(BricksException):
     code = 503
 
 
+class NotModified(BricksException):
+    message = _("Not modified.")
+    code = 304
+
+
+class PreconditionFailed(BricksException):
+    message = _("Resource has changed since it was read.")
+    code = 412
+
+
 class InvalidUUID(Invalid):
     message = _("Expected a uuid but received %(uuid)s.")
 
@@ -188,6 +198,10 @@ class BrickConfigNotFound(NotFound):
     message = _("Could not find brickconfig %(brickconfig)s")
 
 
+class BrickConfigInUse(Conflict):
+    message = _("Brickconfig is still in use by brick %(brick)s")
+
+
 class ConfigFileNotFound(NotFound):
     message = _("Could not find config file %(configfile)s")
 
@@ -198,3 +212,29 @@ class MortarTaskTimeout(NotFound):
 
 class MortarTaskNoData(BricksException):
     message = _("No data was received.")
+
+
+class BrickHealthNotFound(NotFound):
+    message = _("No health data has been reported for brick %(brick)s")
+
+
+class InvalidStatsResolution(Invalid):
+    message = _("Stats are not kept at a resolution of %(resolution)s "
+                "seconds.")
+
+
+class OccupantChannelError(BricksException):
+    message = _("Channel to the occupant of %(instance)s failed: "
+                "%(reason)s")
+
+
+class InvalidBrickColumn(Invalid):
+    message = _("Bricks have no column %(column)s.")
+
+
+class InvalidColumn(Invalid):
+    message = _("Table %(table)s has no column %(column)s.")
+
+
+class BulkValuesMismatch(Invalid):
+    message = _("Got %(values)d sets of values for %(ids)d ids.")
@@ -0,0 +1,70 @@
+"""The JSON codec of the JSON-encoded database columns.
+
+Columns are decoded lazily: the database hands back RawJSON, the text as
+stored, which the objects decode on first access of the field. Values
+nobody reads are never decoded, and RawJSON written back as is is never
+encoded again.
+"""
+
+from oslo.config import cfg
+import six
+
+from bricks.common import exception
+from bricks.openstack.common import importutils
+
+json_codec_opts = [
+    cfg.StrOpt('json_codec',
+               default=None,
+               help='Module encoding and decoding the JSON columns: '
+                    'simplejson, json or ujson. Defaults to simplejson '
+                    'when it is installed, json otherwise. ujson is '
+                    'faster, but rounds floats to 9 decimal places and '
+                    'escapes forward slashes in what it stores.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(json_codec_opts, 'database')
+
+CODECS = ('simplejson', 'json', 'ujson')
+
+# picked when json_codec is not set, fastest first. These store exactly
+# what json stores, ujson has to be asked for.
+DEFAULT_CODECS = ('simplejson', 'json')
+
+# the codec module, loaded on first use
+_CODEC = []
+
+
+class RawJSON(six.text_type):
+    """JSON text read from the database and not decoded yet."""
+
+    __slots__ = ()
+
+
+def codec():
+    """Return the module of the configured JSON codec."""
+    if _CODEC:
+        return _CODEC[0]
+
+    name = CONF.database.json_codec
+    for candidate in (name,) if name else DEFAULT_CODECS:
+        module = importutils.try_import(candidate)
+        if module is not None:
+            _CODEC.append(module)
+            return module
+    raise exception.BricksException(_('Invalid JSON codec: %s') % name)
+
+
+def dumps(value):
+    return codec().dumps(value)
+
+
+def loads(text):
+    return codec().loads(text)
+
+
+def decoded(value):
+    """Decode value if it is RawJSON, otherwise return it as is."""
+    if type(value) is RawJSON:
+        return codec().loads(value)
+    return value
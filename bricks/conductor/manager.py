@@ -6,6 +6,9 @@ created within the *bricks-conductor* process, and is responsible for
 performing all actions on resources.
 """
 
+import datetime
+import functools
+
 from eventlet import greenpool
 
 from oslo.config import cfg
@@ -16,9 +19,13 @@ from bricks.common import states
 from bricks.db import api as dbapi
 from bricks.objects import base as objects_base
 from bricks.objects import MortarTask, BrickLog
+from bricks.openstack.common import context as common_context
+from bricks.openstack.common import local
 from bricks.openstack.common import lockutils
 from bricks.openstack.common import log
 from bricks.openstack.common import periodic_task
+from bricks.openstack.common.rpc import common as rpc_common
+from bricks.openstack.common import timeutils
 
 from bricks.conductor import utils
 from bricks.mortar import rpcapi as mortar_rpcapi
@@ -51,12 +58,68 @@ conductor_opts = [
                default=60,
                help='Maximum time (in seconds) since the last check-in '
                     'of a conductor.'),
+    cfg.ListOpt('stats_archives',
+                default=['60:120', '900:96', '3600:168'],
+                help='Downsampled resource usage archives kept per brick, '
+                     'as resolution_seconds:slots pairs.'),
+    cfg.IntOpt('brick_scan_chunk_size',
+               default=500,
+               help='Number of bricks fetched at a time by scans over the '
+                    'whole fleet.'),
+    cfg.IntOpt('archive_interval',
+               default=-1,
+               help='Seconds between moves of deleted bricks into the '
+                    'shadow_brick table. Negative disables the task, '
+                    'leaving archival to bricks-dbsync archive.'),
+    cfg.IntOpt('archive_after_days',
+               default=30,
+               help='Days a brick stays deleted before it is archived.'),
+    cfg.IntOpt('archive_batch_size',
+               default=1000,
+               help='Bricks archived or purged per transaction.'),
+    cfg.FloatOpt('archive_batch_delay',
+                 default=1.0,
+                 help='Seconds to sleep between archival batches, to go '
+                      'easy on the database.'),
+    cfg.IntOpt('archive_max_rows',
+               default=50000,
+               help='Most bricks archived or purged by one run of the '
+                    'archival task.'),
+    cfg.IntOpt('shadow_retention_days',
+               default=0,
+               help='Days archived bricks are kept before they are purged. '
+                    'Zero keeps them forever.'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(conductor_opts, 'conductor')
 
 
+def _run_in_context(func, *args, **kwargs):
+    """Run a worker in a unit of work of the db api, with the request
+    context it was given as the current one so the db api can route its
+    reads.
+    """
+    if args and isinstance(args[0], (common_context.RequestContext,
+                                     rpc_common.CommonRpcContext)):
+        local.store.context = args[0]
+    # partials have no name
+    name = getattr(func, '__name__', None)
+    with dbapi.get_instance().unit_of_work(name):
+        return func(*args, **kwargs)
+
+
+def _in_unit_of_work(fn):
+    """Run the RPC handler or periodic task fn in a unit of work of the
+    db api named after it.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with dbapi.get_instance().unit_of_work(fn.__name__):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
 class ConductorManager(service.PeriodicService):
     """Bricks Conductor service main class."""
 
@@ -74,6 +137,8 @@ class ConductorManager(service.PeriodicService):
 
         # GreenPool of background workers for performing tasks async.
         self._worker_pool = greenpool.GreenPool(size=CONF.rpc_thread_pool_size)
+        # the worker of the running archival task
+        self._archiver = None
 
     def initialize_service_hook(self, service):
         pass
@@ -83,8 +148,12 @@ class ConductorManager(service.PeriodicService):
                   notification.get('event_type'))
 
     def periodic_tasks(self, context, raise_on_error=False):
-        """Periodic tasks are run at pre-specified interval."""
-        return self.run_periodic_tasks(context, raise_on_error=raise_on_error)
+        """Periodic tasks are run at pre-specified interval, each tick in
+        a unit of work of the db api.
+        """
+        with dbapi.get_instance().unit_of_work():
+            return self.run_periodic_tasks(context,
+                                           raise_on_error=raise_on_error)
 
     def do_brick_deploy(self, context, brick_id, topic=None):
         # utils.brick_deploy_action(context, brick_id)
@@ -102,6 +171,7 @@ class ConductorManager(service.PeriodicService):
     def do_brick_destroy(self, context, brick_id, topic=None):
         self._spawn_worker(utils.brick_destroy_action, context, brick_id)
 
+    @_in_unit_of_work
     def notify_completion(self, context, brick_id, topic=None):
         """Notify the deployer of the brick that the deployment has been
         completed.
@@ -111,12 +181,13 @@ class ConductorManager(service.PeriodicService):
         utils.notify_completion(context, brick, brickconfig)
 
     @periodic_task.periodic_task(spacing=CONF.conductor.init_job_interval)
+    @_in_unit_of_work
     def initiate_initialized_bricks(self, context):
         """Bootstrap all instances that are in "init" state with their
         brickconfig files.
         """
 
-        bricks_to_prep = self.dbapi.get_brick_list(
+        bricks_to_prep = self.dbapi.iter_bricks(
             filters={'status': states.INIT})
 
         for brick in bricks_to_prep:
@@ -145,13 +216,15 @@ class ConductorManager(service.PeriodicService):
             self.mortar_rpcapi.do_execute(context, task)
 
     @periodic_task.periodic_task(spacing=CONF.conductor.deploying_job_interval)
+    @_in_unit_of_work
     def check_deploying_bricks(self, context):
         """Check mortar for instances that are deploying to see their task
         progression.
         """
 
-        bricks_to_check = self.dbapi.get_brick_list(
-            filters={'status': states.DEPLOYING})
+        bricks_to_check = self.dbapi.iter_bricks(
+            filters={'status': states.DEPLOYING},
+            columns=['uuid', 'instance_id'])
 
         for brick in bricks_to_check:
             if brick.instance_id:
@@ -162,14 +235,16 @@ class ConductorManager(service.PeriodicService):
                             "ID" % brick.uuid)
 
     @periodic_task.periodic_task(spacing=CONF.conductor.heartbeat_interval)
+    @_in_unit_of_work
     def heartbeat_keepalive_all_instances(self, context):
         """Reach out to all instances to get a heartbeat.
         """
-        bricks = self.dbapi.get_brick_list()
+        bricks = self.dbapi.iter_bricks(columns=['instance_id'])
         instances = [brick.instance_id for brick in bricks]
         self.mortar_rpcapi.do_check_instances(context, instances)
 
     @periodic_task.periodic_task(spacing=CONF.conductor.deleted_job_interval)
+    @_in_unit_of_work
     def check_for_deleted_instances(self, context):
         """
         Task initialization to check for deleted instances, and clean them
@@ -179,12 +254,14 @@ class ConductorManager(service.PeriodicService):
         self._spawn_worker(utils.deleted_instances_cleanup_action, context)
 
     @periodic_task.periodic_task(spacing=600)
+    @_in_unit_of_work
     def set_bricks_versions(self, context):
         """Temporary task to sync brickconfig versions over to bricks.
         """
         LOG.debug("Syncing brick versions (TEMP func)")
         db = dbapi.get_instance()
-        bricks = db.get_brick_list()
+        bricks = db.iter_bricks(columns=['brickconfig_uuid',
+                                         'configuration'])
         brickconfigs = db.get_brickconfig_list()
 
         bc_versions = {}
@@ -192,14 +269,51 @@ class ConductorManager(service.PeriodicService):
         for bc in brickconfigs:
             bc_versions[bc.get("uuid")] = bc.version
 
+        brick_ids = []
+        updates = []
         for brick in bricks:
             if not brick.configuration.get("current_version"):
                 new_config = brick.configuration.copy()
                 new_config["current_version"] = bc_versions.get(
                     brick.brickconfig_uuid)
-                brick.configuration = new_config
-                brick.save(context)
-
+                brick_ids.append(brick.id)
+                updates.append({'configuration': new_config})
+
+        if brick_ids:
+            db.update_bricks(brick_ids, updates)
+
+    @periodic_task.periodic_task(spacing=CONF.conductor.archive_interval)
+    @_in_unit_of_work
+    def archive_deleted_bricks(self, context):
+        """Move long deleted bricks out of the brick table, and purge
+        archived bricks past their retention, in a worker as it sleeps
+        between batches. A run still going is left to finish.
+        """
+        if self._archiver is not None and not self._archiver.dead:
+            LOG.debug("Archival of deleted bricks still running")
+            return
+        self._archiver = self._spawn_worker(self._archive_deleted_bricks,
+                                            context)
+
+    def _archive_deleted_bricks(self, context):
+        now = timeutils.utcnow()
+        archived = self.dbapi.archive_deleted_bricks(
+            now - datetime.timedelta(days=CONF.conductor.archive_after_days),
+            CONF.conductor.archive_batch_size,
+            max_rows=CONF.conductor.archive_max_rows,
+            delay=CONF.conductor.archive_batch_delay)
+        LOG.info("Archived %d deleted bricks" % archived)
+
+        if CONF.conductor.shadow_retention_days > 0:
+            purged = self.dbapi.purge_shadow_bricks(
+                now - datetime.timedelta(
+                    days=CONF.conductor.shadow_retention_days),
+                CONF.conductor.archive_batch_size,
+                max_rows=CONF.conductor.archive_max_rows,
+                delay=CONF.conductor.archive_batch_delay)
+            LOG.info("Purged %d archived bricks" % purged)
+
+    @_in_unit_of_work
     def do_report_last_task(self, context, instance_id, task_status):
         """A report back from mortar that a task has been completed.
 
@@ -243,6 +357,29 @@ class ConductorManager(service.PeriodicService):
             LOG.warning("Brick %s received task state %s on invalid state "
                         "%s" % (brick.uuid, task_status, brick.status))
 
+    @_in_unit_of_work
+    def do_report_health(self, context, health_report, topic=None):
+        """A health report back from a mortar host for its local instances.
+
+        :param health_report: (objects.MortarHealthReport) host and per
+                              instance health.
+        """
+        LOG.debug("Received health of %s instances from %s" % (
+            len(health_report.instances), health_report.host))
+        self.dbapi.update_brick_health(health_report.host,
+                                       health_report.instances)
+
+    @_in_unit_of_work
+    def do_report_stats(self, context, stats_report, topic=None):
+        """A batch of resource usage samples from a mortar host.
+
+        :param stats_report: (objects.MortarStatsReport) host and samples.
+        """
+        LOG.debug("Received %s stats samples from %s" % (
+            len(stats_report.samples), stats_report.host))
+        self.dbapi.add_brick_stats(stats_report.samples)
+
+    @_in_unit_of_work
     def do_tail_brick_log(self, context, brick_uuid, length, topic=None):
         """Tail a brick's log running on a compute node. useful for debugging.
         :param context: x.
@@ -261,6 +398,7 @@ class ConductorManager(service.PeriodicService):
         """Create a greenthread to run func(*args, **kwargs).
         """
         if self._worker_pool.free():
-            return self._worker_pool.spawn(func, *args, **kwargs)
+            return self._worker_pool.spawn(_run_in_context, func,
+                                           *args, **kwargs)
         else:
             raise exception.NoFreeConductorWorker()
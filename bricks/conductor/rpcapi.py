@@ -79,6 +79,18 @@ class ConductorAPI(bricks.openstack.common.rpc.proxy.RpcProxy):
                                 task_status=task_status),
                   topic=topic or self.topic)
 
+    def do_report_health(self, context, health_report, topic=None):
+        self.cast(context,
+                  self.make_msg('do_report_health',
+                                health_report=health_report),
+                  topic=topic or self.topic)
+
+    def do_report_stats(self, context, stats_report, topic=None):
+        self.cast(context,
+                  self.make_msg('do_report_stats',
+                                stats_report=stats_report),
+                  topic=topic or self.topic)
+
     def do_tail_brick_log(self, context, brick_uuid, length, topic=None):
         return self.call(context,
                          self.make_msg('do_tail_brick_log',
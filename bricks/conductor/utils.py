@@ -120,9 +120,7 @@ def deleted_instances_cleanup_action(req_context):
 
     # get all bricks
     db = dbapi.get_instance()
-    bricks = db.get_brick_list()
-    LOG.debug("Have %s bricks" % len(bricks))
-    if len(bricks) == 0:
+    if not db.get_brick_rows(['id'], limit=1):
         # don't even bother continuing, no bricks to check anyway.
         return
 
@@ -130,7 +128,7 @@ def deleted_instances_cleanup_action(req_context):
     novaclient = opencrack.build_nova_client(req_context)
     novaclient.authenticate()
     servers = novaclient.servers.list(search_opts={'all_tenants': 1})
-    server_uuids = [server.id for server in servers]
+    server_uuids = set(server.id for server in servers)
 
     if len(server_uuids) == 0:
         # don't even bother continuing, this is most likely a failed call.
@@ -141,7 +139,7 @@ def deleted_instances_cleanup_action(req_context):
     # generate a list of bricks whose instance_ids don't show up in the
     # nova list
     bricks_to_clean = []
-    for brick in bricks:
+    for brick in db.iter_bricks(columns=['instance_id']):
         if brick.instance_id and brick.instance_id not in server_uuids:
             # brick has an instance record, but nova is not reporting
             # as being there.
@@ -153,7 +151,8 @@ def deleted_instances_cleanup_action(req_context):
     for brick in bricks_to_clean:
         LOG.debug("Destroying unused brick %s for instance %s" % (
             brick.id, brick.instance_id))
-        db.destroy_brick(brick.id)
+    if bricks_to_clean:
+        db.destroy_bricks([brick.id for brick in bricks_to_clean])
 
 
 ##
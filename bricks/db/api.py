@@ -40,3 +40,186 @@ class Connection(object):
     @abc.abstractmethod
     def __init__(self):
         """Constructor."""
+
+    @abc.abstractmethod
+    def unit_of_work(self, name=None):
+        """A context manager for a request or conductor action.
+
+        Calls made by the current thread inside it share their database
+        sessions, and looking up the same brick, brickconfig or
+        configfile again is served from the session rather than the
+        database until the next write.
+
+        :param name: when given, the statements run inside it are counted
+                     under name, see get_scope_metrics.
+        """
+
+    @abc.abstractmethod
+    def primary_reads(self):
+        """A context manager sending the reads the current thread makes
+        inside it to the primary database, never to the slave: for the
+        reads a write decides on, which a lagging slave could answer
+        with rows that have since changed.
+        """
+
+    @abc.abstractmethod
+    def iter_bricks(self, filters=None, chunk_size=None, columns=None):
+        """Iterate over every brick matching filters, in id order.
+
+        Bricks are fetched chunk_size at a time, so that scans over the
+        whole fleet run in bounded memory.
+
+        :param filters: filters to apply, as for get_brick_list.
+        :param chunk_size: number of bricks fetched per query.
+        :param columns: when given, yield rows of these columns only
+                        instead of Brick objects.
+        """
+
+    @abc.abstractmethod
+    def get_brick_columns(self, brick_ids, columns):
+        """Get some columns of the bricks with the given ids.
+
+        :param brick_ids: ids of the bricks.
+        :param columns: names of the columns to select, besides id.
+        :returns: a list of named tuples with id and the columns as
+                  attributes, in no particular order.
+        """
+
+    @abc.abstractmethod
+    def get_brickconfig_columns(self, brickconfig_ids, columns):
+        """Get some columns of the brickconfigs with the given ids, as
+        get_brick_columns.
+        """
+
+    @abc.abstractmethod
+    def get_configfile_columns(self, configfile_ids, columns):
+        """Get some columns of the configfiles with the given ids, as
+        get_brick_columns.
+        """
+
+    @abc.abstractmethod
+    def create_bricks(self, values_list):
+        """Create many bricks in one transaction.
+
+        Rows are inserted in chunks, a statement executed with a row of
+        parameters per brick for each chunk. Missing uuids and statuses
+        are generated, the values dicts are left as they are.
+
+        :param values_list: a dict of brick values per brick, all with
+                            the same keys.
+        :returns: the uuids of the new bricks, in order.
+        """
+
+    @abc.abstractmethod
+    def update_bricks(self, brick_ids, values):
+        """Update many bricks in one transaction.
+
+        Deleted bricks are left alone.
+
+        :param brick_ids: ids of the bricks.
+        :param values: a dict of values to set on every brick, or a list
+                       of dicts with the same keys, one per brick id.
+        :returns: the number of bricks updated.
+        """
+
+    @abc.abstractmethod
+    def destroy_bricks(self, brick_ids):
+        """Soft delete many bricks in one transaction.
+
+        :param brick_ids: ids of the bricks.
+        :returns: the number of bricks deleted.
+        """
+
+    @abc.abstractmethod
+    def get_brick_counts(self, group_by, filters=None):
+        """Count the bricks with each value of an indexed column.
+
+        Counts are cached for [database] brick_counts_ttl seconds, and
+        brick writes made by this process drop the cache.
+
+        :param group_by: one of status, tenant_id or brickconfig_uuid.
+        :param filters: filters to apply, as for get_brick_list.
+        :returns: a dict of {value: number of bricks}.
+        """
+
+    @abc.abstractmethod
+    def append_brick_log(self, brick_id, data):
+        """Append a chunk to the deploy log of a brick.
+
+        :param brick_id: id of the brick.
+        :param data: text to append.
+        :returns: the new chunk, with its sequence number.
+        """
+
+    @abc.abstractmethod
+    def get_brick_log(self, brick_id, since_seq=None, last=None):
+        """Get chunks of the deploy log of a brick, in sequence.
+
+        :param brick_id: id of the brick.
+        :param since_seq: only get chunks after this sequence number.
+        :param last: only get the last this many chunks.
+        :returns: a list of chunks.
+        """
+
+    @abc.abstractmethod
+    def archive_deleted_bricks(self, deleted_before, batch_size,
+                               max_rows=None, delay=0):
+        """Move soft deleted bricks into the shadow_brick table.
+
+        Bricks are moved batch_size at a time, each batch in a transaction
+        of its own, so that the brick table is never locked for long. The
+        deploy logs of archived bricks move along, into
+        shadow_brick_log_chunk.
+
+        :param deleted_before: datetime before which the bricks must have
+                               been deleted.
+        :param batch_size: bricks moved per batch.
+        :param max_rows: stop after moving this many bricks.
+        :param delay: seconds to sleep between batches.
+        :returns: the number of bricks archived.
+        """
+
+    @abc.abstractmethod
+    def purge_shadow_bricks(self, deleted_before, batch_size, max_rows=None,
+                            delay=0):
+        """Delete archived bricks and their deploy logs for good, in
+        batches as archive_deleted_bricks.
+
+        :param deleted_before: datetime before which the bricks must have
+                               been deleted.
+        :returns: the number of bricks purged.
+        """
+
+    @abc.abstractmethod
+    def create_configfiles(self, values_list):
+        """Create many configfiles in one transaction, as create_bricks.
+
+        :param values_list: a dict of configfile values per configfile,
+                            all with the same keys.
+        :returns: the uuids of the new configfiles, in order.
+        """
+
+    @abc.abstractmethod
+    def get_query_metrics(self):
+        """Get the statements run per database engine since start up.
+
+        Reads of bricks, brickconfigs and configfiles go to the slave
+        database when [database] slave_connection is set, except for
+        read_after_write_window seconds after the request context wrote.
+
+        :returns: a dict of {'statements': count, 'seconds': time spent}
+                  per engine, keyed 'primary' or 'slave'.
+        """
+
+    @abc.abstractmethod
+    def get_scope_metrics(self):
+        """Get the statements run per named unit of work since start up.
+
+        API requests are named after their method and route, conductor
+        RPC handlers and periodic tasks after their function.
+
+        :returns: a dict of {'calls': runs, 'statements': count,
+                  'seconds': time spent, 'n_plus_one': statement shapes
+                  that ran n_plus_one_threshold times or more in a run}
+                  per name.
+        """
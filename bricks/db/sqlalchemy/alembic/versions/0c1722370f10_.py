@@ -0,0 +1,43 @@
+"""add brick_stats table
+
+Revision ID: 0c1722370f10
+Revises: d3e7b52904f2
+Create Date: 2014-05-08 16:40:02.561093
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '0c1722370f10'
+down_revision = 'd3e7b52904f2'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table(
+        'brick_stats',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('instance_id', sa.String(length=36), nullable=True),
+        sa.Column('resolution', sa.Integer(), nullable=True),
+        sa.Column('slot', sa.Integer(), nullable=True),
+        sa.Column('period', sa.Integer(), nullable=True),
+        sa.Column('samples', sa.Integer(), nullable=True),
+        sa.Column('cpu', sa.Float(), nullable=True),
+        sa.Column('mem_used', sa.Float(), nullable=True),
+        sa.Column('mem_total', sa.Float(), nullable=True),
+        sa.Column('disk_read', sa.Float(), nullable=True),
+        sa.Column('disk_write', sa.Float(), nullable=True),
+        sa.Column('net_rx', sa.Float(), nullable=True),
+        sa.Column('net_tx', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint(
+            'instance_id', 'resolution', 'slot',
+            name='uniq_brick_stats0instance_id0resolution0slot')
+    )
+
+
+def downgrade():
+    op.drop_table('brick_stats')
@@ -0,0 +1,38 @@
+"""add composite indexes for brick queries
+
+Revision ID: 3a8f2c61d0b7
+Revises: 0c1722370f10
+Create Date: 2014-05-13 11:02:37.904115
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3a8f2c61d0b7'
+down_revision = '0c1722370f10'
+
+from alembic import op
+
+
+def upgrade():
+    # every brick query filters on deleted, most then on status or tenant,
+    # and pages by id.
+    op.create_index('brick_deleted_status_id', 'brick',
+                    ['deleted', 'status', 'id'], unique=False)
+    op.create_index('brick_deleted_tenant_id_id', 'brick',
+                    ['deleted', 'tenant_id', 'id'], unique=False)
+    op.create_index('brick_instance_id_deleted', 'brick',
+                    ['instance_id', 'deleted'], unique=False)
+
+    # prefixes of the indexes above
+    op.drop_index('brick_deleted', table_name='brick')
+    op.drop_index('brick_instance_uuid', table_name='brick')
+
+
+def downgrade():
+    op.create_index('brick_instance_uuid', 'brick', ['instance_id'],
+                    unique=False)
+    op.create_index('brick_deleted', 'brick', ['deleted'], unique=False)
+
+    op.drop_index('brick_instance_id_deleted', table_name='brick')
+    op.drop_index('brick_deleted_tenant_id_id', table_name='brick')
+    op.drop_index('brick_deleted_status_id', table_name='brick')
@@ -0,0 +1,82 @@
+"""store configfile contents in content addressed configfile_blob
+
+Revision ID: 4c7d2e9a1b58
+Revises: 8e4f0b7c2a19
+Create Date: 2014-05-27 10:12:44.183502
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4c7d2e9a1b58'
+down_revision = '8e4f0b7c2a19'
+
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import column, table
+
+
+configfile = table('brickconfig_file',
+                   column('id', sa.Integer),
+                   column('contents', sa.Text),
+                   column('contents_sha256', sa.String))
+
+configfile_blob = table('configfile_blob',
+                        column('sha256', sa.String),
+                        column('contents', sa.Text),
+                        column('refcount', sa.Integer))
+
+
+def _sha256(contents):
+    if isinstance(contents, unicode):
+        contents = contents.encode('utf-8')
+    return hashlib.sha256(contents).hexdigest()
+
+
+def upgrade():
+    op.create_table(
+        'configfile_blob',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=True),
+        sa.Column('contents', sa.Text(), nullable=True),
+        sa.Column('refcount', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('sha256', name='uniq_configfile_blob0sha256')
+    )
+    op.add_column('brickconfig_file',
+                  sa.Column('contents_sha256', sa.String(length=64),
+                            nullable=True))
+
+    blobs = {}
+    rows = op.get_bind().execute(
+        sa.select([configfile.c.id, configfile.c.contents])
+        .where(configfile.c.contents.isnot(None)))
+    for configfile_id, contents in rows.fetchall():
+        sha256 = _sha256(contents)
+        blob = blobs.setdefault(sha256, {'sha256': sha256,
+                                         'contents': contents,
+                                         'refcount': 0})
+        blob['refcount'] += 1
+        op.execute(configfile.update()
+                   .where(configfile.c.id == configfile_id)
+                   .values(contents_sha256=sha256))
+    if blobs:
+        op.bulk_insert(configfile_blob, blobs.values())
+
+    op.drop_column('brickconfig_file', 'contents')
+
+
+def downgrade():
+    op.add_column('brickconfig_file',
+                  sa.Column('contents', sa.Text(), nullable=True))
+
+    op.execute(configfile.update().values(
+        contents=sa.select([configfile_blob.c.contents]).where(
+            configfile_blob.c.sha256 == configfile.c.contents_sha256)
+        .as_scalar()))
+
+    op.drop_column('brickconfig_file', 'contents_sha256')
+    op.drop_table('configfile_blob')
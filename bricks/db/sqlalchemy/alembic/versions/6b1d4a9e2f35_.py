@@ -0,0 +1,40 @@
+"""add shadow_brick table for archived bricks
+
+Revision ID: 6b1d4a9e2f35
+Revises: 3a8f2c61d0b7
+Create Date: 2014-05-20 10:14:52.118734
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '6b1d4a9e2f35'
+down_revision = '3a8f2c61d0b7'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table(
+        'shadow_brick',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('uuid', sa.String(length=36), nullable=True),
+        sa.Column('brickconfig_uuid', sa.String(length=36), nullable=True),
+        sa.Column('deployed_at', sa.DateTime(), nullable=True),
+        sa.Column('instance_id', sa.String(length=36), nullable=True),
+        sa.Column('tenant_id', sa.String(length=255), nullable=True),
+        sa.Column('status', sa.String(length=36), nullable=True),
+        sa.Column('configuration', sa.Text(), nullable=True),
+        sa.Column('deploy_log', sa.Text(), nullable=True),
+        sa.Column('deleted', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('shadow_brick_updated_at', 'shadow_brick',
+                    ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('shadow_brick_updated_at', table_name='shadow_brick')
+    op.drop_table('shadow_brick')
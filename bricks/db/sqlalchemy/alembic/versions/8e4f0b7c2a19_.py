@@ -0,0 +1,105 @@
+"""move brick deploy logs into brick_log_chunk and shadow_brick_log_chunk
+
+Revision ID: 8e4f0b7c2a19
+Revises: 6b1d4a9e2f35
+Create Date: 2014-05-22 15:41:08.530267
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '8e4f0b7c2a19'
+down_revision = '6b1d4a9e2f35'
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import column, table
+
+
+brick = table('brick',
+              column('id', sa.Integer),
+              column('created_at', sa.DateTime),
+              column('deploy_log', sa.Text))
+
+shadow_brick = table('shadow_brick',
+                     column('id', sa.Integer),
+                     column('created_at', sa.DateTime),
+                     column('deploy_log', sa.Text))
+
+
+def _log_chunk_table(name):
+    return table(name,
+                 column('created_at', sa.DateTime),
+                 column('brick_id', sa.Integer),
+                 column('seq', sa.Integer),
+                 column('data', sa.Text))
+
+
+brick_log_chunk = _log_chunk_table('brick_log_chunk')
+shadow_brick_log_chunk = _log_chunk_table('shadow_brick_log_chunk')
+
+
+def _move_logs_to_chunks(bricks, chunks):
+    # each existing log becomes the first chunk of its brick's log
+    op.execute(chunks.insert().from_select(
+        ['brick_id', 'seq', 'data', 'created_at'],
+        sa.select([bricks.c.id, sa.literal(1), bricks.c.deploy_log,
+                   bricks.c.created_at]).where(bricks.c.deploy_log != '')))
+
+
+def _move_chunks_to_logs(bricks, chunks):
+    logs = {}
+    rows = op.get_bind().execute(
+        sa.select([chunks.c.brick_id, chunks.c.data])
+        .order_by(chunks.c.brick_id, chunks.c.seq))
+    for brick_id, data in rows:
+        logs.setdefault(brick_id, []).append(data or '')
+    for brick_id, pieces in logs.items():
+        op.execute(bricks.update().where(bricks.c.id == brick_id)
+                   .values(deploy_log=''.join(pieces)))
+
+
+def upgrade():
+    op.create_table(
+        'brick_log_chunk',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('brick_id', sa.Integer(), nullable=True),
+        sa.Column('seq', sa.Integer(), nullable=True),
+        sa.Column('data', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('brick_id', 'seq',
+                            name='uniq_brick_log_chunk0brick_id0seq')
+    )
+    op.create_table(
+        'shadow_brick_log_chunk',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('brick_id', sa.Integer(), nullable=True),
+        sa.Column('seq', sa.Integer(), nullable=True),
+        sa.Column('data', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('shadow_brick_log_chunk_brick_id',
+                    'shadow_brick_log_chunk', ['brick_id'], unique=False)
+
+    _move_logs_to_chunks(brick, brick_log_chunk)
+    _move_logs_to_chunks(shadow_brick, shadow_brick_log_chunk)
+
+    op.drop_column('brick', 'deploy_log')
+    op.drop_column('shadow_brick', 'deploy_log')
+
+
+def downgrade():
+    op.add_column('shadow_brick',
+                  sa.Column('deploy_log', sa.Text(), nullable=True))
+    op.add_column('brick', sa.Column('deploy_log', sa.Text(), nullable=True))
+
+    _move_chunks_to_logs(brick, brick_log_chunk)
+    _move_chunks_to_logs(shadow_brick, shadow_brick_log_chunk)
+
+    op.drop_index('shadow_brick_log_chunk_brick_id',
+                  table_name='shadow_brick_log_chunk')
+    op.drop_table('shadow_brick_log_chunk')
+    op.drop_table('brick_log_chunk')
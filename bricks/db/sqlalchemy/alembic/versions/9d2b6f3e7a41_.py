@@ -0,0 +1,23 @@
+"""add brick index for archival
+
+Revision ID: 9d2b6f3e7a41
+Revises: 4c7d2e9a1b58
+Create Date: 2014-06-03 14:26:19.440187
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '9d2b6f3e7a41'
+down_revision = '4c7d2e9a1b58'
+
+from alembic import op
+
+
+def upgrade():
+    # archival takes the bricks deleted longest ago, in id order.
+    op.create_index('brick_deleted_updated_at_id', 'brick',
+                    ['deleted', 'updated_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('brick_deleted_updated_at_id', table_name='brick')
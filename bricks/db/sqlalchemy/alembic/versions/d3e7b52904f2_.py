@@ -0,0 +1,36 @@
+"""add brick_health table
+
+Revision ID: d3e7b52904f2
+Revises: ebdc3c27e82
+Create Date: 2014-05-06 10:12:41.118227
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'd3e7b52904f2'
+down_revision = 'ebdc3c27e82'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table(
+        'brick_health',
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('instance_id', sa.String(length=36), nullable=True),
+        sa.Column('host', sa.String(length=255), nullable=True),
+        sa.Column('domain_state', sa.String(length=36), nullable=True),
+        sa.Column('channel', sa.Boolean(), nullable=True),
+        sa.Column('occupant', sa.Boolean(), nullable=True),
+        sa.Column('checked_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('instance_id',
+                            name='uniq_brick_health0instance_id')
+    )
+
+
+def downgrade():
+    op.drop_table('brick_health')
@@ -2,7 +2,16 @@
 
 """SQLAlchemy storage backend."""
 
+import collections
+import contextlib
+import datetime
+import functools
+import hashlib
+
+from eventlet import greenthread
 from oslo.config import cfg
+import sqlalchemy as sa
+from sqlalchemy import orm
 from sqlalchemy.orm.exc import NoResultFound
 
 from bricks.common import exception
@@ -10,23 +19,216 @@ from bricks.common import utils
 from bricks.common import states
 from bricks import objects
 
+from bricks.db.sqlalchemy import instrumentation
 from bricks.db.sqlalchemy import models
+from bricks.openstack.common.db import exception as db_exc
 from bricks.openstack.common.db.sqlalchemy import session as db_session
 from bricks.openstack.common.db.sqlalchemy import utils as db_utils
+from bricks.openstack.common import local
 from bricks.openstack.common import log
+from bricks.openstack.common import timeutils
+
+sql_read_opts = [
+    cfg.IntOpt('read_after_write_window',
+               default=5,
+               help='Seconds after a write during which reads in the same '
+                    'request context go to the primary database rather '
+                    'than the slave, so that they see the write.'),
+    cfg.IntOpt('brick_counts_ttl',
+               default=10,
+               help='Seconds that grouped brick counts are cached for. '
+                    'Writes by other processes may take this long to '
+                    'show. Zero disables the cache.'),
+]
 
 CONF = cfg.CONF
+CONF.register_opts(sql_read_opts, 'database')
 CONF.import_opt('connection',
                 'bricks.openstack.common.db.sqlalchemy.session',
                 group='database')
+CONF.import_opt('slave_connection',
+                'bricks.openstack.common.db.sqlalchemy.session',
+                group='database')
 CONF.import_opt('heartbeat_timeout',
                 'bricks.conductor.manager',
                 group='conductor')
+CONF.import_opt('stats_archives',
+                'bricks.conductor.manager',
+                group='conductor')
+CONF.import_opt('brick_scan_chunk_size',
+                'bricks.conductor.manager',
+                group='conductor')
 
 LOG = log.getLogger(__name__)
 
+# ids per query of _get_columns_by_id
+COLUMNS_BY_ID_BATCH = 500
+
+# rows per statement of the bulk writes
+BULK_WRITE_BATCH = 500
+
+# attempts at appending to a brick log that others are appending to
+LOG_APPEND_ATTEMPTS = 3
+
+# attempts at a configfile write that races others to create a blob
+BLOB_WRITE_ATTEMPTS = 3
+
+# the indexed brick columns get_brick_counts can group by
+BRICK_COUNT_GROUPS = ('status', 'tenant_id', 'brickconfig_uuid')
+
+# cached get_brick_counts results, by group_by and filters, as
+# (expires_at, counts)
+_BRICK_COUNTS = {}
+
 get_engine = db_session.get_engine
-get_session = db_session.get_session
+
+
+class _UnitOfWork(object):
+    """The sessions a request or conductor action shares, one per engine
+    role, and the instances it looked up one at a time.
+
+    Sessions only hold weak references to the instances they load, so
+    the looked up instances are kept here for the identity maps to serve
+    them again.
+    """
+
+    def __init__(self):
+        self.sessions = {}
+        self.instances = []
+
+    def expunge(self):
+        for session in self.sessions.values():
+            session.expunge_all()
+        self.instances = []
+
+    def close(self):
+        for session in self.sessions.values():
+            session.close()
+        self.sessions = {}
+        self.instances = []
+
+
+def _current_unit_of_work():
+    return getattr(local.store, 'unit_of_work', None)
+
+
+@contextlib.contextmanager
+def unit_of_work(name=None):
+    """Share sessions and their identity maps between the db api calls
+    made in the block, by the current thread.
+
+    A unit of work entered inside another one joins it.
+
+    :param name: when given, count the statements of the block under it.
+    """
+    uow = None
+    if _current_unit_of_work() is None:
+        uow = _UnitOfWork()
+        local.store.unit_of_work = uow
+    try:
+        if name is None:
+            yield
+        else:
+            with instrumentation.scope(name):
+                yield
+    finally:
+        if uow is not None:
+            del local.store.unit_of_work
+            uow.close()
+
+
+@contextlib.contextmanager
+def primary_reads():
+    """Send the reads made by the current thread in the block to the
+    primary database.
+    """
+    previous = getattr(local.strong_store, 'primary_reads', False)
+    local.strong_store.primary_reads = True
+    try:
+        yield
+    finally:
+        local.strong_store.primary_reads = previous
+
+
+def get_session(slave_session=False):
+    role = 'slave' if slave_session else 'primary'
+    uow = _current_unit_of_work()
+    if uow is not None and role in uow.sessions:
+        return uow.sessions[role]
+
+    session = db_session.get_session(slave_session=slave_session)
+    instrumentation.instrument(session.bind, role)
+    if uow is not None:
+        uow.sessions[role] = session
+    return session
+
+
+def _identity_get(session, model, identity):
+    """The instance of model with identity, an id or uuid, that session
+    loaded earlier in the current unit of work, or None.
+    """
+    if _current_unit_of_work() is None:
+        return None
+    if utils.is_int_like(identity):
+        key = orm.util.identity_key(model, int(identity))
+        return session.identity_map.get(key)
+    for instance in session.identity_map.values():
+        if isinstance(instance, model) and instance.uuid == identity:
+            return instance
+
+
+def _identity_keep(instance):
+    """Keep instance for _identity_get until the unit of work ends."""
+    uow = _current_unit_of_work()
+    if uow is not None:
+        uow.instances.append(instance)
+    return instance
+
+
+def _wrote_recently(context):
+    last_write_at = getattr(context, 'last_write_at', None)
+    return (last_write_at is not None and
+            timeutils.utcnow_ts() - last_write_at <
+            CONF.database.read_after_write_window)
+
+
+def get_read_session():
+    """Session for a read, on the slave database when it is safe to use.
+
+    Reads go to the slave when one is configured, unless the request
+    context they are made in wrote within read_after_write_window: the
+    slave may not have caught up with that write yet. Reads inside
+    primary_reads never do.
+    """
+    if not CONF.database.slave_connection:
+        return get_session()
+    if getattr(local.strong_store, 'primary_reads', False):
+        return get_session()
+    if _wrote_recently(getattr(local.store, 'context', None)):
+        return get_session()
+    return get_session(slave_session=True)
+
+
+def _writes(fn):
+    """Stamp the current request context with the time fn wrote at.
+
+    The stamp travels with the context over RPC, so that the conductor
+    reads an API write back from the primary too. Writes do not go
+    through the identity maps, so those of the current unit of work are
+    emptied as well.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            uow = _current_unit_of_work()
+            if uow is not None:
+                uow.expunge()
+            context = getattr(local.store, 'context', None)
+            if context is not None:
+                context.last_write_at = timeutils.utcnow_ts()
+    return wrapper
 
 
 def get_backend():
@@ -88,7 +290,7 @@ def add_filter_by_many_identities(query, model, values):
 def _paginate_query(model, limit=None, marker=None, sort_key=None,
                     sort_dir=None, query=None):
     if not query:
-        query = model_query(model)
+        query = model_query(model, session=get_read_session())
     sort_keys = ['id']
     if sort_key and sort_key not in sort_keys:
         sort_keys.insert(0, sort_key)
@@ -97,6 +299,245 @@ def _paginate_query(model, limit=None, marker=None, sort_key=None,
     return query.all()
 
 
+def _lazy_options(objclass):
+    """Query options deferring the lazy fields of objclass."""
+    return [orm.defer(field) for field in objclass.obj_lazy_fields]
+
+
+def _decoded(model, column):
+    """Select column of model with its JSON decoded eagerly, as callers
+    of projections pick the columns they read.
+    """
+    attr = getattr(model, column)
+    column_type = getattr(model.__table__.columns.get(column), 'type', None)
+    if isinstance(column_type, models.JsonEncodedType):
+        return sa.type_coerce(attr, type(column_type)(lazy=False)).label(
+            column)
+    return attr
+
+
+def _get_columns_by_id(model, ids, columns):
+    query_columns = [model.id]
+    for column in columns:
+        if column not in sa.inspect(model).column_attrs:
+            raise exception.InvalidColumn(table=model.__tablename__,
+                                          column=column)
+        query_columns.append(_decoded(model, column))
+
+    ids = list(ids)
+    rows = []
+    session = get_read_session()
+    # keep the IN lists within the bound parameter limits of the backends
+    for start in range(0, len(ids), COLUMNS_BY_ID_BATCH):
+        query = model_query(*query_columns, session=session)
+        query = query.filter(
+            model.id.in_(ids[start:start + COLUMNS_BY_ID_BATCH]))
+        with instrumentation.batched():
+            rows.extend(query.all())
+    return rows
+
+
+def _update_returning(session, model, query, values, expected=None):
+    """Update the row query matches, and return it as updated.
+
+    On databases with UPDATE ... RETURNING this is a single statement,
+    others need a SELECT after the UPDATE. Either way it must run inside a
+    transaction of session, so that a bad match can be rolled back.
+
+    :param expected: column values the row must still hold to be updated.
+    :returns: the updated row, None if query did not match exactly one.
+    """
+    table = model.__table__
+    update = table.update().where(
+        _filter_expected(query, model, expected).whereclause).values(values)
+
+    if session.bind.dialect.implicit_returning:
+        rows = session.execute(update.returning(*table.columns)).fetchall()
+        return rows[0] if len(rows) == 1 else None
+
+    if session.execute(update).rowcount != 1:
+        return None
+    return session.execute(
+        sa.select([table]).where(query.whereclause)).first()
+
+
+def _filter_expected(query, model, expected):
+    """Narrow query to the rows that still hold the expected column
+    values, to guard an update against concurrent writes.
+    """
+    for name, value in (expected or {}).items():
+        if isinstance(value, datetime.datetime):
+            # stored as naive UTC
+            value = timeutils.normalize_time(value)
+        query = query.filter(getattr(model, name) == value)
+    return query
+
+
+def _bulk_insert(session, model, values_list):
+    """Insert a row of model per values, BULK_WRITE_BATCH rows a statement.
+
+    Every values dict must have the same keys.
+    """
+    insert = model.__table__.insert()
+    for start in range(0, len(values_list), BULK_WRITE_BATCH):
+        with instrumentation.batched():
+            session.execute(insert,
+                            values_list[start:start + BULK_WRITE_BATCH])
+
+
+def _bulk_update(session, query, model, ids, values):
+    """Set values on the rows of query with the given ids.
+
+    :param values: a dict of values to set on every row, or a list of
+                   dicts with the same keys, one per id.
+    :returns: the number of rows updated.
+    """
+    table = model.__table__
+    ids = list(ids)
+    count = 0
+    if isinstance(values, dict):
+        for start in range(0, len(ids), BULK_WRITE_BATCH):
+            update = table.update().where(query.whereclause).where(
+                table.c.id.in_(ids[start:start + BULK_WRITE_BATCH]))
+            with instrumentation.batched():
+                count += session.execute(update.values(values)).rowcount
+        return count
+
+    if len(values) != len(ids):
+        raise exception.BulkValuesMismatch(values=len(values),
+                                           ids=len(ids))
+    if not ids:
+        return 0
+    # one statement, executed with a row of parameters per id
+    update = table.update().where(query.whereclause).where(
+        table.c.id == sa.bindparam('_id')).values(
+            dict((key, sa.bindparam(key, type_=table.c[key].type))
+                 for key in values[0]))
+    params = [dict(value, _id=id_) for id_, value in zip(ids, values)]
+    for start in range(0, len(params), BULK_WRITE_BATCH):
+        with instrumentation.batched():
+            # not every DBAPI reports the rowcount of an executemany, so
+            # count the rows it matches beforehand
+            count += session.execute(
+                sa.select([sa.func.count()]).select_from(table).where(
+                    query.whereclause).where(table.c.id.in_(
+                        ids[start:start + BULK_WRITE_BATCH]))).scalar()
+            session.execute(update, params[start:start + BULK_WRITE_BATCH])
+    return count
+
+
+def _contents_sha256(contents):
+    if contents is None:
+        return None
+    if isinstance(contents, unicode):
+        contents = contents.encode('utf-8')
+    return hashlib.sha256(contents).hexdigest()
+
+
+def _blob_values(values):
+    """Copy configfile values, with contents swapped for the sha256 of
+    their blob.
+
+    :returns: the values, and a dict of {sha256: contents}.
+    """
+    values = dict(values)
+    # the hash is derived from the contents, never written on its own
+    values.pop('contents_sha256', None)
+    blobs = {}
+    if 'contents' in values:
+        contents = values.pop('contents')
+        sha256 = _contents_sha256(contents)
+        values['contents_sha256'] = sha256
+        if sha256 is not None:
+            blobs[sha256] = contents
+    return values, blobs
+
+
+def _ref_blobs(session, blobs, refs):
+    """Count more configfiles as using blobs, creating the missing ones.
+
+    :param blobs: a dict of {sha256: contents}.
+    :param refs: a dict of {sha256: number of new references}.
+    """
+    table = models.ConfigFileBlob.__table__
+    for sha256, count in refs.items():
+        updated = session.execute(
+            table.update().where(table.c.sha256 == sha256).values(
+                refcount=table.c.refcount + count)).rowcount
+        if not updated:
+            session.execute(table.insert().values(
+                sha256=sha256, contents=blobs[sha256], refcount=count))
+
+
+def _unref_blobs(session, refs):
+    """Count fewer configfiles as using blobs, deleting the unused ones.
+
+    :param refs: a dict of {sha256: number of dropped references}.
+    """
+    table = models.ConfigFileBlob.__table__
+    for sha256, count in refs.items():
+        session.execute(
+            table.update().where(table.c.sha256 == sha256).values(
+                refcount=table.c.refcount - count))
+    if refs:
+        session.execute(table.delete().where(
+            table.c.sha256.in_(refs.keys())).where(table.c.refcount <= 0))
+
+
+def _blob_writes(fn):
+    """Retry fn when a concurrent write created the same blob first."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        for attempt in range(BLOB_WRITE_ATTEMPTS):
+            try:
+                return fn(*args, **kwargs)
+            except db_exc.DBDuplicateEntry:
+                if attempt == BLOB_WRITE_ATTEMPTS - 1:
+                    raise
+    return wrapper
+
+
+def _invalidate_brick_counts(values=None):
+    """Drop the cached brick counts, if values touch a grouped column.
+
+    :param values: the values written, or None if bricks were created or
+                   deleted.
+    """
+    if values is not None:
+        if not isinstance(values, dict):
+            values = values[0] if values else {}
+        if not set(values) & set(BRICK_COUNT_GROUPS):
+            return
+    _BRICK_COUNTS.clear()
+
+
+def _in_batches(batch_fn, batch_size, max_rows, delay):
+    """Call batch_fn(limit) until it handles fewer rows than the limit it
+    was given or max_rows are handled, sleeping delay seconds in between.
+
+    :returns: the number of rows handled.
+    """
+    handled = 0
+    while max_rows is None or handled < max_rows:
+        limit = batch_size
+        if max_rows is not None:
+            limit = min(limit, max_rows - handled)
+        with instrumentation.batched():
+            count = batch_fn(limit)
+        handled += count
+        if count < limit:
+            break
+        greenthread.sleep(delay)
+    return handled
+
+
+def _brickconfig_in_use_filter():
+    """Criterion of brickconfigs that some live brick uses."""
+    return sa.exists().where(sa.and_(
+        models.Brick.brickconfig_uuid == models.BrickConfig.uuid,
+        sa.not_(models.Brick.deleted)))
+
+
 def _check_brickconfig_in_use(brickconfig, session):
     brickconfig_uuid = brickconfig['uuid']
     if brickconfig_uuid is not None:
@@ -104,11 +545,33 @@ def _check_brickconfig_in_use(brickconfig, session):
         query = query.filter_by(brickconfig_uuid=brickconfig_uuid)
         query = query.filter_by(deleted=False)
 
-        try:
-            brick_ref = query.one()
-            raise exception.BrickConfigInUse(brick=brick_ref)
-        except NoResultFound:
-            pass
+        brick_ref = query.first()
+        if brick_ref is not None:
+            raise exception.BrickConfigInUse(brick=brick_ref['uuid'])
+
+
+def _health_values(report, host, checked_at):
+    return {'instance_id': report['instance_id'],
+            'host': host,
+            'domain_state': report.get('domain_state'),
+            'channel': bool(report.get('channel')),
+            'occupant': bool(report.get('occupant')),
+            'checked_at': checked_at}
+
+
+def _stats_archives():
+    """Return the configured stats archives as (resolution, slots) pairs."""
+    archives = []
+    for archive in CONF.conductor.stats_archives:
+        resolution, slots = archive.split(':')
+        archives.append((int(resolution), int(slots)))
+    return sorted(archives)
+
+
+def _stats_slot(timestamp, resolution, slots):
+    """Return the (slot, period) of a ring buffer a timestamp falls into."""
+    period = timestamp - timestamp % resolution
+    return (timestamp // resolution) % slots, period
 
 
 from bricks.db import api
@@ -120,6 +583,12 @@ class Connection(api.Connection):
     def __init__(self):
         pass
 
+    def unit_of_work(self, name=None):
+        return unit_of_work(name)
+
+    def primary_reads(self):
+        return primary_reads()
+
     def _add_brick_filters(self, query, filters):
         if filters is None:
             filters = {}
@@ -161,15 +630,94 @@ class Connection(api.Connection):
 
         return query
 
-    @objects.objectify(objects.Brick)
+    @objects.objectify_list(objects.Brick)
     def get_brick_list(self, filters=None, limit=None, marker=None,
                        sort_key=None, sort_dir=None):
-        query = model_query(models.Brick)
+        query = model_query(models.Brick, session=get_read_session())
+        query = query.options(*_lazy_options(objects.Brick))
         query = self._add_brick_filters(query, filters)
         return _paginate_query(models.Brick, limit, marker,
                                sort_key, sort_dir, query)
 
+    def _brick_row_query(self, columns, filters):
+        for column in columns:
+            if column not in models.Brick.__table__.columns:
+                raise exception.InvalidBrickColumn(column=column)
+
+        query = model_query(*[_decoded(models.Brick, column)
+                              for column in columns],
+                            session=get_read_session())
+        return self._add_brick_filters(query, filters)
+
+    def get_brick_rows(self, columns, filters=None, limit=None, marker=None,
+                       sort_key=None, sort_dir=None):
+        """Get a projection of the brick list.
+
+        Only the requested columns are selected, and rows come back as
+        light named tuples rather than Brick objects, for scans over the
+        whole fleet that only need a few fields of each brick.
+
+        :param columns: names of the brick columns to select.
+        :returns: a list of named tuples with the columns as attributes.
+        """
+        query = self._brick_row_query(columns, filters)
+        return _paginate_query(models.Brick, limit, marker,
+                               sort_key, sort_dir, query)
+
+    def get_brick_columns(self, brick_ids, columns):
+        return _get_columns_by_id(models.Brick, brick_ids, columns)
+
+    @objects.objectify_list(objects.Brick)
+    def _get_brick_chunk(self, filters, after_id, chunk_size):
+        query = model_query(models.Brick, session=get_read_session())
+        query = query.options(*_lazy_options(objects.Brick))
+        query = self._add_brick_filters(query, filters)
+        query = query.filter(models.Brick.id > after_id)
+        return query.order_by(models.Brick.id).limit(chunk_size).all()
+
+    def _get_brick_row_chunk(self, columns, filters, after_id, chunk_size):
+        query = self._brick_row_query(columns, filters)
+        query = query.filter(models.Brick.id > after_id)
+        return query.order_by(models.Brick.id).limit(chunk_size).all()
+
+    def iter_bricks(self, filters=None, chunk_size=None, columns=None):
+        """Iterate over every brick, fetching them a chunk at a time.
+
+        Chunks are paged by id rather than offset, so each one is a range
+        scan however deep into the fleet it is. Other greenthreads get to
+        run between chunks.
+
+        :param filters: the filters of get_brick_list.
+        :param chunk_size: bricks fetched per query, defaults to
+                           brick_scan_chunk_size.
+        :param columns: yield get_brick_rows style projections of these
+                        columns instead of Brick objects. id is always
+                        selected.
+        """
+        chunk_size = chunk_size or CONF.conductor.brick_scan_chunk_size
+        if columns is not None and 'id' not in columns:
+            columns = ['id'] + list(columns)
+
+        after_id = 0
+        while True:
+            with instrumentation.batched():
+                if columns is None:
+                    chunk = self._get_brick_chunk(filters, after_id,
+                                                  chunk_size)
+                else:
+                    chunk = self._get_brick_row_chunk(columns, filters,
+                                                      after_id, chunk_size)
+
+            for brick in chunk:
+                yield brick
+
+            if len(chunk) < chunk_size:
+                return
+            after_id = chunk[-1].id
+            greenthread.sleep(0)
+
     @objects.objectify(objects.Brick)
+    @_writes
     def create_brick(self, values):
         # ensure defaults are present for new bricks
         if not values.get('uuid'):
@@ -180,8 +728,26 @@ class Connection(api.Connection):
         brick = models.Brick()
         brick.update(values)
         brick.save()
+        _invalidate_brick_counts()
         return brick
 
+    @_writes
+    def create_bricks(self, values_list):
+        rows = []
+        for values in values_list:
+            values = dict(values)
+            if not values.get('uuid'):
+                values['uuid'] = utils.generate_uuid()
+            if not values.get('status'):
+                values['status'] = states.NOSTATE
+            rows.append(values)
+
+        session = get_session()
+        with session.begin():
+            _bulk_insert(session, models.Brick, rows)
+        _invalidate_brick_counts()
+        return [row['uuid'] for row in rows]
+
     @objects.objectify(objects.Brick)
     def get_brick(self, brick_id, tenant_id=None, instance_id=None):
         """Get an individual brick
@@ -191,7 +757,14 @@ class Connection(api.Connection):
         :param instance_id: instance filter, if provided overrides brick_id
                             for primary lookup.
         """
-        query = model_query(models.Brick)
+        session = get_read_session()
+        if instance_id is None:
+            ref = _identity_get(session, models.Brick, brick_id)
+            if (ref is not None and not ref.deleted and
+                    (not tenant_id or ref.tenant_id == tenant_id)):
+                return ref
+
+        query = model_query(models.Brick, session=session)
 
         if instance_id is not None:
             query = query.filter_by(instance_id=instance_id)
@@ -204,11 +777,12 @@ class Connection(api.Connection):
         query = query.filter_by(deleted=False)
 
         try:
-            return query.one()
+            return _identity_keep(query.one())
         except NoResultFound:
             raise exception.BrickNotFound(brick=brick_id)
 
     @objects.objectify(objects.Brick)
+    @_writes
     def update_brick(self, brick_id, values, tenant_id=None):
         session = get_session()
         with session.begin():
@@ -219,12 +793,13 @@ class Connection(api.Connection):
 
             query = query.filter_by(deleted=False)
 
-            count = query.update(values)
-            if count != 1:
+            ref = _update_returning(session, models.Brick, query, values)
+            if ref is None:
                 raise exception.BrickNotFound(brick=brick_id)
-            ref = query.one()
+        _invalidate_brick_counts(values)
         return ref
 
+    @_writes
     def destroy_brick(self, brick_id, tenant_id=None):
         session = get_session()
         with session.begin():
@@ -234,25 +809,179 @@ class Connection(api.Connection):
             if tenant_id:
                 query = query.filter_by(tenant_id=tenant_id)
 
-            try:
-                query.one()
-            except NoResultFound:
+            count = query.update({'deleted': True},
+                                 synchronize_session=False)
+            if count != 1:
                 raise exception.BrickNotFound(brick=brick_id)
+        _invalidate_brick_counts()
+
+    @_writes
+    def update_bricks(self, brick_ids, values):
+        session = get_session()
+        with session.begin():
+            query = model_query(models.Brick, session=session)
+            query = query.filter_by(deleted=False)
+            count = _bulk_update(session, query, models.Brick, brick_ids,
+                                 values)
+        _invalidate_brick_counts(values)
+        return count
 
-            query.update({'deleted': True})
+    @_writes
+    def destroy_bricks(self, brick_ids):
+        session = get_session()
+        with session.begin():
+            query = model_query(models.Brick, session=session)
+            query = query.filter_by(deleted=False)
+            count = _bulk_update(session, query, models.Brick, brick_ids,
+                                 {'deleted': True})
+        _invalidate_brick_counts()
+        return count
+
+    def archive_deleted_bricks(self, deleted_before, batch_size,
+                               max_rows=None, delay=0):
+        brick = models.Brick.__table__
+        shadow = models.ShadowBrick.__table__
+        log_chunk = models.BrickLogChunk.__table__
+        shadow_log_chunk = models.ShadowBrickLogChunk.__table__
+        health = models.BrickHealth.__table__
+        stats = models.BrickStats.__table__
+        columns = [column.name for column in brick.columns]
+        chunk_columns = [column.name for column in log_chunk.columns]
+
+        def archive_batch(limit):
+            session = get_session()
+            with session.begin():
+                # bricks are deleted by an update, so updated_at is when.
+                # Walking brick_deleted_updated_at_id only ever touches
+                # the rows this batch moves.
+                query = model_query(models.Brick.id, models.Brick.instance_id,
+                                    session=session)
+                query = query.filter_by(deleted=True)
+                query = query.filter(models.Brick.updated_at < deleted_before)
+                rows = query.order_by(models.Brick.updated_at,
+                                      models.Brick.id).limit(limit).all()
+                ids = [row.id for row in rows]
+                if ids:
+                    session.execute(shadow.insert().from_select(
+                        columns,
+                        sa.select([brick.c[name] for name in columns])
+                        .where(brick.c.id.in_(ids))))
+                    session.execute(brick.delete().where(
+                        brick.c.id.in_(ids)))
+                    session.execute(shadow_log_chunk.insert().from_select(
+                        chunk_columns,
+                        sa.select([log_chunk.c[name]
+                                   for name in chunk_columns])
+                        .where(log_chunk.c.brick_id.in_(ids))))
+                    session.execute(log_chunk.delete().where(
+                        log_chunk.c.brick_id.in_(ids)))
+
+                    # the health and usage of instances no brick is left on
+                    instance_ids = set(row.instance_id for row in rows)
+                    for table in (health, stats):
+                        session.execute(table.delete().where(sa.and_(
+                            table.c.instance_id.in_(instance_ids),
+                            ~sa.exists().where(
+                                brick.c.instance_id == table.c.instance_id))))
+            return len(ids)
+
+        return _in_batches(archive_batch, batch_size, max_rows, delay)
+
+    def purge_shadow_bricks(self, deleted_before, batch_size, max_rows=None,
+                            delay=0):
+        shadow = models.ShadowBrick.__table__
+        shadow_log_chunk = models.ShadowBrickLogChunk.__table__
+
+        def purge_batch(limit):
+            session = get_session()
+            with session.begin():
+                query = model_query(models.ShadowBrick.id, session=session)
+                query = query.filter(
+                    models.ShadowBrick.updated_at < deleted_before)
+                ids = [row.id for row in
+                       query.order_by(models.ShadowBrick.id).limit(limit)]
+                if ids:
+                    session.execute(shadow.delete().where(
+                        shadow.c.id.in_(ids)))
+                    session.execute(shadow_log_chunk.delete().where(
+                        shadow_log_chunk.c.brick_id.in_(ids)))
+            return len(ids)
+
+        return _in_batches(purge_batch, batch_size, max_rows, delay)
+
+    def get_brick_counts(self, group_by, filters=None):
+        if group_by not in BRICK_COUNT_GROUPS:
+            raise exception.InvalidBrickColumn(column=group_by)
+
+        key = (group_by, tuple(sorted((filters or {}).items())))
+        now = timeutils.utcnow_ts()
+        cached = _BRICK_COUNTS.get(key)
+        if cached is not None and cached[0] > now:
+            return dict(cached[1])
+
+        column = getattr(models.Brick, group_by)
+        query = model_query(column, sa.func.count(models.Brick.id),
+                            session=get_read_session())
+        query = self._add_brick_filters(query, filters)
+        counts = dict(query.group_by(column).all())
+
+        if CONF.database.brick_counts_ttl > 0:
+            _BRICK_COUNTS[key] = (now + CONF.database.brick_counts_ttl,
+                                  counts)
+        return dict(counts)
+
+    @_writes
+    @objects.objectify(objects.BrickLogChunk)
+    def append_brick_log(self, brick_id, data):
+        for attempt in range(LOG_APPEND_ATTEMPTS):
+            session = get_session()
+            try:
+                with session.begin():
+                    query = model_query(sa.func.max(models.BrickLogChunk.seq),
+                                        session=session)
+                    query = query.filter(
+                        models.BrickLogChunk.brick_id == brick_id)
+                    last_seq = query.scalar() or 0
+
+                    chunk = models.BrickLogChunk()
+                    chunk.update({'brick_id': brick_id,
+                                  'seq': last_seq + 1,
+                                  'data': data})
+                    session.add(chunk)
+                return chunk
+            except db_exc.DBDuplicateEntry:
+                # another writer took the sequence number
+                if attempt == LOG_APPEND_ATTEMPTS - 1:
+                    raise
+
+    @objects.objectify_list(objects.BrickLogChunk)
+    def get_brick_log(self, brick_id, since_seq=None, last=None):
+        query = model_query(models.BrickLogChunk,
+                            session=get_read_session())
+        query = query.filter_by(brick_id=brick_id)
+        if since_seq is not None:
+            query = query.filter(models.BrickLogChunk.seq > since_seq)
+
+        if last is not None:
+            query = query.order_by(models.BrickLogChunk.seq.desc())
+            return list(reversed(query.limit(last).all()))
+        return query.order_by(models.BrickLogChunk.seq).all()
 
     #################
     # BrickConfig API
 
-    @objects.objectify(objects.BrickConfig)
+    @objects.objectify_list(objects.BrickConfig)
     def get_brickconfig_list(self, filters=None, limit=None, marker=None,
                              sort_key=None, sort_dir=None):
-        query = model_query(models.BrickConfig)
+        query = model_query(models.BrickConfig,
+                            session=get_read_session())
+        query = query.options(*_lazy_options(objects.BrickConfig))
         query = self._add_brickconfig_filters(query, filters)
         return _paginate_query(models.BrickConfig, limit, marker, sort_key,
                                sort_dir, query)
 
     @objects.objectify(objects.BrickConfig)
+    @_writes
     def create_brickconfig(self, values):
         if not values.get('uuid'):
             values['uuid'] = utils.generate_uuid()
@@ -264,97 +993,312 @@ class Connection(api.Connection):
         bc.save()
         return bc
 
+    def get_brickconfig_columns(self, brickconfig_ids, columns):
+        return _get_columns_by_id(models.BrickConfig, brickconfig_ids,
+                                  columns)
+
     @objects.objectify(objects.BrickConfig)
     def get_brickconfig(self, brickconfig_id):
-        query = model_query(models.BrickConfig)
+        session = get_read_session()
+        ref = _identity_get(session, models.BrickConfig, brickconfig_id)
+        if ref is not None:
+            return ref
+
+        query = model_query(models.BrickConfig, session=session)
         query = add_identity_filter(query, brickconfig_id)
 
         try:
-            return query.one()
+            return _identity_keep(query.one())
         except NoResultFound:
             raise exception.BrickConfigNotFound(brickconfig=brickconfig_id)
 
     @objects.objectify(objects.BrickConfig)
-    def update_brickconfig(self, brickconfig_id, values):
+    @_writes
+    def update_brickconfig(self, brickconfig_id, values, expected=None):
         session = get_session()
         with session.begin():
             query = model_query(models.BrickConfig, session=session)
             query = add_identity_filter(query, brickconfig_id)
 
-            count = query.update(values)
-            if count != 1:
+            ref = _update_returning(session, models.BrickConfig, query,
+                                    values, expected)
+            if ref is None:
+                if expected and query.count():
+                    raise exception.PreconditionFailed()
                 raise exception.BrickConfigNotFound(brickconfig=brickconfig_id)
-            ref = query.one()
         return ref
 
+    @_writes
     def destroy_brickconfig(self, brickconfig_id):
         session = get_session()
         with session.begin():
             query = model_query(models.BrickConfig, session=session)
             query = add_identity_filter(query, brickconfig_id)
 
-            try:
-                ref = query.one()
-            except NoResultFound:
-                raise exception.BrickConfigNotFound(brickconfig=brickconfig_id)
+            count = query.filter(~_brickconfig_in_use_filter()).delete(
+                synchronize_session=False)
+            if count == 1:
+                return
 
+            # find out why nothing was deleted
+            ref = query.first()
+            if ref is None:
+                raise exception.BrickConfigNotFound(brickconfig=brickconfig_id)
             _check_brickconfig_in_use(ref, session)
 
-            query.delete()
-
     #####################
     # ConfigFile API
 
-    @objects.objectify(objects.ConfigFile)
+    @objects.objectify_list(objects.ConfigFile)
     def get_configfile_list(self, filters=None, limit=None,
                             marker=None, sort_key=None, sort_dir=None):
-        query = model_query(models.ConfigFile)
+        query = model_query(models.ConfigFile,
+                            session=get_read_session())
+        query = query.options(*_lazy_options(objects.ConfigFile))
         query = self._add_configfile_filters(query, filters)
         return _paginate_query(models.ConfigFile, limit, marker, sort_key,
                                sort_dir, query)
 
     @objects.objectify(objects.ConfigFile)
+    @_writes
+    @_blob_writes
     def create_configfile(self, values):
         if not values.get('uuid'):
             values['uuid'] = utils.generate_uuid()
+        values, blobs = _blob_values(values)
 
-        bcf = models.ConfigFile()
-        bcf.update(values)
-        bcf.save()
+        session = get_session()
+        with session.begin():
+            _ref_blobs(session, blobs, dict.fromkeys(blobs, 1))
+            bcf = models.ConfigFile()
+            bcf.update(values)
+            bcf.save(session=session)
         return bcf
 
+    @_writes
+    @_blob_writes
+    def create_configfiles(self, values_list):
+        blobs = {}
+        refs = collections.defaultdict(int)
+        rows = []
+        for values in values_list:
+            values = dict(values)
+            if not values.get('uuid'):
+                values['uuid'] = utils.generate_uuid()
+            values, values_blobs = _blob_values(values)
+            blobs.update(values_blobs)
+            for sha256 in values_blobs:
+                refs[sha256] += 1
+            rows.append(values)
+
+        session = get_session()
+        with session.begin():
+            _ref_blobs(session, blobs, refs)
+            _bulk_insert(session, models.ConfigFile, rows)
+        return [row['uuid'] for row in rows]
+
+    def get_configfile_columns(self, configfile_ids, columns):
+        return _get_columns_by_id(models.ConfigFile, configfile_ids, columns)
+
     @objects.objectify(objects.ConfigFile)
     def get_configfile(self, bcf_id):
-        query = model_query(models.ConfigFile)
+        session = get_read_session()
+        ref = _identity_get(session, models.ConfigFile, bcf_id)
+        if ref is not None:
+            return ref
+
+        query = model_query(models.ConfigFile, session=session)
         query = add_identity_filter(query, bcf_id)
 
         try:
-            return query.one()
+            return _identity_keep(query.one())
         except NoResultFound:
             raise exception.ConfigFileNotFound(configfile=bcf_id)
 
     @objects.objectify(objects.ConfigFile)
-    def update_configfile(self, bcf_id, values):
+    @_writes
+    @_blob_writes
+    def update_configfile(self, bcf_id, values, expected=None):
+        values, blobs = _blob_values(values)
+
         session = get_session()
         with session.begin():
             query = model_query(models.ConfigFile, session=session)
             query = add_identity_filter(query, bcf_id)
 
-            count = query.update(values)
-            if count != 1:
+            if 'contents_sha256' in values:
+                old = query.with_entities(
+                    models.ConfigFile.contents_sha256).with_lockmode(
+                        'update').first()
+                if old is None:
+                    raise exception.ConfigFileNotFound(configfile=bcf_id)
+                if old.contents_sha256 == values['contents_sha256']:
+                    del values['contents_sha256']
+                else:
+                    _ref_blobs(session, blobs, dict.fromkeys(blobs, 1))
+                    if old.contents_sha256 is not None:
+                        _unref_blobs(session, {old.contents_sha256: 1})
+
+            if not values:
+                ref = _filter_expected(query, models.ConfigFile,
+                                       expected).first()
+            else:
+                ref = _update_returning(session, models.ConfigFile, query,
+                                        values, expected)
+            if ref is None:
+                if expected and query.count():
+                    raise exception.PreconditionFailed()
                 raise exception.ConfigFileNotFound(configfile=bcf_id)
-            ref = query.one()
         return ref
 
+    @_writes
     def destroy_configfile(self, bcf_id):
         session = get_session()
         with session.begin():
             query = model_query(models.ConfigFile, session=session)
             query = add_identity_filter(query, bcf_id)
 
-            try:
-                query.one()
-            except NoResultFound:
+            ref = query.with_entities(
+                models.ConfigFile.contents_sha256).with_lockmode(
+                    'update').first()
+            if ref is None or query.delete(synchronize_session=False) != 1:
                 raise exception.ConfigFileNotFound(configfile=bcf_id)
+            if ref.contents_sha256 is not None:
+                _unref_blobs(session, {ref.contents_sha256: 1})
+
+    #################
+    # BrickHealth API
+
+    def update_brick_health(self, host, instances):
+        """Record the health a mortar host reported for its instances.
+
+        Rows are keyed on instance_id, so each brick only ever holds its
+        latest health check.
+
+        :param host: the mortar host that ran the health check.
+        :param instances: list of dicts with instance_id, domain_state,
+                          channel and occupant keys.
+        """
+        if not instances:
+            return
+
+        checked_at = timeutils.utcnow()
+        reports = dict((i['instance_id'], i) for i in instances)
+
+        session = get_session()
+        with session.begin():
+            query = model_query(models.BrickHealth, session=session)
+            query = query.filter(
+                models.BrickHealth.instance_id.in_(reports.keys()))
+
+            for ref in query.all():
+                ref.update(_health_values(reports.pop(ref.instance_id),
+                                          host, checked_at))
+
+            for report in reports.values():
+                ref = models.BrickHealth()
+                ref.update(_health_values(report, host, checked_at))
+                session.add(ref)
+
+    @objects.objectify(objects.BrickHealth)
+    def get_brick_health(self, instance_id):
+        query = model_query(models.BrickHealth)
+        query = query.filter_by(instance_id=instance_id)
+
+        try:
+            return query.one()
+        except NoResultFound:
+            raise exception.BrickHealthNotFound(brick=instance_id)
+
+    #################
+    # BrickStats API
+
+    def add_brick_stats(self, samples):
+        """Fold a batch of resource usage samples into each brick's
+        downsampled ring buffers.
+
+        A sample landing in a slot that still holds an older period
+        replaces it, otherwise it is added to the slot's running sums.
+
+        :param samples: list of dicts with instance_id, timestamp and the
+                        usage keys of objects.BrickStats.
+        """
+        if not samples:
+            return
+
+        archives = _stats_archives()
+        keys = set()
+        for sample in samples:
+            for resolution, slots in archives:
+                keys.add((resolution,
+                          _stats_slot(int(sample['timestamp']),
+                                      resolution, slots)[0]))
+
+        session = get_session()
+        with session.begin():
+            query = model_query(models.BrickStats, session=session)
+            query = query.filter(models.BrickStats.instance_id.in_(
+                set(s['instance_id'] for s in samples)))
+            query = query.filter(sa.or_(*[
+                sa.and_(models.BrickStats.resolution == key[0],
+                        models.BrickStats.slot == key[1])
+                for key in keys]))
+            refs = dict(((r.instance_id, r.resolution, r.slot), r)
+                        for r in query.all())
+
+            for sample in samples:
+                for resolution, slots in archives:
+                    slot, period = _stats_slot(int(sample['timestamp']),
+                                               resolution, slots)
+                    key = (sample['instance_id'], resolution, slot)
+                    ref = refs.get(key)
+
+                    if ref is None:
+                        ref = models.BrickStats()
+                        ref.update({'instance_id': sample['instance_id'],
+                                    'resolution': resolution,
+                                    'slot': slot})
+                        session.add(ref)
+                        refs[key] = ref
+
+                    if ref.period != period:
+                        ref.period = period
+                        ref.samples = 0
+                        for field in objects.BrickStats.STATS_FIELDS:
+                            ref[field] = 0
+
+                    ref.samples += 1
+                    for field in objects.BrickStats.STATS_FIELDS:
+                        ref[field] += sample.get(field) or 0
+
+    @objects.objectify_list(objects.BrickStats)
+    def get_brick_stats(self, instance_id, resolution=None):
+        """Get a brick's usage history at one resolution, oldest first.
+
+        :param instance_id: instance of the brick.
+        :param resolution: seconds per sample, defaults to the finest
+                           configured archive.
+        """
+        archives = dict(_stats_archives())
+        if resolution is None:
+            resolution = min(archives)
+        elif resolution not in archives:
+            raise exception.InvalidStatsResolution(resolution=resolution)
+
+        # slots older than one full turn of the ring are stale
+        oldest = timeutils.utcnow_ts() - resolution * archives[resolution]
+
+        query = model_query(models.BrickStats)
+        query = query.filter_by(instance_id=instance_id,
+                                resolution=resolution)
+        query = query.filter(models.BrickStats.period > oldest)
+        return query.order_by(models.BrickStats.period).all()
+
+    #########
+    # Metrics
+
+    def get_query_metrics(self):
+        return instrumentation.get_engine_metrics()
 
-            query.delete()
+    def get_scope_metrics(self):
+        return instrumentation.get_scope_metrics()
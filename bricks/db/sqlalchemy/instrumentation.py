@@ -0,0 +1,206 @@
+# -*- encoding: utf-8 -*-
+
+"""Statement counting on the SQLAlchemy engine events.
+
+Statements and the time spent in them are counted per engine role, and
+per named scope: an API request, a conductor RPC handler or periodic
+task. Within one run of a scope, the same statement shape coming back
+n_plus_one_threshold times or more is logged as a probable N+1 query,
+unless it ran batched, and statements slower than slow_query_threshold
+are logged with the code that issued them.
+"""
+
+import collections
+import contextlib
+import copy
+import os
+import re
+import time
+import traceback
+import weakref
+
+from oslo.config import cfg
+import sqlalchemy as sa
+
+from bricks.openstack.common import local
+from bricks.openstack.common import log
+
+instrumentation_opts = [
+    cfg.FloatOpt('slow_query_threshold',
+                 default=0.5,
+                 help='Seconds after which a statement is logged as slow, '
+                      'with the code that issued it. Zero disables the '
+                      'slow query log.'),
+    cfg.IntOpt('n_plus_one_threshold',
+               default=10,
+               help='Times the same statement may run within one API '
+                    'request, RPC handler or periodic task before it is '
+                    'logged as a probable N+1 query. Zero disables the '
+                    'check.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(instrumentation_opts, 'database')
+
+LOG = log.getLogger(__name__)
+
+# frames of these directories are skipped looking for the code that
+# issued a statement
+_BRICKS_DIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+_LIBRARY_DIRS = tuple(os.path.join(_BRICKS_DIR, name) + os.sep
+                      for name in ('db', 'objects', 'openstack'))
+
+# IN lists, whose length varies between runs of the same statement
+_PARAMETER_LIST = re.compile(r'\((?:\s*(?:\?|%s|:\w+)\s*,)+'
+                             r'\s*(?:\?|%s|:\w+)\s*\)')
+
+# totals per engine role and per scope name
+_ENGINE_METRICS = {}
+_SCOPE_METRICS = {}
+_INSTRUMENTED = weakref.WeakKeyDictionary()
+
+
+class Scope(object):
+    """The statements run in one API request, RPC handler or periodic
+    task.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.statements = 0
+        self.seconds = 0.0
+        self.shapes = collections.defaultdict(int)
+        # the shapes run inside batched(), and its blocks entered
+        self.batched = set()
+        self.batching = 0
+
+    def repeated(self):
+        """The statement shapes run n_plus_one_threshold times or more,
+        as (shape, count) pairs, leaving out those run batched.
+        """
+        threshold = CONF.database.n_plus_one_threshold
+        if threshold <= 0:
+            return []
+        return [(shape, count) for shape, count in self.shapes.items()
+                if count >= threshold and shape not in self.batched]
+
+
+def current_scope():
+    return getattr(local.store, 'query_scope', None)
+
+
+@contextlib.contextmanager
+def scope(name):
+    """Count the statements the current thread runs in the block under
+    name, rather than under the scope it is nested in.
+    """
+    outer = current_scope()
+    inner = Scope(name)
+    local.store.query_scope = inner
+    try:
+        yield inner
+    finally:
+        if outer is None:
+            del local.store.query_scope
+        else:
+            local.store.query_scope = outer
+        _record(inner)
+
+
+@contextlib.contextmanager
+def batched():
+    """Exempt the statements the current thread runs in the block from the
+    N+1 check of the current scope: one chunk of a scan, or one batch of a
+    bulk write, repeated by design.
+    """
+    current = current_scope()
+    if current is None:
+        yield
+        return
+    current.batching += 1
+    try:
+        yield
+    finally:
+        current.batching -= 1
+
+
+def _record(inner):
+    metrics = _SCOPE_METRICS.setdefault(inner.name, {'calls': 0,
+                                                     'statements': 0,
+                                                     'seconds': 0.0,
+                                                     'n_plus_one': 0})
+    metrics['calls'] += 1
+    metrics['statements'] += inner.statements
+    metrics['seconds'] += inner.seconds
+    for shape, count in inner.repeated():
+        metrics['n_plus_one'] += 1
+        LOG.warning("Probable N+1 query in %(scope)s, run %(count)d "
+                    "times: %(statement)s",
+                    {'scope': inner.name, 'count': count, 'statement': shape})
+
+
+def _shape(statement):
+    return _PARAMETER_LIST.sub('(...)', statement)
+
+
+def _call_site():
+    """The bricks code outside of the db api that issued the statement
+    being run.
+    """
+    for filename, lineno, function, _text in reversed(
+            traceback.extract_stack()):
+        filename = os.path.abspath(filename)
+        if (filename.startswith(_BRICKS_DIR) and
+                not filename.startswith(_LIBRARY_DIRS)):
+            return '%s:%d in %s' % (os.path.relpath(filename, _BRICKS_DIR),
+                                    lineno, function)
+    return 'unknown'
+
+
+def instrument(engine, role):
+    """Count the statements engine runs, and their time, under role and
+    the current scope.
+    """
+    if engine in _INSTRUMENTED:
+        return
+    _INSTRUMENTED[engine] = role
+    metrics = _ENGINE_METRICS.setdefault(role, {'statements': 0,
+                                                'seconds': 0.0})
+
+    def before_execute(conn, cursor, statement, parameters, context,
+                       executemany):
+        conn.info['query_started_at'] = time.time()
+
+    def after_execute(conn, cursor, statement, parameters, context,
+                      executemany):
+        seconds = time.time() - conn.info['query_started_at']
+        metrics['statements'] += 1
+        metrics['seconds'] += seconds
+
+        current = current_scope()
+        if current is not None:
+            current.statements += 1
+            current.seconds += seconds
+            shape = _shape(statement)
+            current.shapes[shape] += 1
+            if current.batching:
+                current.batched.add(shape)
+
+        threshold = CONF.database.slow_query_threshold
+        if threshold > 0 and seconds >= threshold:
+            LOG.warning("Slow query (%(seconds).3fs) from %(site)s: "
+                        "%(statement)s",
+                        {'seconds': seconds, 'site': _call_site(),
+                         'statement': statement})
+
+    sa.event.listen(engine, 'before_cursor_execute', before_execute)
+    sa.event.listen(engine, 'after_cursor_execute', after_execute)
+
+
+def get_engine_metrics():
+    return copy.deepcopy(_ENGINE_METRICS)
+
+
+def get_scope_metrics():
+    return copy.deepcopy(_SCOPE_METRICS)
@@ -3,17 +3,18 @@
 SQLAlchemy models for baremetal data.
 """
 
-import json
 import urlparse
 
 from oslo.config import cfg
 
 from sqlalchemy import Boolean, Column, DateTime
-from sqlalchemy import Integer, Index
-from sqlalchemy import schema, String, Text
+from sqlalchemy import Float, Integer, Index, inspect
+from sqlalchemy import orm
+from sqlalchemy import schema, select, String, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.types import TypeDecorator, VARCHAR
 
+from bricks.common import json_codec
 from bricks.openstack.common.db.sqlalchemy import models
 
 sql_opts = [
@@ -34,11 +35,22 @@ def table_args():
 
 
 class JsonEncodedType(TypeDecorator):
-    """Abstract base type serialized as json-encoded string in db."""
+    """Abstract base type serialized as json-encoded string in db.
+
+    Values are read back as json_codec.RawJSON, to be decoded on first
+    access, unless the type is created with lazy=False.
+    """
     type = None
     impl = VARCHAR
 
+    def __init__(self, *args, **kwargs):
+        self.lazy = kwargs.pop('lazy', True)
+        super(JsonEncodedType, self).__init__(*args, **kwargs)
+
     def process_bind_param(self, value, dialect):
+        if type(value) is json_codec.RawJSON:
+            # read back and never decoded, so never changed either
+            return value
         if value is None:
             # Save default value according to current type to keep the
             # interface the consistent.
@@ -48,12 +60,15 @@ class JsonEncodedType(TypeDecorator):
                             % (self.__class__.__name__,
                                self.type.__name__,
                                type(value).__name__))
-        serialized_value = json.dumps(value)
+        serialized_value = json_codec.dumps(value)
         return serialized_value
 
     def process_result_value(self, value, dialect):
         if value is not None:
-            value = json.loads(value)
+            if self.lazy:
+                value = json_codec.RawJSON(value)
+            else:
+                value = json_codec.loads(value)
         return value
 
 
@@ -78,6 +93,12 @@ class BricksBase(models.TimestampMixin,
             d[c.name] = self[c.name]
         return d
 
+    def deferred(self, key):
+        """Whether a column was deferred by the query that loaded us, and
+        would cost a query of its own to read.
+        """
+        return key in inspect(self).callables
+
 
 Base = declarative_base(cls=BricksBase)
 
@@ -110,6 +131,22 @@ class BrickConfig(Base):
     help_link = Column(String(255), nullable=True)
 
 
+class ConfigFileBlob(Base):
+    """The contents of configfiles, stored once per distinct body under
+    its sha256. refcount is the number of configfiles using it.
+    """
+
+    __tablename__ = 'configfile_blob'
+    __table_args__ = (
+        schema.UniqueConstraint('sha256', name='uniq_configfile_blob0sha256'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    sha256 = Column(String(64))
+    contents = Column(Text)
+    refcount = Column(Integer, default=0)
+
+
 class ConfigFile(Base):
     __tablename__ = 'brickconfig_file'
     __table_args__ = (
@@ -122,7 +159,13 @@ class ConfigFile(Base):
     brickconfig_uuid = Column(String(36))
     name = Column(String(255))
     description = Column(Text, nullable=True)
-    contents = Column(Text, nullable=True)
+    contents_sha256 = Column(String(64), nullable=True)
+
+    # read only, contents are written to their blob by the db api
+    contents = orm.column_property(
+        select([ConfigFileBlob.contents]).where(
+            ConfigFileBlob.sha256 == contents_sha256).correlate_except(
+                ConfigFileBlob).as_scalar())
 
 
 class Brick(Base):
@@ -133,8 +176,10 @@ class Brick(Base):
         schema.UniqueConstraint('uuid', name='uniq_brick0uuid'),
         Index('brick_config_uuid', 'brickconfig_uuid'),
         Index('brick_tenant_id', 'tenant_id'),
-        Index('brick_instance_uuid', 'instance_id'),
-        Index('brick_deleted', 'deleted')
+        Index('brick_instance_id_deleted', 'instance_id', 'deleted'),
+        Index('brick_deleted_status_id', 'deleted', 'status', 'id'),
+        Index('brick_deleted_tenant_id_id', 'deleted', 'tenant_id', 'id'),
+        Index('brick_deleted_updated_at_id', 'deleted', 'updated_at', 'id'),
     )
 
     id = Column(Integer, primary_key=True)
@@ -146,7 +191,115 @@ class Brick(Base):
     tenant_id = Column(String(255))
     status = Column(String(36))
     configuration = Column(JSONEncodedDict)
-    deploy_log = Column(Text)
 
     # deleted flag, we don't actualyl want to delete data here.
     deleted = Column(Boolean, default=False)
+
+
+class ShadowBrick(Base):
+    """A deleted brick, archived out of the brick table.
+
+    Has the columns of Brick, so rows move across as they are.
+    """
+
+    __tablename__ = 'shadow_brick'
+    __table_args__ = (
+        Index('shadow_brick_updated_at', 'updated_at'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    uuid = Column(String(36))
+    brickconfig_uuid = Column(String(36), nullable=True)
+
+    deployed_at = Column(DateTime, nullable=True)
+    instance_id = Column(String(36))
+    tenant_id = Column(String(255))
+    status = Column(String(36))
+    configuration = Column(JSONEncodedDict)
+
+    deleted = Column(Boolean, default=True)
+
+
+class BrickLogChunk(Base):
+    """A piece of a brick's deploy log. Logs only ever grow, by inserting
+    the next chunk in sequence.
+    """
+
+    __tablename__ = 'brick_log_chunk'
+    __table_args__ = (
+        schema.UniqueConstraint('brick_id', 'seq',
+                                name='uniq_brick_log_chunk0brick_id0seq'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    brick_id = Column(Integer)
+    seq = Column(Integer)
+    data = Column(Text)
+
+
+class ShadowBrickLogChunk(Base):
+    """A piece of an archived brick's deploy log.
+
+    Has the columns of BrickLogChunk, so rows move across as they are.
+    """
+
+    __tablename__ = 'shadow_brick_log_chunk'
+    __table_args__ = (
+        Index('shadow_brick_log_chunk_brick_id', 'brick_id'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    brick_id = Column(Integer)
+    seq = Column(Integer)
+    data = Column(Text)
+
+
+class BrickHealth(Base):
+    """Last known health of a brick's instance, as reported by mortar."""
+
+    __tablename__ = 'brick_health'
+    __table_args__ = (
+        schema.UniqueConstraint('instance_id',
+                                name='uniq_brick_health0instance_id'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    instance_id = Column(String(36))
+    host = Column(String(255), nullable=True)
+
+    domain_state = Column(String(36), nullable=True)
+    channel = Column(Boolean, default=False)
+    occupant = Column(Boolean, default=False)
+    checked_at = Column(DateTime, nullable=True)
+
+
+class BrickStats(Base):
+    """One slot of a brick's downsampled resource usage ring buffer.
+
+    Each (instance_id, resolution) pair owns a fixed number of slots which
+    are reused as time wraps around. Usage values are stored as sums over
+    `samples` readings taken within the slot's period.
+    """
+
+    __tablename__ = 'brick_stats'
+    __table_args__ = (
+        schema.UniqueConstraint('instance_id', 'resolution', 'slot',
+                                name='uniq_brick_stats0instance_id0'
+                                     'resolution0slot'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    instance_id = Column(String(36))
+    resolution = Column(Integer)
+    slot = Column(Integer)
+    # start of the period, in seconds since the epoch
+    period = Column(Integer)
+    samples = Column(Integer, default=0)
+
+    cpu = Column(Float, default=0)
+    mem_used = Column(Float, default=0)
+    mem_total = Column(Float, default=0)
+    disk_read = Column(Float, default=0)
+    disk_write = Column(Float, default=0)
+    net_rx = Column(Float, default=0)
+    net_tx = Column(Float, default=0)
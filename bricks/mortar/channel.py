@@ -0,0 +1,256 @@
+"""
+Persistent, multiplexed connections to the occupants of local instances.
+
+Mortar holds one :py:class:`OccupantChannel` per local brick instance, open
+against the instance's ``bricks.socket`` virtio channel. Frames are newline
+delimited JSON objects carrying a ``type``:
+
+    task    mortar -> occupant: a set of files to deploy, under ``files``.
+    ping    mortar -> occupant: liveness probe.
+    ack     occupant -> mortar: answer to a task or ping, naming the
+            request's ``id`` in ``reply_to``. Tasks are acked with ``ok``.
+    state   occupant -> mortar: the ``state`` of the running task, one of
+            bricks.objects.mortar_task.STATE_LIST.
+    log     occupant -> mortar: a chunk of the occupant's log in ``data``.
+
+Channels reconnect on their own, so a rebooted guest picks its channel back
+up without mortar having to notice.
+"""
+
+import collections
+import itertools
+import socket
+
+from eventlet import event
+from eventlet import greenthread
+from eventlet import timeout as eventlet_timeout
+from oslo.config import cfg
+
+from bricks.common import exception
+from bricks.openstack.common import jsonutils
+from bricks.openstack.common import log
+
+LOG = log.getLogger(__name__)
+
+channel_opts = [
+    cfg.BoolOpt('persistent_channels',
+                default=False,
+                help='Hold one multiplexed connection open to the occupant '
+                     'of every local instance, instead of connecting per '
+                     'task. Requires an occupant that speaks the framed '
+                     'channel protocol.'),
+    cfg.IntOpt('channel_reconnect_interval',
+               default=5,
+               help='Seconds between attempts to reconnect a dropped '
+                    'occupant channel.'),
+    cfg.IntOpt('channel_request_timeout',
+               default=10,
+               help='Seconds to wait for an occupant to acknowledge a '
+                    'request.'),
+    cfg.IntOpt('channel_log_lines',
+               default=500,
+               help='Lines of occupant log kept in memory per instance.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(channel_opts, 'mortar')
+
+
+class OccupantChannel(object):
+    """A self-healing connection to the occupant of a single instance."""
+
+    def __init__(self, instance_id, socket_file, notify):
+        """Open nothing yet, the connection is made by :py:meth:`start`.
+
+        :param instance_id: the instance whose occupant is on the other end.
+        :param socket_file: path of the instance's bricks.socket.
+        :param notify: callable(instance_id, frame) receiving every frame
+                       that is not an answer to one of our requests.
+        """
+        self.instance_id = instance_id
+        self.socket_file = socket_file
+        self.state = None
+        self.log = collections.deque(maxlen=CONF.mortar.channel_log_lines)
+
+        self._notify = notify
+        self._sock = None
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._opened = event.Event()
+        self._running = False
+        self._thread = None
+
+    @property
+    def connected(self):
+        return self._sock is not None
+
+    def start(self):
+        self._running = True
+        self._thread = greenthread.spawn(self._run)
+
+    def stop(self):
+        self._running = False
+        self._disconnect()
+        if not self._opened.ready():
+            self._opened.send_exception(exception.OccupantChannelError(
+                instance=self.instance_id, reason='stopped'))
+        if self._thread is not None:
+            self._thread.kill()
+            self._thread = None
+
+    def request(self, frame_type, **payload):
+        """Send a frame and wait for the occupant to acknowledge it.
+
+        A channel that is started but not (re)connected yet is waited for,
+        within the same channel_request_timeout.
+
+        :returns: the occupant's ack frame.
+        :raises: OccupantChannelError when the channel is not started, or
+                 is not up and the occupant has not answered within
+                 channel_request_timeout.
+        """
+        if not self._running:
+            raise exception.OccupantChannelError(instance=self.instance_id,
+                                                 reason='not connected')
+
+        request_id = next(self._ids)
+        waiter = event.Event()
+        self._pending[request_id] = waiter
+
+        frame = dict(payload, id=request_id, type=frame_type)
+        try:
+            with eventlet_timeout.Timeout(
+                    CONF.mortar.channel_request_timeout):
+                while self._sock is None:
+                    self._opened.wait()
+                self._sock.sendall(jsonutils.dumps(frame) + '\n')
+                return waiter.wait()
+        except (socket.error, eventlet_timeout.Timeout) as e:
+            raise exception.OccupantChannelError(instance=self.instance_id,
+                                                 reason=e)
+        finally:
+            self._pending.pop(request_id, None)
+
+    def push_task(self, files):
+        """Hand a task's files to the occupant.
+
+        :returns: whether the occupant accepted the task.
+        """
+        return bool(self.request('task', files=files).get('ok'))
+
+    def ping(self):
+        try:
+            self.request('ping')
+        except exception.OccupantChannelError:
+            return False
+        return True
+
+    def _run(self):
+        while self._running:
+            try:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.connect(self.socket_file)
+                self._sock = sock
+                self._opened.send()
+                LOG.debug("Occupant channel open for %s" % self.instance_id)
+                self._read()
+            except socket.error as e:
+                LOG.debug("Occupant channel for %s dropped: %s" % (
+                    self.instance_id, e))
+
+            self._disconnect()
+            if self._running:
+                greenthread.sleep(CONF.mortar.channel_reconnect_interval)
+
+    def _read(self):
+        buf = ''
+        while True:
+            data = self._sock.recv(4096)
+            if not data:
+                # the guest went away, qemu closed its end.
+                return
+
+            buf += data
+            while '\n' in buf:
+                line, buf = buf.split('\n', 1)
+                if line.strip():
+                    self._dispatch(line)
+
+    def _dispatch(self, line):
+        try:
+            frame = jsonutils.loads(line)
+        except ValueError:
+            LOG.warning("Dropping malformed frame from %s: %r" % (
+                self.instance_id, line))
+            return
+        if not isinstance(frame, dict):
+            LOG.warning("Dropping non-object frame from %s: %r" % (
+                self.instance_id, line))
+            return
+
+        waiter = self._pending.get(frame.get('reply_to'))
+        if waiter is not None:
+            waiter.send(frame)
+            return
+
+        if frame.get('type') == 'state':
+            self.state = frame.get('state')
+        elif frame.get('type') == 'log':
+            self.log.extend(frame.get('data', '').splitlines())
+
+        try:
+            self._notify(self.instance_id, frame)
+        except Exception:
+            # a broken listener must not take the channel down with it.
+            LOG.exception("Error handling frame from %s" % self.instance_id)
+
+    def _disconnect(self):
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            sock.close()
+            self._opened = event.Event()
+
+        for waiter in self._pending.values():
+            if not waiter.ready():
+                waiter.send_exception(exception.OccupantChannelError(
+                    instance=self.instance_id, reason='disconnected'))
+
+
+class ChannelManager(object):
+    """Keeps exactly one channel open per local brick instance."""
+
+    def __init__(self, socket_path, notify):
+        """Start with no channel open.
+
+        :param socket_path: callable(instance_id) returning the path of an
+                            instance's bricks.socket.
+        :param notify: callable(instance_id, frame) handed to each channel.
+        """
+        self._socket_path = socket_path
+        self._notify = notify
+        self._channels = {}
+
+    def __contains__(self, instance_id):
+        return instance_id in self._channels
+
+    def get(self, instance_id):
+        """Return the channel of an instance, opening it if needed."""
+        channel = self._channels.get(instance_id)
+        if channel is None:
+            channel = OccupantChannel(instance_id,
+                                      self._socket_path(instance_id),
+                                      self._notify)
+            channel.start()
+            self._channels[instance_id] = channel
+        return channel
+
+    def sync(self, instance_ids):
+        """Open channels to instance_ids and close every other one."""
+        instance_ids = set(instance_ids)
+        for instance_id in set(self._channels) - instance_ids:
+            self._channels.pop(instance_id).stop()
+        for instance_id in instance_ids:
+            self.get(instance_id)
+
+    def stop(self):
+        self.sync([])
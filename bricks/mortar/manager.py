@@ -11,13 +11,19 @@ from eventlet import greenpool
 
 from oslo.config import cfg
 
+from bricks.common import context as bricks_context
 from bricks.common import exception
 from bricks.common import service
 from bricks.conductor import rpcapi as conductor_rpcapi
 from bricks.objects import base as objects_base
+from bricks.objects import mortar_task
+from bricks.objects import MortarStatsReport
 from bricks.openstack.common import lockutils
 from bricks.openstack.common import log
+from bricks.openstack.common import periodic_task
 
+from bricks.mortar import channel
+from bricks.mortar import state
 from bricks.mortar import utils
 
 MANAGER_TOPIC = 'bricks.mortar_manager'
@@ -38,10 +44,16 @@ mortar_opts = [
                default=60,
                help='Maximum time (in seconds) since the last check-in '
                     'of a mortar.'),
+    cfg.IntOpt('stats_interval',
+               default=60,
+               help='Seconds between resource usage collections of local '
+                    'bricks.'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(mortar_opts, 'mortar')
+CONF.import_opt('log_follow_interval', 'bricks.mortar.state',
+                group='mortar')
 
 
 class MortarManager(service.PeriodicService):
@@ -53,6 +65,13 @@ class MortarManager(service.PeriodicService):
         serializer = objects_base.BricksObjectSerializer()
         super(MortarManager, self).__init__(host, topic,
                                             serializer=serializer)
+        # every brick instance the conductor knows of, as of the last
+        # health check request.
+        self._brick_instances = set()
+        self._stats_collector = utils.DomainStatsCollector()
+        # set once the channels of the local instances have been
+        # reconciled, after the first health check request.
+        self._reconciler = None
 
     def start(self):
         super(MortarManager, self).start()
@@ -61,9 +80,37 @@ class MortarManager(service.PeriodicService):
         # GreenPool of background workers for performing tasks async.
         self._worker_pool = greenpool.GreenPool(size=CONF.rpc_thread_pool_size)
 
+        # Persistent occupant channels, opened as health checks discover
+        # the local brick instances.
+        self._channels = None
+        if CONF.mortar.persistent_channels:
+            self._channels = channel.ChannelManager(
+                utils.instance_socket, self._channel_notification)
+
+        # Last known task state of the local instances, so status checks
+        # don't have to read their logs.
+        self._state_cache = state.StateCache(CONF.mortar.state_file)
+
+    def stop(self):
+        if getattr(self, '_channels', None) is not None:
+            self._channels.stop()
+        if getattr(self, '_state_cache', None) is not None:
+            self._state_cache.close()
+        super(MortarManager, self).stop()
+
     def initialize_service_hook(self, service):
         pass
 
+    def _channel_notification(self, instance_id, frame):
+        """Forward task states pushed by an occupant to the conductor."""
+        if (frame.get('type') == 'state' and
+                frame.get('state') in mortar_task.STATE_LIST):
+            self._state_cache.set_state(instance_id, frame['state'])
+            admin_context = bricks_context.RequestContext(
+                'admin', 'admin', is_admin=True)
+            self.conductor_rpcapi.do_report_last_task(
+                admin_context, instance_id, frame['state'])
+
     def do_ping(self, context, notification=None):
         LOG.debug(_('Received notification: %r') %
                   notification.get('event_type'))
@@ -73,14 +120,20 @@ class MortarManager(service.PeriodicService):
         processing.
         """
         def worker_callback(gt, *args, **kwargs):
+            task_result = gt.wait()
+            if task_result in mortar_task.STATE_LIST:
+                # a new task, the state of the last one no longer applies
+                self._state_cache.set_state(execution_task.instance_id,
+                                            task_result)
             self.conductor_rpcapi.do_report_last_task(
-                context, execution_task.instance_id, gt.wait())
+                context, execution_task.instance_id, task_result)
 
         if execution_task.instance_id in utils.get_local_instances():
             LOG.debug('received some things to do for %s',
                       execution_task.instance_id)
             worker = self._spawn_worker(utils.do_execute, context,
-                                        execution_task)
+                                        execution_task,
+                                        channels=self._channels)
             worker.link(worker_callback)
         else:
             LOG.debug('Instance %s not on this node. Skipping...',
@@ -91,6 +144,20 @@ class MortarManager(service.PeriodicService):
         health of any that you know about.
         """
         LOG.debug('Doing health Check, as commanded by my conductor.')
+        self._brick_instances = set(instance_list)
+
+        if self._reconciler is None:
+            # first word of which instances are bricks since mortar
+            # started, provision any of them missing their channels.
+            self._reconciler = utils.ChannelReconciler()
+            self._spawn_worker(self._reconciler.run, instance_list)
+
+        def worker_callback(gt, *args, **kwargs):
+            self.conductor_rpcapi.do_report_health(context, gt.wait())
+
+        worker = self._spawn_worker(utils.do_health_check, context,
+                                    instance_list, channels=self._channels)
+        worker.link(worker_callback)
 
     def do_check_last_task(self, context, instance_id, topic=None):
         """Check the state of the last run task on an instance and return
@@ -98,7 +165,9 @@ class MortarManager(service.PeriodicService):
         """
         LOG.debug('Checking on instance %s.' % instance_id)
 
-        task_result = utils.do_check_last_task(context, instance_id)
+        task_result = utils.do_check_last_task(context, instance_id,
+                                               channels=self._channels,
+                                               state_cache=self._state_cache)
         self.conductor_rpcapi.do_report_last_task(
             context, instance_id, task_result)
 
@@ -108,7 +177,42 @@ class MortarManager(service.PeriodicService):
         :param brick_log: (objects.BrickLog) a bricklog object specced
         """
 
-        return utils.do_tail_brick_log(context, brick_log)
+        return utils.do_tail_brick_log(context, brick_log,
+                                       channels=self._channels)
+
+    @periodic_task.periodic_task(spacing=CONF.mortar.log_follow_interval)
+    def follow_brick_logs(self, context):
+        """Read the new lines of the local brick logs into the state cache,
+        and drop the records of bricks that are gone.
+        """
+        if not self._brick_instances:
+            return
+
+        # the conductor lists the bricks of the whole fleet
+        local_instances = (set(utils.get_local_instances()) &
+                           self._brick_instances)
+        for instance_id in local_instances:
+            self._state_cache.follow(instance_id,
+                                     utils.instance_log(instance_id))
+
+        self._state_cache.forget(
+            [instance_id for instance_id in self._state_cache
+             if instance_id not in local_instances])
+
+    @periodic_task.periodic_task(spacing=CONF.mortar.stats_interval)
+    def report_brick_stats(self, context):
+        """Collect resource usage of the local bricks and ship it to the
+        conductor as one batch.
+        """
+        if not self._brick_instances:
+            return
+
+        samples = self._stats_collector.collect(self._brick_instances)
+        if samples:
+            report = MortarStatsReport()
+            report.host = self.host
+            report.samples = samples
+            self.conductor_rpcapi.do_report_stats(context, report)
 
     def periodic_tasks(self, context, raise_on_error=False):
         """Periodic tasks are run at pre-specified interval."""
@@ -0,0 +1,152 @@
+"""
+Local record of what mortar knows about each brick instance on this host.
+
+Every instance gets a record of the state of its last task, how far into
+its bricks.log mortar has read, and when the record last changed. Records
+live in memory so that task status checks are a dict lookup, and are
+written through to a small sqlite file so they survive a mortar restart.
+
+Logs are followed incrementally: each pass only reads what was appended
+since the recorded offset.
+"""
+
+import os
+import sqlite3
+import time
+
+from oslo.config import cfg
+
+from bricks.common import paths
+from bricks.objects import mortar_task
+from bricks.openstack.common import log
+
+LOG = log.getLogger(__name__)
+
+state_opts = [
+    cfg.StrOpt('state_file',
+               default=paths.state_path_def('mortar_state.sqlite'),
+               help='Local file mortar keeps the last known task state of '
+                    'its instances in.'),
+    cfg.IntOpt('log_follow_interval',
+               default=5,
+               help='Seconds between reads of new lines in the brick logs '
+                    'of local instances.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(state_opts, 'mortar')
+
+_SCHEMA = ('CREATE TABLE IF NOT EXISTS instance_state ('
+           'instance_id TEXT PRIMARY KEY, '
+           'state TEXT, '
+           'log_offset INTEGER, '
+           'updated_at REAL)')
+
+
+class InstanceState(object):
+    """What mortar last saw of a single instance."""
+
+    __slots__ = ('instance_id', 'state', 'log_offset', 'updated_at')
+
+    def __init__(self, instance_id, state=None, log_offset=0,
+                 updated_at=None):
+        self.instance_id = instance_id
+        self.state = state
+        self.log_offset = log_offset
+        self.updated_at = updated_at
+
+
+class StateCache(object):
+    """In-memory instance records, written through to a sqlite file."""
+
+    def __init__(self, state_file):
+        self._conn = sqlite3.connect(state_file)
+        self._conn.execute(_SCHEMA)
+        self._records = {}
+        for row in self._conn.execute(
+                'SELECT instance_id, state, log_offset, updated_at '
+                'FROM instance_state'):
+            self._records[row[0]] = InstanceState(*row)
+
+    def __contains__(self, instance_id):
+        return instance_id in self._records
+
+    def __iter__(self):
+        return iter(list(self._records))
+
+    def get(self, instance_id):
+        """Return the record of an instance, or None if it has none."""
+        return self._records.get(instance_id)
+
+    def set_state(self, instance_id, state):
+        """Record a task state learned some other way than the log."""
+        record = self._record(instance_id)
+        record.state = state
+        self._save(record)
+
+    def follow(self, instance_id, log_file):
+        """Read what was appended to an instance's log since the last pass.
+
+        Only complete lines are consumed, a partly written last line is
+        picked up by the next pass.
+
+        :returns: the instance's record, None if it has no log here.
+        """
+        try:
+            size = os.path.getsize(log_file)
+        except OSError:
+            return self._records.get(instance_id)
+
+        record = self._record(instance_id)
+
+        if size < record.log_offset:
+            # the log was truncated or replaced, start over
+            record.log_offset = 0
+        if size == record.log_offset:
+            return record
+
+        with open(log_file, 'r') as log_fp:
+            log_fp.seek(record.log_offset)
+            data = log_fp.read(size - record.log_offset)
+
+        complete = data.rfind('\n') + 1
+        if not complete:
+            return record
+
+        for line in data[:complete].splitlines():
+            line = line.strip()
+            if line in mortar_task.STATE_LIST:
+                record.state = line
+
+        record.log_offset += complete
+        self._save(record)
+        return record
+
+    def forget(self, instance_ids):
+        """Drop the records of instance_ids."""
+        instance_ids = [i for i in instance_ids if i in self._records]
+        for instance_id in instance_ids:
+            del self._records[instance_id]
+        with self._conn:
+            self._conn.executemany(
+                'DELETE FROM instance_state WHERE instance_id = ?',
+                [(instance_id,) for instance_id in instance_ids])
+
+    def close(self):
+        self._conn.close()
+
+    def _record(self, instance_id):
+        record = self._records.get(instance_id)
+        if record is None:
+            record = self._records[instance_id] = InstanceState(instance_id)
+        return record
+
+    def _save(self, record):
+        record.updated_at = time.time()
+        with self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO instance_state '
+                '(instance_id, state, log_offset, updated_at) '
+                'VALUES (?, ?, ?, ?)',
+                (record.instance_id, record.state, record.log_offset,
+                 record.updated_at))
@@ -1,20 +1,89 @@
+import copy
 import grp
 import libvirt
 from lxml import etree
 import os
 import pwd
 import socket
+import time
 from time import sleep
 
+from eventlet import greenpool
+from oslo.config import cfg
+
+from bricks.common import exception
 from bricks.common.libvirtobj import BricksLibvirt
+from bricks.objects import mortar_health_report
 from bricks.objects import mortar_task
 from bricks.openstack.common import log
 
 SOCKET_TIMEOUT = 10
 INSTANCES_PATH = "/var/lib/nova/instances/"
 
+# the virtio channels a brick instance needs, in its libvirt.xml
+SOCKET_CHANNEL = "/domain/devices/channel/target[@name='org.clouda.0']"
+LOG_CHANNEL = "/domain/devices/channel/target[@name='org.clouda.1']"
+
+# occupant liveness handshake over the bricks.socket channel, with
+# occupant_ping
+PING = "Ping\n"
+PONG = "Pong"
+
+DOMAIN_STATES = {
+    libvirt.VIR_DOMAIN_NOSTATE: 'nostate',
+    libvirt.VIR_DOMAIN_RUNNING: 'running',
+    libvirt.VIR_DOMAIN_BLOCKED: 'blocked',
+    libvirt.VIR_DOMAIN_PAUSED: 'paused',
+    libvirt.VIR_DOMAIN_SHUTDOWN: 'shutdown',
+    libvirt.VIR_DOMAIN_SHUTOFF: 'shutoff',
+    libvirt.VIR_DOMAIN_CRASHED: 'crashed',
+}
+
+# everything getAllDomainStats needs for a brick's usage sample
+DOMAIN_STATS = (libvirt.VIR_DOMAIN_STATS_CPU_TOTAL |
+                libvirt.VIR_DOMAIN_STATS_BALLOON |
+                libvirt.VIR_DOMAIN_STATS_VCPU |
+                libvirt.VIR_DOMAIN_STATS_INTERFACE |
+                libvirt.VIR_DOMAIN_STATS_BLOCK)
+
 LOG = log.getLogger(__name__)
 
+mortar_utils_opts = [
+    cfg.IntOpt('health_check_concurrency',
+               default=16,
+               help='Maximum number of instances probed at once during a '
+                    'health check.'),
+    cfg.BoolOpt('occupant_ping',
+                default=False,
+                help='Probe occupant liveness with a Ping/Pong handshake. '
+                     'Requires an occupant that answers it, otherwise an '
+                     'occupant is alive when its channel accepts a '
+                     'connection.'),
+    cfg.IntOpt('health_probe_timeout',
+               default=2,
+               help='Seconds to wait on an occupant to answer a liveness '
+                    'probe.'),
+    cfg.IntOpt('reconcile_concurrency',
+               default=8,
+               help='Maximum number of instances checked or provisioned at '
+                    'once when reconciling channels after a restart.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(mortar_utils_opts, 'mortar')
+CONF.import_opt('host', 'bricks.common.service')
+
+
+def instance_socket(instance_id):
+    """Path of the bricks.socket channel of an instance."""
+    return os.path.join(INSTANCES_PATH, 'bricks', instance_id,
+                        'bricks.socket')
+
+
+def instance_log(instance_id):
+    """Path of the bricks.log channel of an instance."""
+    return os.path.join(INSTANCES_PATH, 'bricks', instance_id, 'bricks.log')
+
 
 def get_local_instances():
     with BricksLibvirt() as libvirtobj:
@@ -28,13 +97,41 @@ def get_local_instances():
     return instances
 
 
+# parsed libvirt.xml files, with the mtime they were parsed at
+_XML_CACHE = {}
+
+
+def instance_xml(instance_id):
+    """The parsed libvirt.xml of an instance.
+
+    Parsed trees are cached until the file changes, callers that modify the
+    tree must work on a copy.
+    """
+    xml_path = os.path.join(INSTANCES_PATH, instance_id, 'libvirt.xml')
+    mtime = os.path.getmtime(xml_path)
+    cached = _XML_CACHE.get(xml_path)
+    if cached is None or cached[0] != mtime:
+        cached = _XML_CACHE[xml_path] = (mtime, etree.parse(xml_path))
+    return cached[1]
+
+
+def channels_missing(instance_id):
+    """Whether an instance lacks either of the bricks channels."""
+    xml = instance_xml(instance_id)
+    return not (xml.xpath(SOCKET_CHANNEL) and xml.xpath(LOG_CHANNEL))
+
+
 def config_xml(instance_id):
     xml_path = os.path.join(INSTANCES_PATH, instance_id, 'libvirt.xml')
-    xml = etree.parse(xml_path)
-    socket_chan_check = xml.xpath(
-        "/devices/channel/target[@name='org.clouda.0']")
-    log_chan_check = xml.xpath("/devices/channel/target[@name='org.clouda.1']")
-    devices = xml.find("/devices")
+    xml = instance_xml(instance_id)
+    socket_chan_check = xml.xpath(SOCKET_CHANNEL)
+    log_chan_check = xml.xpath(LOG_CHANNEL)
+    if socket_chan_check and log_chan_check:
+        return False
+
+    # leave the cached tree as it is on disk
+    xml = copy.deepcopy(xml)
+    devices = xml.getroot().find("devices")
     modified = False
 
     if len(socket_chan_check) < 1:
@@ -125,19 +222,260 @@ def config_xml(instance_id):
             instance.create()
 
             xml.write(xml_path, pretty_print=True, xml_declaration=True)
+            _XML_CACHE[xml_path] = (os.path.getmtime(xml_path), xml)
 
     return modified
 
 
-def do_health_check(req_context, instance_list):
-    return instance_list
+class ChannelReconciler(object):
+    """Provisions the bricks channels of local instances missing them.
+
+    Meant to run once after mortar starts, so that the first task deployed
+    after a host reboot doesn't pay for redefining its instance. Local
+    domains are listed once, then checked and provisioned concurrently,
+    bounded by `reconcile_concurrency`.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.checked = 0
+        self.missing = 0
+        self.provisioned = 0
+        self.failed = 0
+
+    def progress(self):
+        return {'total': self.total,
+                'checked': self.checked,
+                'missing': self.missing,
+                'provisioned': self.provisioned,
+                'failed': self.failed}
+
+    def run(self, instance_list):
+        """Reconcile the running local instances among instance_list.
+
+        :param instance_list: [instance_id, ] every brick instance the
+                              conductor knows about.
+        :returns: the progress counters.
+        """
+        wanted = set(instance_list)
+        with BricksLibvirt() as libvirtobj:
+            instance_ids = [domain.UUIDString() for domain in
+                            libvirtobj.listAllDomains(
+                                libvirt.VIR_CONNECT_LIST_DOMAINS_ACTIVE)
+                            if domain.UUIDString() in wanted]
+        self.total = len(instance_ids)
+
+        pool = greenpool.GreenPool(size=CONF.mortar.reconcile_concurrency)
+        missing = [instance_id for instance_id, is_missing
+                   in pool.imap(self._check, instance_ids) if is_missing]
+        LOG.info("Channel reconciliation: %(missing)d of %(total)d "
+                 "instances need channels" % self.progress())
+
+        for _result in pool.imap(self._provision, missing):
+            pass
+        LOG.info("Channel reconciliation done: %(provisioned)d "
+                 "provisioned, %(failed)d failed" % self.progress())
+        return self.progress()
+
+    def _check(self, instance_id):
+        try:
+            is_missing = channels_missing(instance_id)
+        except (IOError, OSError, etree.XMLSyntaxError) as e:
+            LOG.warning("Unable to read the XML of %s: %s" % (instance_id, e))
+            self.failed += 1
+            is_missing = False
+        self.checked += 1
+        if is_missing:
+            self.missing += 1
+        return instance_id, is_missing
+
+    def _provision(self, instance_id):
+        try:
+            provisioned = config_xml(instance_id)
+        except Exception as e:
+            LOG.warning("Unable to provision the channels of %s: %s" % (
+                instance_id, e))
+            provisioned = False
+
+        if provisioned:
+            self.provisioned += 1
+        else:
+            self.failed += 1
+        LOG.debug("Channel reconciliation progress: %s" % self.progress())
+
+
+def do_health_check(req_context, instance_list, channels=None):
+    """Probe every instance in instance_list that lives on this host.
+
+    Domain states come from a single libvirt listing, the channel and
+    occupant probes are then run concurrently, bounded by
+    `health_check_concurrency`.
+
+    :param req_context:
+    :param instance_list: [instance_id, ] every instance the conductor knows
+                          about, most of which are not local.
+    :param channels: (channel.ChannelManager) persistent occupant channels,
+                     if mortar holds them. They are synced to the local
+                     instances and used for the occupant probes.
+    :returns: a MortarHealthReport for this host.
+    """
+    wanted = set(instance_list)
+
+    with BricksLibvirt() as libvirtobj:
+        domain_states = [(domain.UUIDString(), _domain_state(domain))
+                         for domain in libvirtobj.listAllDomains(0)
+                         if domain.UUIDString() in wanted]
+
+    if channels is not None:
+        channels.sync([instance_id for instance_id, _s in domain_states])
+
+    def probe(instance_id, domain_state):
+        return _probe_instance(instance_id, domain_state, channels)
+
+    pool = greenpool.GreenPool(size=CONF.mortar.health_check_concurrency)
+
+    report = mortar_health_report.MortarHealthReport()
+    report.host = CONF.host
+    report.instances = list(pool.starmap(probe, domain_states))
+    return report
+
+
+def _domain_state(domain):
+    try:
+        state, _reason = domain.state()
+    except libvirt.libvirtError as e:
+        LOG.warning("Unable to read domain state for %s: %s" % (
+            domain.UUIDString(), e))
+        return None
+    return DOMAIN_STATES.get(state)
+
+
+def _probe_instance(instance_id, domain_state, channels=None):
+    """Check the channel socket and occupant of a single local instance."""
+    socket_file = instance_socket(instance_id)
+    channel = os.path.exists(socket_file)
+    occupant = False
+
+    if channel and domain_state == 'running':
+        if channels is not None:
+            # the channel holds the socket's only connection
+            occupant = channels.get(instance_id).ping()
+        else:
+            occupant = occupant_alive(socket_file)
+
+    return {'instance_id': instance_id,
+            'domain_state': domain_state,
+            'channel': channel,
+            'occupant': occupant}
+
+
+def occupant_alive(socket_file):
+    """Whether an occupant listens on the other end of the channel.
+
+    Pings it if occupant_ping is set, otherwise nothing is written to the
+    channel.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONF.mortar.health_probe_timeout)
+    try:
+        sock.connect(socket_file)
+        if not CONF.mortar.occupant_ping:
+            return True
+        sock.sendall(PING)
+        return sock.recv(len(PONG)) == PONG
+    except socket.error:
+        return False
+    finally:
+        sock.close()
+
+
+class DomainStatsCollector(object):
+    """Samples resource usage of local brick domains.
+
+    Every collection costs a single getAllDomainStats call for the whole
+    host. Cumulative libvirt counters are kept between collections so that
+    cpu, disk and network usage can be shipped as rates.
+    """
+
+    def __init__(self):
+        self._previous = {}
+
+    def collect(self, instance_ids):
+        """Return usage samples for the running domains in instance_ids.
+
+        A domain needs to have been seen by the previous collection before
+        it gets a sample, as rates need two readings.
+        """
+        wanted = set(instance_ids)
+        now = time.time()
+
+        with BricksLibvirt() as libvirtobj:
+            records = libvirtobj.getAllDomainStats(
+                DOMAIN_STATS,
+                libvirt.VIR_CONNECT_GET_ALL_DOMAINS_STATS_ACTIVE)
+
+        current = {}
+        samples = []
+        for domain, stats in records:
+            instance_id = domain.UUIDString()
+            if instance_id not in wanted:
+                continue
+
+            counters = _stats_counters(stats)
+            current[instance_id] = (now, counters)
+            if instance_id in self._previous:
+                samples.append(_stats_sample(instance_id, now, counters,
+                                             *self._previous[instance_id]))
+
+        self._previous = current
+        return samples
+
+
+def _stats_counters(stats):
+    """Flatten a getAllDomainStats record into the counters bricks uses."""
+    def total(prefix, suffix):
+        return sum(stats.get('%s.%s.%s' % (prefix, i, suffix), 0)
+                   for i in range(stats.get('%s.count' % prefix, 0)))
+
+    return {
+        'cpu_time': stats.get('cpu.time', 0),
+        'vcpus': stats.get('vcpu.current') or 1,
+        'mem_used': stats.get('balloon.rss',
+                              stats.get('balloon.current', 0)),
+        'mem_total': stats.get('balloon.maximum', 0),
+        'disk_read': total('block', 'rd.bytes'),
+        'disk_write': total('block', 'wr.bytes'),
+        'net_rx': total('net', 'rx.bytes'),
+        'net_tx': total('net', 'tx.bytes'),
+    }
+
+
+def _stats_sample(instance_id, now, counters, then, previous):
+    """Turn two readings of a domain's counters into a usage sample."""
+    elapsed = max(now - then, 1e-3)
+
+    def rate(counter):
+        # counters restart from zero when the guest reboots
+        return max(counters[counter] - previous[counter], 0) / elapsed
+
+    return {
+        'instance_id': instance_id,
+        'timestamp': int(now),
+        'cpu': 100.0 * rate('cpu_time') / 1e9 / counters['vcpus'],
+        'mem_used': counters['mem_used'],
+        'mem_total': counters['mem_total'],
+        'disk_read': rate('disk_read'),
+        'disk_write': rate('disk_write'),
+        'net_rx': rate('net_rx'),
+        'net_tx': rate('net_tx'),
+    }
 
 
 def socket_send(sock, message, filename=None):
     sock.sendall('\n'.join(['BOF %s\n' % filename, message, 'EOF\n']))
 
 
-def do_execute(req_context, task):
+def do_execute(req_context, task, channels=None):
     """Executes a list of arbitrary shit from the conductor, it will
     receive all tasks, so it needs to determine which hosts locally it can
     send commands to, and do so.
@@ -145,9 +483,11 @@ def do_execute(req_context, task):
     :param req_context:
     :param execution_list ([objects.MortarTask, ]): A list of tasks to do
     work on.
+    :param channels: (channel.ChannelManager) persistent occupant channels,
+                     if mortar holds them, used instead of a one-off
+                     connection to stream the task.
     """
-    socket_file = os.path.join(INSTANCES_PATH, 'bricks', task.instance_id,
-                               'bricks.socket')
+    socket_file = instance_socket(task.instance_id)
 
     with BricksLibvirt(ro=False) as libvirtobj:
         if not instance_started(task.instance_id, libvirtobj):
@@ -167,6 +507,14 @@ def do_execute(req_context, task):
             config_xml(task.instance_id)
         return
 
+    if channels is not None:
+        try:
+            if channels.get(task.instance_id).push_task(task.configuration):
+                return mortar_task.RUNNING
+        except exception.OccupantChannelError as e:
+            LOG.warning(e)
+        return mortar_task.ERROR
+
     try:
         sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
         sock.settimeout(SOCKET_TIMEOUT)
@@ -186,14 +534,33 @@ def do_execute(req_context, task):
     return mortar_task.RUNNING
 
 
-def do_check_last_task(req_context, instance_id):
+def do_check_last_task(req_context, instance_id, channels=None,
+                       state_cache=None):
     """Checks the instance log's last line for a task state
 
     :param req_context:
     :param instance_id str: An instance ID
+    :param channels: (channel.ChannelManager) persistent occupant channels,
+                     whose last pushed state is used when known.
+    :param state_cache: (state.StateCache) mortar's record of its instances,
+                        kept current by following their logs. When given,
+                        the state is answered from it instead of the log.
     """
-    log_file = os.path.join(INSTANCES_PATH, 'bricks', instance_id,
-                            'bricks.log')
+    if channels is not None and instance_id in channels:
+        state = channels.get(instance_id).state
+        if state in mortar_task.STATE_LIST:
+            return state
+
+    log_file = instance_log(instance_id)
+
+    if state_cache is not None:
+        record = state_cache.get(instance_id)
+        if record is None:
+            # never followed yet, catch up on its log once
+            record = state_cache.follow(instance_id, log_file)
+        if record is None or record.state is None:
+            return mortar_task.INSUFF
+        return record.state
 
     try:
         log = open(log_file, "r")
@@ -242,15 +609,23 @@ def start_instance(instance_id, conn):
         return False
 
 
-def do_tail_brick_log(req_context, brick_log):
+def do_tail_brick_log(req_context, brick_log, channels=None):
     """Get the last X lines of the brick log for the instance.
 
     :param context:
     :param brick_log: (objects.BrickLog) an empty log object, waiting to be
                       filled with loggy goodness.
+    :param channels: (channel.ChannelManager) persistent occupant channels,
+                     whose in-memory log is served when it holds any lines.
 
     :returns: brick_log with the log filled in
     """
+    if channels is not None and brick_log.instance_id in channels:
+        log_lines = list(channels.get(brick_log.instance_id).log)
+        if log_lines:
+            brick_log.log = '\n'.join(log_lines[-int(brick_log.length):])
+            return brick_log
+
     log_file = os.path.join(INSTANCES_PATH, 'bricks', brick_log.instance_id,
                             'bricks.log')
     if not os.path.exists(log_file):
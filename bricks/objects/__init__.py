@@ -3,22 +3,31 @@ import functools
 from bricks.objects import brick
 from bricks.objects import brickconfig
 from bricks.objects import configfile
+from bricks.objects import mortar_health_report
+from bricks.objects import mortar_stats_report
 from bricks.objects import mortar_task
 from bricks.objects import mortar_task_report
 
 
 def objectify(klass):
-    """Decorator to convert database results into specified objects."""
+    """Decorator to convert a database result into the specified object."""
     def the_decorator(fn):
         @functools.wraps(fn)
         def wrapper(*args, **kwargs):
             result = fn(*args, **kwargs)
-            try:
-                return klass._from_db_object(klass(), result)
-            except TypeError:
-                # TODO(deva): handle lists of objects better
-                #             once support for those lands and is imported.
-                return [klass._from_db_object(klass(), obj) for obj in result]
+            if isinstance(result, list):
+                return klass._from_db_objects(result)
+            return klass._from_db_object(klass(), result)
+        return wrapper
+    return the_decorator
+
+
+def objectify_list(klass):
+    """Decorator to convert a list of database results into objects."""
+    def the_decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return klass._from_db_objects(fn(*args, **kwargs))
         return wrapper
     return the_decorator
 
@@ -26,12 +35,22 @@ ConfigFile = configfile.ConfigFile
 BrickConfig = brickconfig.BrickConfig
 Brick = brick.Brick
 BrickLog = brick.BrickLog
+BrickLogChunk = brick.BrickLogChunk
+BrickHealth = brick.BrickHealth
+BrickStats = brick.BrickStats
 MortarTask = mortar_task.MortarTask
 MortarTaskReport = mortar_task_report.MortarTaskReport
+MortarHealthReport = mortar_health_report.MortarHealthReport
+MortarStatsReport = mortar_stats_report.MortarStatsReport
 
 __all__ = (BrickConfig,
            Brick,
            BrickLog,
+           BrickLogChunk,
+           BrickHealth,
+           BrickStats,
            MortarTask,
            MortarTaskReport,
+           MortarHealthReport,
+           MortarStatsReport,
            ConfigFile)
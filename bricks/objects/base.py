@@ -5,6 +5,7 @@ import collections
 import six
 
 from bricks.common import exception
+from bricks.common import json_codec
 from bricks.objects import utils as obj_utils
 from bricks.openstack.common import context
 from bricks.openstack.common import log as logging
@@ -22,6 +23,10 @@ def get_attrname(name):
 
 def make_class_properties(cls):
     cls.fields.update(BricksObject.fields)
+    # bit of each field in an object's mask of changed fields
+    cls._obj_bit_fields = tuple(sorted(cls.fields))
+    cls._obj_field_bits = dict((name, 1 << i)
+                               for i, name in enumerate(cls._obj_bit_fields))
     for name, typefn in cls.fields.iteritems():
 
         def getter(self, name=name):
@@ -30,8 +35,20 @@ def make_class_properties(cls):
                 self.obj_load_attr(name)
             return getattr(self, attrname)
 
-        def setter(self, value, name=name, typefn=typefn):
-            self._changed_fields.add(name)
+        def json_getter(self, name=name):
+            attrname = get_attrname(name)
+            if not hasattr(self, attrname):
+                self.obj_load_attr(name)
+            value = getattr(self, attrname)
+            if type(value) is json_codec.RawJSON:
+                # decoded on first access rather than hydration
+                value = json_codec.loads(value)
+                setattr(self, attrname, value)
+            return value
+
+        def setter(self, value, name=name, typefn=typefn,
+                   bit=cls._obj_field_bits[name]):
+            self._changes |= bit
             try:
                 return setattr(self, get_attrname(name), typefn(value))
             except Exception:
@@ -40,7 +57,57 @@ def make_class_properties(cls):
                               {'attr': attr})
                 raise
 
-        setattr(cls, name, property(getter, setter))
+        if typefn in obj_utils.JSON_TYPES:
+            setattr(cls, name, property(json_getter, setter))
+        else:
+            setattr(cls, name, property(getter, setter))
+
+    # (field, storage attribute, database validator) of every field, for
+    # _hydrate_db_objects
+    cls._obj_db_fields = tuple(
+        (name, get_attrname(name), obj_utils.db_validator(typefn))
+        for name, typefn in cls.fields.iteritems())
+    lazy_fields = getattr(cls, 'obj_lazy_fields', ())
+    cls._obj_lazy_db_fields = tuple(field for field in cls._obj_db_fields
+                                    if field[0] in lazy_fields)
+
+    # (field, storage attribute, type function, _attr_*_to_primitive,
+    # _attr_*_from_primitive) of every field, so that (de)serializing an
+    # object does not look its handlers up field by field
+    cls._obj_codecs = tuple(
+        (name, get_attrname(name), typefn,
+         _primitive_handler(cls, name, 'to'),
+         _primitive_handler(cls, name, 'from'))
+        for name, typefn in sorted(cls.fields.iteritems()))
+
+
+def _primitive_handler(cls, name, direction):
+    """Return the plain function of a field's primitive handler, or None."""
+    handler = getattr(cls, '_attr_%s_%s_primitive' % (name, direction), None)
+    return getattr(handler, '__func__', handler)
+
+
+def make_class_slots(bases, dict_):
+    """Return the __slots__ storing the fields of a new object class.
+
+    Fields are stored in slots rather than a per-instance __dict__, which
+    keeps large lists of objects small. Slots the base classes already
+    have are left out.
+    """
+    fields = dict_.get('fields')
+    taken = set()
+    for base in bases:
+        for klass in base.__mro__:
+            slots = klass.__dict__.get('__slots__', ())
+            if isinstance(slots, six.string_types):
+                slots = (slots,)
+            taken.update(slots)
+            if fields is None and 'fields' in klass.__dict__:
+                fields = klass.fields
+
+    attrnames = set(get_attrname(name)
+                    for name in set(fields or ()) | set(BricksObject.fields))
+    return tuple(sorted(attrnames - taken))
 
 
 class BricksObjectMetaclass(type):
@@ -48,6 +115,12 @@ class BricksObjectMetaclass(type):
 
     indirection_api = None
 
+    def __new__(mcs, name, bases, dict_):
+        if '__slots__' not in dict_:
+            dict_['__slots__'] = make_class_slots(bases, dict_)
+        return super(BricksObjectMetaclass, mcs).__new__(mcs, name, bases,
+                                                         dict_)
+
     def __init__(cls, names, bases, dict_):
         if not hasattr(cls, '_obj_classes'):
             # This will be set in the 'BricksObject' class.
@@ -104,7 +177,8 @@ def remotable(fn):
             for key, value in updates.iteritems():
                 if key in self.fields:
                     self[key] = self._attr_from_primitive(key, value)
-            self._changed_fields = set(updates.get('obj_what_changed', []))
+            self._changes = self._obj_changes_mask(
+                updates.get('obj_what_changed', []))
             return result
         else:
             return fn(self, ctxt, *args, **kwargs)
@@ -165,9 +239,19 @@ class BricksObject(object):
     }
     obj_extra_fields = []
 
+    # Large fields that list queries leave out. They are loaded when first
+    # read, for every object of the list at once, see _obj_get_lazy_rows.
+    obj_lazy_fields = ()
+
+    # subclasses get slots for their fields from the metaclass
+    __slots__ = ('_changes', '_context', '_obj_batch')
+
     def __init__(self):
-        self._changed_fields = set()
+        self._changes = 0
         self._context = None
+        # the objects fetched along with this one, lazy fields are loaded
+        # for all of them together
+        self._obj_batch = None
 
     @classmethod
     def obj_name(cls):
@@ -229,16 +313,42 @@ class BricksObject(object):
                                    primitive['bricks_object.name']))
         objname = primitive['bricks_object.name']
         objver = primitive['bricks_object.version']
-        objdata = primitive['bricks_object.data']
         objclass = cls.obj_class_from_name(objname, objver)
-        self = objclass()
+        return objclass._obj_hydrate_primitive(primitive, context)
+
+    @classmethod
+    def obj_from_primitive_list(cls, primitives, context=None):
+        """Hydrate a list of primitives, resolving each object class once."""
+        objclasses = {}
+        objs = []
+        for primitive in primitives:
+            key = (primitive['bricks_object.namespace'],
+                   primitive['bricks_object.name'],
+                   primitive['bricks_object.version'])
+            objclass = objclasses.get(key)
+            if objclass is None:
+                # resolved and checked like a lone object
+                obj = cls.obj_from_primitive(primitive, context=context)
+                objclasses[key] = obj.__class__
+            else:
+                obj = objclass._obj_hydrate_primitive(primitive, context)
+            objs.append(obj)
+        return objs
+
+    @classmethod
+    def _obj_hydrate_primitive(cls, primitive, context):
+        self = cls()
         self._context = context
-        for name in self.fields:
+        objdata = primitive['bricks_object.data']
+        for name, attrname, typefn, _encoder, decoder in cls._obj_codecs:
             if name in objdata:
-                setattr(self, name,
-                        self._attr_from_primitive(name, objdata[name]))
-        changes = primitive.get('bricks_object.changes', [])
-        self._changed_fields = set([x for x in changes if x in self.fields])
+                value = objdata[name]
+                if decoder is not None:
+                    value = decoder(self, value)
+                setattr(self, attrname, typefn(value))
+        changes = primitive.get('bricks_object.changes')
+        if changes:
+            self._changes = self._obj_changes_mask(changes)
         return self
 
     _attr_created_at_to_primitive = obj_utils.dt_serializer('created_at')
@@ -263,27 +373,119 @@ class BricksObject(object):
         This calls self._attr_to_primitive() for each item in fields.
         """
         primitive = dict()
-        for name in self.fields:
-            if hasattr(self, get_attrname(name)):
-                primitive[name] = self._attr_to_primitive(name)
+        for name, attrname, _typefn, encoder, _decoder in self._obj_codecs:
+            try:
+                value = getattr(self, attrname)
+            except AttributeError:
+                continue
+            if encoder is not None:
+                value = encoder(self)
+            elif type(value) is json_codec.RawJSON:
+                value = json_codec.loads(value)
+            primitive[name] = value
         obj = {'bricks_object.name': self.obj_name(),
                'bricks_object.namespace': 'bricks',
                'bricks_object.version': self.version,
                'bricks_object.data': primitive}
-        if self.obj_what_changed():
+        if self._changes:
             obj['bricks_object.changes'] = list(self.obj_what_changed())
         return obj
 
+    @classmethod
+    def _from_db_objects(cls, db_objs):
+        """Converts a list of database entities to formal objects."""
+        return [cls._from_db_object(cls(), db_obj) for db_obj in db_objs]
+
+    @classmethod
+    def _hydrate_db_objects(cls, db_objs):
+        """Build an object of each database entity, copying its fields.
+
+        The bulk equivalent of a _from_db_object that copies every field
+        over: values are stored straight into the fields with the fast
+        database validators, bypassing the property setters and change
+        tracking, so the objects come out with no changes. Lazy fields the
+        query deferred are left unset, to be loaded for the whole list on
+        first access.
+        """
+        if not db_objs:
+            return []
+
+        # the rows of one query all have the same fields deferred
+        skip = cls._obj_deferred_fields(db_objs[0])
+        fields = [field for field in cls._obj_db_fields
+                  if field[0] not in skip]
+        objs = []
+        for db_obj in db_objs:
+            obj = cls()
+            for name, attrname, validator in fields:
+                setattr(obj, attrname, validator(getattr(db_obj, name)))
+            objs.append(obj)
+
+        if skip:
+            for obj in objs:
+                obj._obj_batch = objs
+        return objs
+
+    @classmethod
+    def _obj_deferred_fields(cls, db_obj):
+        """Return the lazy fields the query of db_obj left out."""
+        deferred = getattr(db_obj, 'deferred', None)
+        if deferred is None:
+            # rows of plain statements leave out what they do not select
+            keys = getattr(db_obj, 'keys', None)
+            if keys is None:
+                return []
+            return [name for name in cls.obj_lazy_fields
+                    if name not in keys()]
+        return [name for name in cls.obj_lazy_fields if deferred(name)]
+
+    @classmethod
+    def _obj_get_lazy_rows(cls, ids):
+        """Fetch the lazy fields of the objects with the given ids.
+
+        Classes declaring obj_lazy_fields implement this.
+
+        :returns: rows with id and the lazy fields as attributes.
+        """
+        raise NotImplementedError(
+            _("Cannot load lazy fields of %s") % cls.obj_name())
+
     def obj_load_attr(self, attrname):
         """Load an additional attribute from the real object.
 
         This should use self._conductor, and cache any data that might
         be useful for future load operations.
         """
+        if attrname in self.obj_lazy_fields:
+            return self._obj_load_lazy_fields()
         raise NotImplementedError(
             _("Cannot load '%(attrname)s' in the base class") %
             {'attrname': attrname})
 
+    def _obj_load_lazy_fields(self):
+        """Load the lazy fields this object lacks, along with those of
+        every object of its batch, in one query.
+        """
+        lazy_fields = self._obj_lazy_db_fields
+        pending = {}
+        for obj in self._obj_batch or [self]:
+            obj_id = getattr(obj, '_id', None)
+            if obj_id is None:
+                continue
+            for _name, attrname, _validator in lazy_fields:
+                if not hasattr(obj, attrname):
+                    pending[obj_id] = obj
+                    break
+
+        for row in self._obj_get_lazy_rows(list(pending)):
+            obj = pending[row.id]
+            for name, attrname, validator in lazy_fields:
+                if not hasattr(obj, attrname):
+                    setattr(obj, attrname, validator(getattr(row, name)))
+
+        for obj in pending.itervalues():
+            obj._obj_batch = None
+
     def save(self, context):
         """Save the changed fields back to the store.
 
@@ -296,12 +498,22 @@ class BricksObject(object):
         """Returns a dict of changed fields and their new values."""
         changes = {}
         for key in self.obj_what_changed():
-            changes[key] = self[key]
+            value = getattr(self, get_attrname(key), None)
+            if type(value) is json_codec.RawJSON:
+                # written back as read, without a decode and encode
+                changes[key] = value
+            else:
+                changes[key] = self[key]
         return changes
 
     def obj_what_changed(self):
         """Returns a set of fields that have been modified."""
-        return self._changed_fields
+        changes = self._changes
+        if not changes:
+            return set()
+        # int.bit_length() is new in python 2.7
+        return set(name for i, name in enumerate(self._obj_bit_fields)
+                   if changes & (1 << i))
 
     def obj_reset_changes(self, fields=None):
         """Reset the list of fields that have been changed.
@@ -309,9 +521,16 @@ class BricksObject(object):
         Note that this is NOT "revert to previous values"
         """
         if fields:
-            self._changed_fields -= set(fields)
+            self._changes &= ~self._obj_changes_mask(fields)
         else:
-            self._changed_fields.clear()
+            self._changes = 0
+
+    def _obj_changes_mask(self, fields):
+        """Return the change mask of fields, ignoring unknown names."""
+        mask = 0
+        for name in fields:
+            mask |= self._obj_field_bits.get(name, 0)
+        return mask
 
     # dictish syntactic sugar
     def iteritems(self):
@@ -362,9 +581,14 @@ class BricksObject(object):
         for key, value in updates.items():
             self[key] = value
 
-    def as_dict(self):
+    def as_dict(self, fields=None):
+        """Return the fields of the object as a dict.
+
+        :param fields: only include these fields, so that lazy fields the
+                       caller has no use for are not loaded.
+        """
         return dict((k, getattr(self, k))
-                    for k in self.fields
+                    for k in fields or self.fields
                     if hasattr(self, k))
 
 
@@ -380,6 +604,8 @@ class ObjectListBase(object):
         'objects': list,
     }
 
+    __slots__ = ()
+
     def __iter__(self):
         """List iterator interface."""
         return iter(self.objects)
@@ -451,7 +677,11 @@ class BricksObjectSerializer(rpc_serializer.Serializer):
         return iterable([action_fn(context, value) for value in values])
 
     def serialize_entity(self, context, entity):
-        if isinstance(entity, (tuple, list, set)):
+        if isinstance(entity, list) and _same_object_class(entity):
+            # lists of one kind of object, like brick lists, skip the
+            # generic per-item dispatch
+            entity = [obj.obj_to_primitive() for obj in entity]
+        elif isinstance(entity, (tuple, list, set)):
             entity = self._process_iterable(context, self.serialize_entity,
                                             entity)
         elif (hasattr(entity, 'obj_to_primitive') and
@@ -462,12 +692,38 @@ class BricksObjectSerializer(rpc_serializer.Serializer):
     def deserialize_entity(self, context, entity):
         if isinstance(entity, dict) and 'bricks_object.name' in entity:
             entity = BricksObject.obj_from_primitive(entity, context=context)
+        elif isinstance(entity, list) and _all_object_primitives(entity):
+            entity = BricksObject.obj_from_primitive_list(entity,
+                                                          context=context)
         elif isinstance(entity, (tuple, list, set)):
             entity = self._process_iterable(context, self.deserialize_entity,
                                             entity)
         return entity
 
 
+def _same_object_class(values):
+    """Whether values is a non-empty list of objects of a single class."""
+    if not values:
+        return False
+    objclass = type(values[0])
+    if not issubclass(objclass, BricksObject):
+        return False
+    for value in values:
+        if type(value) is not objclass:
+            return False
+    return True
+
+
+def _all_object_primitives(values):
+    """Whether values is a non-empty list of serialized objects."""
+    if not values:
+        return False
+    for value in values:
+        if not (isinstance(value, dict) and 'bricks_object.name' in value):
+            return False
+    return True
+
+
 def obj_to_primitive(obj):
     """Recursively turn an object into a python primitive.
 
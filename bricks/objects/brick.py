@@ -1,3 +1,5 @@
+import datetime
+
 from bricks.db import api as db_api
 from bricks.objects import base
 from bricks.objects import utils
@@ -22,19 +24,33 @@ class Brick(base.BricksObject):
 
         'configuration': utils.dict_or_none,
         # {'flavour', 'keypair', 'network', ''}
-        'deploy_log': utils.str_or_none,
     }
 
+    obj_lazy_fields = ('configuration',)
+
     @staticmethod
     def _from_db_object(brick, db_brick):
         """Converts a database entity to a formal object."""
+        deferred = brick._obj_deferred_fields(db_brick)
 
         for field in brick.fields:
+            if field in deferred:
+                # left for obj_load_attr, not a query per brick of a list
+                continue
             brick[field] = db_brick[field]
 
         brick.obj_reset_changes()
         return brick
 
+    @classmethod
+    def _from_db_objects(cls, db_bricks):
+        """Converts a list of database entities to formal objects."""
+        return cls._hydrate_db_objects(db_bricks)
+
+    @classmethod
+    def _obj_get_lazy_rows(cls, ids):
+        return cls.dbapi.get_brick_columns(ids, cls.obj_lazy_fields)
+
     @base.remotable_classmethod
     def get_by_uuid(cls, context, uuid, tenant_id=None):
         """Find a brick based on uuid and return a Brick object.
@@ -78,3 +94,103 @@ class BrickLog(base.BricksObject):
         'length': utils.str_or_none,
         'log': utils.str_or_none,
     }
+
+
+class BrickLogChunk(base.BricksObject):
+    """One appended piece of a brick's deploy log."""
+
+    fields = {
+        'brick_id': int,
+        # position of the chunk in the log, from 1
+        'seq': int,
+        'data': utils.str_or_none,
+    }
+
+    @staticmethod
+    def _from_db_object(chunk, db_chunk):
+        """Converts a database entity to a formal object."""
+        for field in chunk.fields:
+            chunk[field] = db_chunk[field]
+
+        chunk.obj_reset_changes()
+        return chunk
+
+    @classmethod
+    def _from_db_objects(cls, db_chunks):
+        """Converts a list of database entities to formal objects."""
+        return cls._hydrate_db_objects(db_chunks)
+
+
+class BrickHealth(base.BricksObject):
+
+    fields = {
+        'instance_id': utils.str_or_none,
+        'host': utils.str_or_none,
+
+        # libvirt domain state name, e.g. running, shutoff
+        'domain_state': utils.str_or_none,
+        'channel': bool,
+        'occupant': bool,
+        'checked_at': utils.datetime_or_str_or_none,
+    }
+
+    _attr_checked_at_from_primitive = utils.dt_deserializer
+    _attr_checked_at_to_primitive = utils.dt_serializer('checked_at')
+
+    @staticmethod
+    def _from_db_object(health, db_health):
+        """Converts a database entity to a formal object."""
+        for field in health.fields:
+            health[field] = db_health[field]
+
+        health.obj_reset_changes()
+        return health
+
+    @classmethod
+    def _from_db_objects(cls, db_healths):
+        """Converts a list of database entities to formal objects."""
+        return cls._hydrate_db_objects(db_healths)
+
+
+class BrickStats(base.BricksObject):
+    """Average resource usage of a brick over one downsampled period."""
+
+    STATS_FIELDS = ('cpu', 'mem_used', 'mem_total', 'disk_read',
+                    'disk_write', 'net_rx', 'net_tx')
+
+    fields = {
+        'instance_id': utils.str_or_none,
+        'resolution': int,
+        'timestamp': utils.datetime_or_str_or_none,
+
+        # percent of allocated vcpus
+        'cpu': utils.float_or_none,
+        # KiB
+        'mem_used': utils.float_or_none,
+        'mem_total': utils.float_or_none,
+        # bytes per second
+        'disk_read': utils.float_or_none,
+        'disk_write': utils.float_or_none,
+        'net_rx': utils.float_or_none,
+        'net_tx': utils.float_or_none,
+    }
+
+    _attr_timestamp_from_primitive = utils.dt_deserializer
+    _attr_timestamp_to_primitive = utils.dt_serializer('timestamp')
+
+    @staticmethod
+    def _from_db_object(stats, db_stats):
+        """Converts a ring buffer slot of summed readings to averages."""
+        samples = db_stats['samples'] or 1
+        for field in BrickStats.STATS_FIELDS:
+            stats[field] = float(db_stats[field] or 0) / samples
+
+        stats.instance_id = db_stats['instance_id']
+        stats.resolution = db_stats['resolution']
+        stats.timestamp = datetime.datetime.utcfromtimestamp(
+            db_stats['period'])
+        stats.created_at = db_stats['created_at']
+        stats.updated_at = db_stats['updated_at']
+
+        stats.obj_reset_changes()
+        return stats
@@ -26,15 +26,30 @@ class BrickConfig(base.BricksObject):
         'help_link': utils.str_or_none,
     }
 
+    obj_lazy_fields = ('email_template', 'environ', 'ports')
+
     @staticmethod
     def _from_db_object(brickconfig, db_brickconfig):
         """Converts a database entity to a formal object."""
+        deferred = brickconfig._obj_deferred_fields(db_brickconfig)
+
         for field in brickconfig.fields:
+            if field in deferred:
+                continue
             brickconfig[field] = db_brickconfig[field]
 
         brickconfig.obj_reset_changes()
         return brickconfig
 
+    @classmethod
+    def _from_db_objects(cls, db_brickconfigs):
+        """Converts a list of database entities to formal objects."""
+        return cls._hydrate_db_objects(db_brickconfigs)
+
+    @classmethod
+    def _obj_get_lazy_rows(cls, ids):
+        return cls.dbapi.get_brickconfig_columns(ids, cls.obj_lazy_fields)
+
     @base.remotable_classmethod
     def get_by_uuid(cls, context, uuid=None):
         """Find a brickconfig based on uuid and return a BrickConfig
@@ -47,16 +62,21 @@ class BrickConfig(base.BricksObject):
         return BrickConfig._from_db_object(cls(), db_brickconfig)
 
     @base.remotable
-    def save(self, context):
+    def save(self, context, expected=None):
         """Save updates to this BrickConfig.
 
         Updates will be made column by column based on the result
         of self.what_changed().
 
         :param context: Security context
+        :param expected: field values the database must still hold for
+                         the update to be made, PreconditionFailed is
+                         raised otherwise.
         """
         updates = self.obj_get_changes()
-        self.dbapi.update_brickconfig(self.uuid, updates)
+        db_bc = self.dbapi.update_brickconfig(self.uuid, updates,
+                                              expected=expected)
+        self.updated_at = db_bc['updated_at']
 
         self.obj_reset_changes()
 
@@ -13,17 +13,33 @@ class ConfigFile(base.BricksObject):
         'name': utils.str_or_none,
         'description': utils.str_or_none,
         'contents': utils.str_or_none,
+        'contents_sha256': utils.str_or_none,
     }
 
+    obj_lazy_fields = ('contents',)
+
     @staticmethod
     def _from_db_object(bcf, db_bcf):
         """Converts a database entity to a formal object."""
+        deferred = bcf._obj_deferred_fields(db_bcf)
+
         for field in bcf.fields:
+            if field in deferred:
+                continue
             bcf[field] = db_bcf[field]
 
         bcf.obj_reset_changes()
         return bcf
 
+    @classmethod
+    def _from_db_objects(cls, db_bcfs):
+        """Converts a list of database entities to formal objects."""
+        return cls._hydrate_db_objects(db_bcfs)
+
+    @classmethod
+    def _obj_get_lazy_rows(cls, ids):
+        return cls.dbapi.get_configfile_columns(ids, cls.obj_lazy_fields)
+
     @base.remotable_classmethod
     def get_by_uuid(cls, context, uuid=None):
         """Find a configfile based on uuid and return a ConfigFile
@@ -36,16 +52,23 @@ class ConfigFile(base.BricksObject):
         return ConfigFile._from_db_object(cls(), db_bcf)
 
     @base.remotable
-    def save(self, context):
+    def save(self, context, expected=None):
         """Save updates to this ConfigFile.
 
         Updates will be made column by column based on the result
         of self.what_changed().
 
         :param context: Security context
+        :param expected: field values the database must still hold for
+                         the update to be made, PreconditionFailed is
+                         raised otherwise.
         """
         updates = self.obj_get_changes()
-        self.dbapi.update_configfile(self.uuid, updates)
+        db_bcf = self.dbapi.update_configfile(self.uuid, updates,
+                                              expected=expected)
+        # the hash follows the contents
+        self.contents_sha256 = db_bcf.contents_sha256
+        self.updated_at = db_bcf.updated_at
 
         self.obj_reset_changes()
 
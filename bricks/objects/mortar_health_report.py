@@ -0,0 +1,15 @@
+from bricks.objects import base
+from bricks.objects import utils
+
+
+class MortarHealthReport(base.BricksObject):
+    """Aggregated health of every brick instance local to a mortar host.
+
+    `instances` is a list of dicts, one per local instance, each holding the
+    keys instance_id, domain_state, channel and occupant.
+    """
+
+    fields = {
+        'host': utils.str_or_none,
+        'instances': utils.list_or_none,
+    }
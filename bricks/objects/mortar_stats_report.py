@@ -0,0 +1,15 @@
+from bricks.objects import base
+from bricks.objects import utils
+
+
+class MortarStatsReport(base.BricksObject):
+    """A batch of resource usage samples for brick instances on one host.
+
+    `samples` is a list of dicts holding instance_id, timestamp (seconds
+    since the epoch) and the usage keys of objects.BrickStats.
+    """
+
+    fields = {
+        'host': utils.str_or_none,
+        'samples': utils.list_or_none,
+    }
@@ -7,6 +7,7 @@ import iso8601
 import netaddr
 import six
 
+from bricks.common import json_codec
 from bricks.openstack.common import timeutils
 
 
@@ -39,6 +40,14 @@ def int_or_none(val):
         return int(val)
 
 
+def float_or_none(val):
+    """Attempt to parse a float value, or None."""
+    if val is None:
+        return val
+    else:
+        return float(val)
+
+
 def str_or_none(val):
     """Attempt to stringify a value to unicode, or None."""
     if val is None:
@@ -48,9 +57,15 @@ def str_or_none(val):
 
 
 def dict_or_none(val):
-    """Attempt to dictify a value, or None."""
+    """Attempt to dictify a value, or None.
+
+    JSON read from the database is kept as is, to be decoded on first
+    access of the field.
+    """
     if val is None:
         return {}
+    elif type(val) is json_codec.RawJSON:
+        return val
     elif isinstance(val, six.string_types):
         return dict(ast.literal_eval(val))
     else:
@@ -61,9 +76,14 @@ def dict_or_none(val):
 
 
 def list_or_none(val):
-    """Attempt to listify a value, or None."""
+    """Attempt to listify a value, or None.
+
+    JSON read from the database is kept as is, like dict_or_none does.
+    """
     if val is None:
         return []
+    elif type(val) is json_codec.RawJSON:
+        return val
     elif isinstance(val, six.string_types):
         return list(ast.literal_eval(val))
     else:
@@ -92,6 +112,73 @@ def nested_object_or_none(objclass):
     return validator
 
 
+# Fast paths of the validators above for values read from the database,
+# which sqlalchemy already hands back typed. Anything else goes through the
+# full validator.
+
+_UTC = iso8601.iso8601.Utc()
+
+
+def _db_int(val):
+    if type(val) is int:
+        return val
+    return int(val)
+
+
+def _db_float_or_none(val):
+    if val is None or type(val) is float:
+        return val
+    return float_or_none(val)
+
+
+def _db_str_or_none(val):
+    if val is None or type(val) is six.text_type:
+        return val
+    return str_or_none(val)
+
+
+def _db_dict_or_none(val):
+    if type(val) is json_codec.RawJSON:
+        return val
+    if type(val) is dict:
+        return dict(val)
+    return dict_or_none(val)
+
+
+def _db_list_or_none(val):
+    if type(val) is json_codec.RawJSON:
+        return val
+    if type(val) is list:
+        return list(val)
+    return list_or_none(val)
+
+
+def _db_datetime_or_str_or_none(val):
+    if val is None:
+        return val
+    if type(val) is datetime.datetime and val.tzinfo is None:
+        return val.replace(tzinfo=_UTC)
+    return datetime_or_str_or_none(val)
+
+_DB_VALIDATORS = {
+    int: _db_int,
+    float_or_none: _db_float_or_none,
+    str_or_none: _db_str_or_none,
+    dict_or_none: _db_dict_or_none,
+    list_or_none: _db_list_or_none,
+    datetime_or_str_or_none: _db_datetime_or_str_or_none,
+}
+
+
+# fields of these types may hold json_codec.RawJSON
+JSON_TYPES = (dict_or_none, list_or_none)
+
+
+def db_validator(typefn):
+    """Return the validator of a field for values read from the database."""
+    return _DB_VALIDATORS.get(typefn, typefn)
+
+
 def dt_serializer(name):
     """Return a datetime serializer for a named attribute."""
     def serializer(self, name=name):
@@ -17,13 +17,15 @@ Tests for the API /bricks/ methods.
 """
 
 import datetime
+import urllib
 
 import mock
 from oslo.config import cfg
 
 from bricks.common import exception
-from bricks.common import utils
 from bricks.common import states
+from bricks.common import utils
+from bricks.db.sqlalchemy import api as sa_api
 from bricks import objects
 from bricks.openstack.common import timeutils
 from bricks.tests.api import base
@@ -51,6 +53,61 @@ class TestListBricks(base.FunctionalTest):
         self.assertEqual(brick['uuid'], data['bricks'][0]["uuid"])
         self.assertIn('configuration', data['bricks'][0])
 
+    def test_lazy_fields_batched(self):
+        for id in range(3):
+            ndict = dbutils.get_test_brick(id=id, uuid=utils.generate_uuid())
+            self.dbapi.create_brick(ndict)
+
+        with mock.patch.object(self.dbapi, 'get_brick_columns',
+                               wraps=self.dbapi.get_brick_columns) as get:
+            self.get_json('/bricks')
+            self.assertFalse(get.called)
+
+            data = self.get_json('/bricks/detail')
+            self.assertEqual(1, get.call_count)
+        for brick in data['bricks']:
+            self.assertEqual(ndict['configuration'], brick['configuration'])
+
+    def _list_statements(self, path, route):
+        before = self.dbapi.get_scope_metrics().get(route, {})
+        self.get_json(path)
+        after = self.dbapi.get_scope_metrics()[route]
+        return after['statements'] - before.get('statements', 0)
+
+    def test_list_statements_independent_of_rows(self):
+        self.dbapi.create_brick(dbutils.get_test_brick(
+            id=1, uuid=utils.generate_uuid()))
+        few = (self._list_statements('/bricks', 'GET /v1/bricks'),
+               self._list_statements('/bricks/detail',
+                                     'GET /v1/bricks/detail'))
+
+        for id in range(2, 8):
+            self.dbapi.create_brick(dbutils.get_test_brick(
+                id=id, uuid=utils.generate_uuid()))
+        many = (self._list_statements('/bricks', 'GET /v1/bricks'),
+                self._list_statements('/bricks/detail',
+                                      'GET /v1/bricks/detail'))
+
+        # no query per listed brick, whether or not it is expanded
+        self.assertEqual(few, many)
+
+    def test_get_one_in_unit_of_work(self):
+        ndict = dbutils.get_test_brick()
+        brick = self.dbapi.create_brick(ndict)
+        with mock.patch.object(sa_api.db_session, 'get_session',
+                               wraps=sa_api.db_session.get_session) as get:
+            data = self.get_json('/bricks/%s' % brick['uuid'])
+        self.assertEqual(brick['uuid'], data['uuid'])
+        self.assertEqual(1, get.call_count)
+        self.assertIsNone(sa_api._current_unit_of_work())
+
+    def test_get_one_scope_metrics(self):
+        brick = self.dbapi.create_brick(dbutils.get_test_brick())
+        self.get_json('/bricks/%s' % brick['uuid'])
+        metrics = self.dbapi.get_scope_metrics()['GET /v1/bricks/*']
+        self.assertTrue(metrics['calls'] >= 1)
+        self.assertTrue(metrics['statements'] >= 1)
+
     def test_detail_against_single(self):
         cdict = dbutils.get_test_brick()
         brick = self.dbapi.create_brick(cdict)
@@ -89,8 +146,66 @@ class TestListBricks(base.FunctionalTest):
         data = self.get_json('/bricks/?limit=3')
         self.assertEqual(3, len(data['bricks']))
 
-        next_marker = data['bricks'][-1]['uuid']
-        self.assertIn(next_marker, data['next'])
+        # the next link carries an opaque marker, not the last uuid
+        self.assertNotIn(data['bricks'][-1]['uuid'], data['next'])
+        data = self.get_json(data['next'].split('/v1', 1)[1])
+        self.assertEqual(bricks[3:], [b['uuid'] for b in data['bricks']])
+
+    def test_collection_links_escape_filters(self):
+        status = u'a&b=c d\xe9'
+        bricks = []
+        for id in range(4):
+            ndict = dbutils.get_test_brick(
+                id=id, uuid=utils.generate_uuid(),
+                instance_id=utils.generate_uuid(),
+                status=status if id != 1 else 'other')
+            br = self.dbapi.create_brick(ndict)
+            bricks.append(br['uuid'])
+        query = urllib.urlencode({'limit': 2,
+                                  'status': status.encode('utf-8')})
+        data = self.get_json('/bricks/?%s' % query)
+        self.assertEqual([bricks[0], bricks[2]],
+                         [b['uuid'] for b in data['bricks']])
+
+        data = self.get_json(data['next'].split('/v1', 1)[1])
+        self.assertEqual(bricks[3:], [b['uuid'] for b in data['bricks']])
+
+    def test_collection_links_sort_key(self):
+        bricks = []
+        for id in range(5):
+            ndict = dbutils.get_test_brick(
+                id=id, uuid=utils.generate_uuid(),
+                instance_id='instance-%d' % (5 - id))
+            br = self.dbapi.create_brick(ndict)
+            bricks.append(br['uuid'])
+        data = self.get_json('/bricks/?limit=3&sort_key=instance_id')
+        self.assertEqual(bricks[:1:-1], [b['uuid'] for b in data['bricks']])
+
+        data = self.get_json(data['next'].split('/v1', 1)[1])
+        self.assertEqual(bricks[1::-1], [b['uuid'] for b in data['bricks']])
+
+    def test_uuid_marker(self):
+        bricks = []
+        for id in range(5):
+            ndict = dbutils.get_test_brick(id=id, uuid=utils.generate_uuid())
+            br = self.dbapi.create_brick(ndict)
+            bricks.append(br['uuid'])
+        data = self.get_json('/bricks/?limit=3&marker=%s' % bricks[1])
+        self.assertEqual(bricks[2:], [b['uuid'] for b in data['bricks']])
+
+    def test_invalid_marker(self):
+        for id in range(5):
+            ndict = dbutils.get_test_brick(id=id, uuid=utils.generate_uuid())
+            self.dbapi.create_brick(ndict)
+        data = self.get_json('/bricks/?limit=3')
+        marker = data['next'].split('marker=')[1].split('&')[0]
+
+        response = self.get_json('/bricks/?marker=%s' % marker[::-1],
+                                 expect_errors=True)
+        self.assertEqual(400, response.status_int)
+        response = self.get_json('/bricks/?sort_key=status&marker=%s' % marker,
+                                 expect_errors=True)
+        self.assertEqual(400, response.status_int)
 
     def test_collection_links_default_limit(self):
         cfg.CONF.set_override('max_limit', 3, 'api')
@@ -102,8 +217,8 @@ class TestListBricks(base.FunctionalTest):
         data = self.get_json('/bricks')
         self.assertEqual(3, len(data['bricks']))
 
-        next_marker = data['bricks'][-1]['uuid']
-        self.assertIn(next_marker, data['next'])
+        data = self.get_json(data['next'].split('/v1', 1)[1])
+        self.assertEqual(bricks[3:], [b['uuid'] for b in data['bricks']])
 
 
 class TestPatch(base.FunctionalTest):
@@ -391,3 +506,81 @@ class TestLogTailing(base.FunctionalTest):
         self.assertEqual(brick.uuid, result['uuid'])
         self.assertEqual(brick.instance_id, result['instance_id'])
         self.assertEqual('10', result['length'])
+
+
+class TestBrickHealth(base.FunctionalTest):
+
+    def test_fetch_brick_health(self):
+        cdict = dbutils.get_test_brick()
+        brick = self.dbapi.create_brick(cdict)
+        self.dbapi.update_brick_health('compute-1', [
+            {'instance_id': brick.instance_id, 'domain_state': 'running',
+             'channel': True, 'occupant': True}])
+
+        result = self.get_json('/bricks/%s/health' % cdict['uuid'])
+
+        self.assertEqual(brick.instance_id, result['instance_id'])
+        self.assertEqual('compute-1', result['host'])
+        self.assertEqual('running', result['domain_state'])
+        self.assertTrue(result['occupant'])
+
+    def test_fetch_brick_health_not_reported(self):
+        cdict = dbutils.get_test_brick()
+        self.dbapi.create_brick(cdict)
+
+        response = self.get_json('/bricks/%s/health' % cdict['uuid'],
+                                 expect_errors=True)
+        self.assertEqual(404, response.status_int)
+
+
+class TestBrickStats(base.FunctionalTest):
+
+    def test_fetch_brick_stats(self):
+        cdict = dbutils.get_test_brick()
+        brick = self.dbapi.create_brick(cdict)
+        self.dbapi.add_brick_stats([
+            {'instance_id': brick.instance_id,
+             'timestamp': timeutils.utcnow_ts(),
+             'cpu': 42.0, 'mem_used': 1024.0}])
+
+        result = self.get_json('/bricks/%s/stats' % cdict['uuid'])
+
+        self.assertEqual(brick.uuid, result['uuid'])
+        self.assertEqual(60, result['resolution'])
+        self.assertEqual(1, len(result['samples']))
+        self.assertEqual(42.0, result['samples'][0]['cpu'])
+
+    def test_fetch_brick_stats_invalid_resolution(self):
+        cdict = dbutils.get_test_brick()
+        self.dbapi.create_brick(cdict)
+
+        response = self.get_json('/bricks/%s/stats?resolution=7'
+                                 % cdict['uuid'], expect_errors=True)
+        self.assertEqual(400, response.status_int)
+
+
+class TestBrickSummary(base.FunctionalTest):
+
+    def setUp(self):
+        super(TestBrickSummary, self).setUp()
+        self.addCleanup(sa_api._BRICK_COUNTS.clear)
+        for i, status in enumerate(['init', 'init', 'deploydone']):
+            self.dbapi.create_brick(dbutils.get_test_brick(
+                id=i + 1, uuid=utils.generate_uuid(),
+                instance_id=utils.generate_uuid(), status=status))
+
+    def test_summary(self):
+        result = self.get_json('/bricks/summary')
+        self.assertEqual('status', result['group_by'])
+        self.assertEqual(3, result['total'])
+        self.assertEqual({'init': 2, 'deploydone': 1}, result['counts'])
+
+    def test_summary_by_tenant(self):
+        tenant_id = dbutils.get_test_brick()['tenant_id']
+        result = self.get_json('/bricks/summary?group_by=tenant_id')
+        self.assertEqual({tenant_id: 3}, result['counts'])
+
+    def test_summary_invalid_group(self):
+        response = self.get_json('/bricks/summary?group_by=configuration',
+                                 expect_errors=True)
+        self.assertEqual(400, response.status_int)
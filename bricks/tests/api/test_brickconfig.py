@@ -22,7 +22,9 @@ import datetime
 import mock
 from oslo.config import cfg
 
+from bricks.api.controllers.v1 import brickconfig as api_brickconfig
 from bricks.common import utils
+from bricks import objects
 from bricks.openstack.common import timeutils
 from bricks.tests.api import base
 from bricks.tests.api import utils as apiutils
@@ -121,8 +123,29 @@ class TestListBrickConfigs(base.FunctionalTest):
         data = self.get_json('/brickconfigs/?limit=3')
         self.assertEqual(3, len(data['brickconfigs']))
 
-        next_marker = data['brickconfigs'][-1]['uuid']
-        self.assertIn(next_marker, data['next'])
+        data = self.get_json(data['next'].split('/v1', 1)[1])
+        self.assertEqual(bricks[3:], [b['uuid'] for b in data['brickconfigs']])
+
+    def test_collection_links_sort_key(self):
+        bricks = []
+        for id in range(5):
+            ndict = dbutils.get_test_brickconfig(
+                id=id, uuid=utils.generate_uuid(),
+                created_at=datetime.datetime(2014, 1, 1, 5 - id))
+            br = self.dbapi.create_brickconfig(ndict)
+            bricks.append(br['uuid'])
+        data = self.get_json('/brickconfigs/?limit=3&sort_key=created_at')
+        self.assertEqual(bricks[:1:-1],
+                         [b['uuid'] for b in data['brickconfigs']])
+
+        data = self.get_json(data['next'].split('/v1', 1)[1])
+        self.assertEqual(bricks[1::-1],
+                         [b['uuid'] for b in data['brickconfigs']])
+
+    def test_sort_key_not_scalar(self):
+        response = self.get_json('/brickconfigs/?sort_key=environ',
+                                 expect_errors=True)
+        self.assertEqual(400, response.status_int)
 
     def test_collection_links_default_limit(self):
         cfg.CONF.set_override('max_limit', 3, 'api')
@@ -134,8 +157,102 @@ class TestListBrickConfigs(base.FunctionalTest):
         data = self.get_json('/brickconfigs')
         self.assertEqual(3, len(data['brickconfigs']))
 
-        next_marker = data['brickconfigs'][-1]['uuid']
-        self.assertIn(next_marker, data['next'])
+        data = self.get_json(data['next'].split('/v1', 1)[1])
+        self.assertEqual(bricks[3:], [b['uuid'] for b in data['brickconfigs']])
+
+
+class TestConditionalRequests(base.FunctionalTest):
+
+    def setUp(self):
+        super(TestConditionalRequests, self).setUp()
+        self.cdict = dbutils.get_test_brickconfig()
+        self.dbapi.create_brickconfig(self.cdict)
+
+    def _get(self, path, headers=None):
+        return self.get_json(path, expect_errors=True, headers=headers)
+
+    def test_get_one_not_modified(self):
+        path = '/brickconfigs/%s' % self.cdict['uuid']
+        etag = self._get(path).etag
+        self.assertTrue(etag)
+
+        with mock.patch.object(api_brickconfig.BrickConfig,
+                               'convert_with_links') as convert:
+            response = self._get(path, headers={'If-None-Match':
+                                                '"%s"' % etag})
+        self.assertEqual(304, response.status_int)
+        self.assertEqual('', response.body)
+        self.assertEqual(etag, response.etag)
+        self.assertFalse(convert.called)
+
+    def test_detail_modified(self):
+        etag = self._get('/brickconfigs/detail').etag
+        response = self._get('/brickconfigs/detail',
+                             headers={'If-None-Match': '"%s"' % etag})
+        self.assertEqual(304, response.status_int)
+
+        self.dbapi.update_brickconfig(self.cdict['uuid'],
+                                      {'version': 'new'})
+        response = self._get('/brickconfigs/detail',
+                             headers={'If-None-Match': '"%s"' % etag})
+        self.assertEqual(200, response.status_int)
+        self.assertNotEqual(etag, response.etag)
+        self.assertEqual('new', response.json['brickconfigs'][0]['version'])
+
+    def test_patch_if_match(self):
+        path = '/brickconfigs/%s' % self.cdict['uuid']
+        etag = self._get(path).etag
+        patch = [{'path': '/version', 'value': 'new', 'op': 'replace'}]
+
+        response = self.patch_json(path, patch,
+                                   headers={'If-Match': '"%s"' % etag},
+                                   context=self.context)
+        self.assertEqual(200, response.status_int)
+        self.assertNotEqual(etag, response.etag)
+        self.assertEqual(response.etag, self._get(path).etag)
+
+        # the brickconfig changed since etag was read
+        response = self.patch_json(path, patch, expect_errors=True,
+                                   headers={'If-Match': '"%s"' % etag},
+                                   context=self.context)
+        self.assertEqual(412, response.status_int)
+
+    def test_patch_if_match_same_second(self):
+        # updated_at does not tell apart writes within a second on MySQL
+        timeutils.set_time_override(datetime.datetime(2014, 6, 1))
+        self.addCleanup(timeutils.clear_time_override)
+        path = '/brickconfigs/%s' % self.cdict['uuid']
+        self.dbapi.update_brickconfig(self.cdict['uuid'], {'version': 'a'})
+        etag = self._get(path).etag
+        self.dbapi.update_brickconfig(self.cdict['uuid'], {'version': 'b'})
+
+        response = self.patch_json(path, [{'path': '/name', 'value': 'new',
+                                           'op': 'replace'}],
+                                   expect_errors=True,
+                                   headers={'If-Match': '"%s"' % etag},
+                                   context=self.context)
+        self.assertEqual(412, response.status_int)
+
+    def test_patch_changed_after_read(self):
+        path = '/brickconfigs/%s' % self.cdict['uuid']
+        etag = self._get(path).etag
+        get_by_uuid = objects.BrickConfig.get_by_uuid
+
+        def read_then_change(context, uuid):
+            rpc_brickconfig = get_by_uuid(context, uuid)
+            self.dbapi.update_brickconfig(uuid, {'version': 'other'})
+            return rpc_brickconfig
+
+        with mock.patch.object(objects.BrickConfig, 'get_by_uuid',
+                               side_effect=read_then_change):
+            response = self.patch_json(path, [{'path': '/name',
+                                               'value': 'new',
+                                               'op': 'replace'}],
+                                       expect_errors=True,
+                                       headers={'If-Match': '"%s"' % etag},
+                                       context=self.context)
+        self.assertEqual(412, response.status_int)
+        self.assertEqual(self.cdict['name'], self._get(path).json['name'])
 
 
 class TestPatch(base.FunctionalTest):
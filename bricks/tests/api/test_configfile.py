@@ -3,11 +3,13 @@ Tests for the API /configfiles/ methods.
 """
 
 import datetime
+import hashlib
 
 import mock
 from oslo.config import cfg
 
 from bricks.common import utils
+from bricks import objects
 from bricks.openstack.common import timeutils
 from bricks.tests.api import base
 from bricks.tests.api import utils as apiutils
@@ -96,8 +98,8 @@ class TestListConfigFiles(base.FunctionalTest):
         data = self.get_json('/configfiles?limit=3&brickconfig_uuid=1be26c0b-03f2-4d2e-ae87-c02d7f33c123')
         self.assertEqual(3, len(data['configfiles']))
 
-        next_marker = data['configfiles'][-1]['uuid']
-        self.assertIn(next_marker, data['next'])
+        data = self.get_json(data['next'].split('/v1', 1)[1])
+        self.assertEqual(configs[3:], [c['uuid'] for c in data['configfiles']])
 
     def test_collection_links_default_limit(self):
         cfg.CONF.set_override('max_limit', 3, 'api')
@@ -111,8 +113,94 @@ class TestListConfigFiles(base.FunctionalTest):
         data = self.get_json('/configfiles?brickconfig_uuid=1be26c0b-03f2-4d2e-ae87-c02d7f33c123')
         self.assertEqual(3, len(data['configfiles']))
 
-        next_marker = data['configfiles'][-1]['uuid']
-        self.assertIn(next_marker, data['next'])
+        data = self.get_json(data['next'].split('/v1', 1)[1])
+        self.assertEqual(configs[3:], [c['uuid'] for c in data['configfiles']])
+
+
+class TestConditionalRequests(base.FunctionalTest):
+
+    def setUp(self):
+        super(TestConditionalRequests, self).setUp()
+        self.cdict = dbutils.get_test_configfile()
+        self.dbapi.create_configfile(self.cdict)
+        self.path = '/configfiles/%s' % self.cdict['uuid']
+
+    def _get(self, path, headers=None):
+        return self.get_json(path, expect_errors=True, headers=headers)
+
+    def test_get_one_not_modified(self):
+        etag = self._get(self.path).etag
+
+        response = self._get(self.path,
+                             headers={'If-None-Match': '"%s"' % etag})
+        self.assertEqual(304, response.status_int)
+        self.assertEqual('', response.body)
+
+    def test_list_not_modified(self):
+        path = ('/configfiles?brickconfig_uuid=%s' %
+                self.cdict['brickconfig_uuid'])
+        etag = self._get(path).etag
+
+        response = self._get(path, headers={'If-None-Match': '"%s"' % etag})
+        self.assertEqual(304, response.status_int)
+
+        self.dbapi.update_configfile(self.cdict['uuid'],
+                                     {'contents': 'RUN: changed'})
+        response = self._get(path, headers={'If-None-Match': '"%s"' % etag})
+        self.assertEqual(200, response.status_int)
+
+    def test_patch_stale_if_match(self):
+        etag = self._get(self.path).etag
+        self.dbapi.update_configfile(self.cdict['uuid'],
+                                     {'contents': 'RUN: changed'})
+
+        response = self.patch_json(self.path,
+                                   [{'path': '/name', 'value': 'new',
+                                     'op': 'replace'}],
+                                   expect_errors=True,
+                                   headers={'If-Match': '"%s"' % etag},
+                                   context=self.context)
+        self.assertEqual(412, response.status_int)
+        self.assertEqual(self.cdict['name'], self._get(self.path).json['name'])
+
+    def _patch_name(self, name, etag):
+        return self.patch_json(self.path,
+                               [{'path': '/name', 'value': name,
+                                 'op': 'replace'}],
+                               expect_errors=True,
+                               headers={'If-Match': '"%s"' % etag},
+                               context=self.context)
+
+    def test_patch_if_match_same_second(self):
+        # updated_at does not tell apart writes within a second on MySQL
+        timeutils.set_time_override(datetime.datetime(2014, 6, 1))
+        self.addCleanup(timeutils.clear_time_override)
+        self.dbapi.update_configfile(self.cdict['uuid'],
+                                     {'description': 'read'})
+        etag = self._get(self.path).etag
+
+        self.assertEqual(200, self._patch_name('first', etag).status_int)
+        self.assertEqual(412, self._patch_name('second', etag).status_int)
+        self.assertEqual('first', self._get(self.path).json['name'])
+
+    def test_patch_changed_after_read_same_second(self):
+        timeutils.set_time_override(datetime.datetime(2014, 6, 1))
+        self.addCleanup(timeutils.clear_time_override)
+        self.dbapi.update_configfile(self.cdict['uuid'],
+                                     {'description': 'read'})
+        etag = self._get(self.path).etag
+        get_by_uuid = objects.ConfigFile.get_by_uuid
+
+        def read_then_change(context, uuid):
+            rpc_configfile = get_by_uuid(context, uuid)
+            self.dbapi.update_configfile(uuid, {'description': 'other'})
+            return rpc_configfile
+
+        with mock.patch.object(objects.ConfigFile, 'get_by_uuid',
+                               side_effect=read_then_change):
+            response = self._patch_name('new', etag)
+        self.assertEqual(412, response.status_int)
+        self.assertEqual(self.cdict['name'], self._get(self.path).json['name'])
 
 
 class TestPatch(base.FunctionalTest):
@@ -155,6 +243,27 @@ class TestPatch(base.FunctionalTest):
 
         self.assertEqual(test_time, return_updated_at)
 
+    def test_replace_contents_updates_sha256(self):
+        cdict = dbutils.get_test_configfile()
+        response = self.patch_json('/configfiles/%s' % cdict['uuid'],
+                                   [{'path': '/contents',
+                                     'value': 'RUN: pwd', 'op': 'replace'}],
+                                   context=self.context)
+        self.assertEqual(200, response.status_code)
+        sha256 = hashlib.sha256('RUN: pwd').hexdigest()
+        self.assertEqual(sha256, response.json['contents_sha256'])
+        result = self.get_json('/configfiles/%s' % cdict['uuid'])
+        self.assertEqual(sha256, result['contents_sha256'])
+
+    def test_replace_sha256(self):
+        cdict = dbutils.get_test_configfile()
+        response = self.patch_json('/configfiles/%s' % cdict['uuid'],
+                                   [{'path': '/contents_sha256',
+                                     'value': '0' * 64, 'op': 'replace'}],
+                                   expect_errors=True,
+                                   context=self.context)
+        self.assertEqual(400, response.status_int)
+
     def test_remove_uuid(self):
         cdict = dbutils.get_test_configfile()
         response = self.patch_json('/configfiles/%s' % cdict['uuid'],
@@ -178,6 +287,8 @@ class TestPost(base.FunctionalTest):
 
         result = self.get_json('/configfiles/%s' % cdict['uuid'])
         self.assertEqual(cdict['uuid'], result['uuid'])
+        self.assertEqual(hashlib.sha256(cdict['contents']).hexdigest(),
+                         result['contents_sha256'])
         self.assertFalse(result['updated_at'])
         return_created_at = timeutils.parse_isotime(result['created_at']).replace(tzinfo=None)
         self.assertEqual(test_time, return_created_at)
@@ -0,0 +1,24 @@
+from bricks.tests.api import base
+
+
+class TestMetrics(base.FunctionalTest):
+
+    def test_get_all(self):
+        self.get_json('/brickconfigs')
+
+        data = self.get_json('/metrics', context=self.context)
+
+        self.assertIn('primary', data['engines'])
+        scope = data['scopes']['GET /v1/brickconfigs']
+        self.assertTrue(scope['calls'] >= 1)
+        self.assertTrue(scope['statements'] >= 1)
+        self.assertEqual(set(['calls', 'statements', 'seconds',
+                              'n_plus_one']), set(scope))
+
+    def test_get_all_not_admin(self):
+        self.context.is_admin = False
+
+        response = self.get_json('/metrics', expect_errors=True,
+                                 context=self.context)
+
+        self.assertEqual(403, response.status_int)
@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+
 import wsme
 
 from bricks.api.controllers.v1 import utils
@@ -44,3 +46,60 @@ class TestApiUtils(base.FunctionalTest):
         self.assertRaises(wsme.exc.ClientSideError,
                           utils.validate_sort_dir,
                           'fake-sort')
+
+    def test_marker_round_trip(self):
+        obj = utils.Marker([('id', 7),
+                            ('created_at', datetime.datetime(2014, 2, 3))])
+        marker = utils.encode_marker(obj, 'created_at')
+
+        decoded = utils.decode_marker(marker, 'created_at')
+        self.assertEqual(7, decoded.id)
+        self.assertEqual(datetime.datetime(2014, 2, 3), decoded.created_at)
+
+    def test_marker_dict_value(self):
+        obj = utils.Marker([('id', 7), ('environ', {'datetime': 'now'})])
+        marker = utils.encode_marker(obj, 'environ')
+
+        decoded = utils.decode_marker(marker, 'environ')
+        self.assertEqual({'datetime': 'now'}, decoded.environ)
+
+    def test_marker_default_secret(self):
+        marker = utils.encode_marker(utils.Marker([('id', 7)]), 'id')
+        self.assertEqual(7, utils.decode_marker(marker, 'id').id)
+
+        # shared by the workers of one database
+        CONF.set_override('connection', 'sqlite:///other.db', 'database')
+        self.addCleanup(CONF.clear_override, 'connection', 'database')
+        self.assertRaises(wsme.exc.ClientSideError,
+                          utils.decode_marker, marker, 'id')
+
+    def test_marker_tampered(self):
+        marker = utils.encode_marker(utils.Marker([('id', 7)]), 'id')
+        forged = utils.encode_marker(utils.Marker([('id', 8)]), 'id')
+        forged = forged.split('.')[0] + '.' + marker.split('.')[1]
+
+        self.assertRaises(wsme.exc.ClientSideError,
+                          utils.decode_marker, forged, 'id')
+        self.assertRaises(wsme.exc.ClientSideError,
+                          utils.decode_marker, 'garbage', 'id')
+
+    def test_marker_other_secret(self):
+        marker = utils.encode_marker(utils.Marker([('id', 7)]), 'id')
+        CONF.set_override('marker_secret', 'another secret', 'api')
+        self.addCleanup(CONF.clear_override, 'marker_secret', 'api')
+
+        self.assertRaises(wsme.exc.ClientSideError,
+                          utils.decode_marker, marker, 'id')
+
+    def test_etag(self):
+        created_at = datetime.datetime(2014, 2, 3)
+        obj = utils.Marker([('uuid', 'abc'), ('created_at', created_at),
+                            ('updated_at', None)])
+
+        self.assertEqual(utils.object_etag(obj),
+                         utils.etag('abc', created_at, None))
+        self.assertNotEqual(utils.etag('abc', created_at, None),
+                            utils.etag('abc', created_at,
+                                       datetime.datetime(2014, 2, 4)))
+        # parts are delimited
+        self.assertNotEqual(utils.etag('ab', 'c'), utils.etag('a', 'bc'))
@@ -109,6 +109,15 @@ class Database(fixtures.Fixture):
         """Any addition steps that are needed outside of the migrations."""
 
 
+def statement_kinds(scope):
+    """The kind of each statement run in an instrumentation scope, like
+    SELECT or UPDATE, in alphabetical order.
+    """
+    return sorted(shape.split(None, 1)[0].upper()
+                  for shape, count in scope.shapes.items()
+                  for _i in range(count))
+
+
 class ReplaceModule(fixtures.Fixture):
     """Replace a module with a fake module."""
 
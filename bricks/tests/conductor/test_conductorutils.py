@@ -30,6 +30,25 @@ class DestroyTestCase(base.DbTestCase):
         self.context = context.get_admin_context()
         self.dbapi = dbapi.get_instance()
 
+    @mock.patch('bricks.common.opencrack.build_nova_client')
+    def test_deleted_instances_cleanup(self, build_client):
+        kept = self.dbapi.create_brick(test_utils.get_test_brick(
+            id=1, uuid='1be26c0b-03f2-4d2e-ae87-c02d7f330001',
+            instance_id='instance-1'))
+        for i in range(2, 5):
+            self.dbapi.create_brick(test_utils.get_test_brick(
+                id=i, uuid='1be26c0b-03f2-4d2e-ae87-c02d7f33000%d' % i,
+                instance_id='instance-%d' % i))
+        build_client.return_value.servers.list.return_value = [
+            mock.Mock(id='instance-1')]
+
+        with mock.patch.object(self.dbapi, 'destroy_brick') as destroy:
+            utils.deleted_instances_cleanup_action(self.context)
+        self.assertFalse(destroy.called)
+
+        bricks = self.dbapi.get_brick_list()
+        self.assertEqual([kept.uuid], [brick.uuid for brick in bricks])
+
 
 class ConfigFileTestCase(base.DbTestCase):
     def setUp(self):
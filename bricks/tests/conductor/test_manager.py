@@ -1,5 +1,7 @@
+import datetime
 import time
 
+from eventlet import event
 import mock
 from oslo.config import cfg
 
@@ -7,9 +9,11 @@ from bricks.common import exception
 from bricks.common import states
 from bricks.conductor import manager
 from bricks.db import api as dbapi
+from bricks import objects
 from bricks.objects.mortar_task import (COMPLETE, RUNNING, ERROR,
                                         INSUFF, STATE_LIST)
 from bricks.openstack.common import context
+from bricks.openstack.common import timeutils
 from bricks.tests.db import base
 from bricks.tests.db import utils
 
@@ -176,6 +180,29 @@ class ManagerTestCase(base.DbTestCase):
                                                    10)
         self.assertEqual(brick_log.log, 'asdf1234')
 
+    @mock.patch('bricks.mortar.rpcapi.MortarAPI.do_check_instances')
+    def test_heartbeat_keepalive_all_instances(self, check_fn):
+        brick = self.dbapi.create_brick(utils.get_test_brick())
+
+        self.service.start()
+        self.service.heartbeat_keepalive_all_instances(self.context)
+
+        check_fn.assert_called_once_with(self.context, [brick.instance_id])
+
+    @mock.patch('bricks.mortar.rpcapi.MortarAPI.do_check_instances')
+    def test_periodic_task_scope_metrics(self, check_fn):
+        self.dbapi.create_brick(utils.get_test_brick())
+        self.service.start()
+        name = 'heartbeat_keepalive_all_instances'
+        before = self.dbapi.get_scope_metrics().get(
+            name, {'calls': 0, 'statements': 0})
+
+        self.service.heartbeat_keepalive_all_instances(self.context)
+
+        after = self.dbapi.get_scope_metrics()[name]
+        self.assertEqual(before['calls'] + 1, after['calls'])
+        self.assertTrue(after['statements'] > before['statements'])
+
     @mock.patch('bricks.conductor.utils.deleted_instances_cleanup_action')
     def test_check_deleted_instances_call(self, deleted_call):
         self.service.start()
@@ -195,6 +222,42 @@ class ManagerTestCase(base.DbTestCase):
         self.assertEqual(brickconfig.version,
                          brick.configuration.get("current_version"))
 
+    @mock.patch.object(dbapi.get_instance(), 'purge_shadow_bricks')
+    @mock.patch.object(dbapi.get_instance(), 'archive_deleted_bricks')
+    def test_archive_deleted_bricks(self, archive_fn, purge_fn):
+        self.config(archive_after_days=30, archive_batch_size=100,
+                    archive_max_rows=1000, archive_batch_delay=0.5,
+                    shadow_retention_days=90, group='conductor')
+        now = datetime.datetime(2014, 6, 1)
+        timeutils.set_time_override(now)
+        self.addCleanup(timeutils.clear_time_override)
+        archive_fn.return_value = 0
+        purge_fn.return_value = 0
+
+        self.service.start()
+        self.service.archive_deleted_bricks(self.context)
+        self.service._worker_pool.waitall()
+
+        archive_fn.assert_called_once_with(
+            now - datetime.timedelta(days=30), 100, max_rows=1000,
+            delay=0.5)
+        purge_fn.assert_called_once_with(
+            now - datetime.timedelta(days=90), 100, max_rows=1000,
+            delay=0.5)
+
+    @mock.patch.object(dbapi.get_instance(), 'archive_deleted_bricks')
+    def test_archive_deleted_bricks_running(self, archive_fn):
+        waiter = event.Event()
+        archive_fn.side_effect = lambda *args, **kwargs: waiter.wait()
+
+        self.service.start()
+        self.service.archive_deleted_bricks(self.context)
+        self.service.archive_deleted_bricks(self.context)
+        waiter.send(0)
+        self.service._worker_pool.waitall()
+
+        self.assertEqual(1, archive_fn.call_count)
+
     @mock.patch('bricks.conductor.utils.notify_completion')
     def test_report_task_done(self, notify_fn):
         brick = self.dbapi.create_brickconfig(
@@ -209,6 +272,39 @@ class ManagerTestCase(base.DbTestCase):
         brick.refresh(self.context)
         self.assertEqual(states.DEPLOYDONE, brick.status)
 
+    def test_report_health(self):
+        brick = self.dbapi.create_brick(utils.get_test_brick())
+        report = objects.MortarHealthReport()
+        report.host = 'compute-1'
+        report.instances = [{'instance_id': brick.instance_id,
+                             'domain_state': 'running',
+                             'channel': True,
+                             'occupant': False}]
+
+        self.service.start()
+        self.service.do_report_health(self.context, report)
+
+        health = self.dbapi.get_brick_health(brick.instance_id)
+        self.assertEqual('compute-1', health.host)
+        self.assertEqual('running', health.domain_state)
+        self.assertTrue(health.channel)
+        self.assertFalse(health.occupant)
+
+    def test_report_stats(self):
+        brick = self.dbapi.create_brick(utils.get_test_brick())
+        report = objects.MortarStatsReport()
+        report.host = 'compute-1'
+        report.samples = [{'instance_id': brick.instance_id,
+                           'timestamp': int(time.time()),
+                           'cpu': 12.5, 'mem_used': 256.0}]
+
+        self.service.start()
+        self.service.do_report_stats(self.context, report)
+
+        stats = self.dbapi.get_brick_stats(brick.instance_id)
+        self.assertEqual(1, len(stats))
+        self.assertEqual(12.5, stats[0].cpu)
+
     def test__spawn_worker(self):
         func_mock = mock.Mock()
         args = (1, 2, "test")
@@ -95,3 +95,21 @@ class RPCAPITestCase(base.DbTestCase):
         self._test_rpcapi('do_tail_brick_log', 'call',
                           brick_uuid=self.fake_brick['uuid'],
                           length=10)
+
+    def test_report_health(self):
+        report = objects.MortarHealthReport()
+        report.host = 'compute-1'
+        report.instances = []
+
+        self._test_rpcapi(
+            'do_report_health', 'cast',
+            health_report=report.obj_to_primitive())
+
+    def test_report_stats(self):
+        report = objects.MortarStatsReport()
+        report.host = 'compute-1'
+        report.samples = []
+
+        self._test_rpcapi(
+            'do_report_stats', 'cast',
+            stats_report=report.obj_to_primitive())
@@ -1,14 +1,31 @@
 """Tests for manipulating Brick objects via the DB API"""
 
+import datetime
+import json
+
+import mock
+from oslo.config import cfg
 import six
 
+from bricks.common import context
 from bricks.common import exception
+from bricks.common import json_codec
 from bricks.common import utils as bricks_utils
 from bricks.db import api as dbapi
+from bricks.db.sqlalchemy import api as sa_api
+from bricks.db.sqlalchemy import instrumentation
+from bricks.db.sqlalchemy import models
+from bricks.openstack.common import local
+from bricks.openstack.common import timeutils
 
+from bricks.tests import base as tests_base
 from bricks.tests.db import base
 from bricks.tests.db import utils
 
+CONF = cfg.CONF
+CONF.import_opt('stats_archives', 'bricks.conductor.manager',
+                group='conductor')
+
 
 class DbBrickTestCase(base.DbTestCase):
 
@@ -35,6 +52,112 @@ class DbBrickTestCase(base.DbTestCase):
         res_uuids = [r.uuid for r in res]
         self.assertEqual(uuids.sort(), res_uuids.sort())
 
+    def test_get_brick_list_defers_configuration(self):
+        self._create_test_brick(configuration={'network': 'net-1'})
+        brick = self.dbapi.get_brick_list()[0]
+
+        self.assertNotIn('configuration', brick)
+        # loaded on access
+        self.assertEqual({'network': 'net-1'}, brick.configuration)
+        self.assertEqual(set(), brick.obj_what_changed())
+
+    def test_get_brick_rows(self):
+        self._create_test_brick(status='deploying')
+        self._create_test_brick(id=2, uuid=bricks_utils.generate_uuid(),
+                                instance_id='def456', status='init')
+
+        rows = self.dbapi.get_brick_rows(['uuid', 'instance_id'],
+                                         filters={'status': 'init'})
+
+        self.assertEqual(1, len(rows))
+        self.assertEqual('def456', rows[0].instance_id)
+        self.assertEqual(('uuid', 'instance_id'), tuple(rows[0].keys()))
+
+    def test_get_brick_rows_invalid_column(self):
+        self.assertRaises(exception.InvalidBrickColumn,
+                          self.dbapi.get_brick_rows, ['uuid', 'nope'])
+
+    def test_get_brick_columns(self):
+        self._create_test_brick(id=1)
+        self._create_test_brick(id=2, uuid=bricks_utils.generate_uuid(),
+                                configuration={'second': 'brick'})
+        self._create_test_brick(id=3, uuid=bricks_utils.generate_uuid())
+
+        rows = self.dbapi.get_brick_columns([1, 2], ['configuration'])
+
+        self.assertEqual([1, 2], sorted(row.id for row in rows))
+        self.assertEqual({'second': 'brick'},
+                         [row for row in rows
+                          if row.id == 2][0].configuration)
+
+    def test_get_brick_decodes_configuration_on_access(self):
+        self._create_test_brick(id=1, configuration={'network': 'net-1'})
+        brick = self.dbapi.get_brick(1)
+
+        self.assertIs(json_codec.RawJSON, type(brick._configuration))
+        self.assertEqual({'network': 'net-1'}, brick.configuration)
+        self.assertEqual({'network': 'net-1'}, brick._configuration)
+        self.assertEqual(set(), brick.obj_what_changed())
+
+    def test_get_brick_rows_decodes_configuration(self):
+        self._create_test_brick(configuration={'network': 'net-1'})
+
+        rows = self.dbapi.get_brick_rows(['configuration'])
+
+        self.assertEqual({'network': 'net-1'}, rows[0].configuration)
+        self.assertEqual(('configuration',), tuple(rows[0].keys()))
+
+    def test_update_brick_raw_configuration_not_encoded(self):
+        self._create_test_brick(id=1, configuration={'network': 'net-1'})
+        raw = self.dbapi.get_brick(1)._configuration
+
+        with mock.patch.object(json_codec, 'dumps') as dumps:
+            self.dbapi.update_brick(1, {'configuration': raw})
+
+        self.assertFalse(dumps.called)
+        self.assertEqual({'network': 'net-1'},
+                         self.dbapi.get_brick(1).configuration)
+
+    def test_json_codec(self):
+        self.config(json_codec='json', group='database')
+        with mock.patch.object(json_codec, '_CODEC', []):
+            self.assertIs(json, json_codec.codec())
+            self.assertEqual({'a': [1]}, json_codec.decoded(
+                json_codec.RawJSON(u'{"a": [1]}')))
+
+        self.config(json_codec='nope', group='database')
+        with mock.patch.object(json_codec, '_CODEC', []):
+            self.assertRaises(exception.BricksException, json_codec.codec)
+
+    def test_get_brick_columns_invalid_column(self):
+        self.assertRaises(exception.InvalidColumn,
+                          self.dbapi.get_brick_columns, [1], ['nope'])
+
+    @mock.patch('eventlet.greenthread.sleep')
+    def test_iter_bricks(self, sleep_fn):
+        for i in range(1, 6):
+            self._create_test_brick(id=i, uuid=bricks_utils.generate_uuid())
+        self._create_test_brick(id=6, uuid=bricks_utils.generate_uuid(),
+                                status='init')
+
+        bricks = list(self.dbapi.iter_bricks(
+            filters={'status': utils.get_test_brick()['status']},
+            chunk_size=2))
+
+        self.assertEqual([1, 2, 3, 4, 5], [b.id for b in bricks])
+        # yielded between each of the three chunks
+        self.assertEqual(2, sleep_fn.call_count)
+
+    def test_iter_bricks_columns(self):
+        self._create_test_brick(id=1, uuid=bricks_utils.generate_uuid())
+        self._create_test_brick(id=2, uuid=bricks_utils.generate_uuid())
+
+        rows = list(self.dbapi.iter_bricks(columns=['instance_id'],
+                                           chunk_size=1))
+
+        self.assertEqual([1, 2], [row.id for row in rows])
+        self.assertEqual(('id', 'instance_id'), tuple(rows[0].keys()))
+
     def test_get_brick_by_id(self):
         br = self._create_test_brick()
         brick = self.dbapi.get_brick(br['id'])
@@ -65,6 +188,18 @@ class DbBrickTestCase(base.DbTestCase):
 
         self.assertEqual(res.uuid, new_uuid)
 
+    def test_update_brick_statements(self):
+        br = self._create_test_brick()
+        with instrumentation.scope('test') as scope:
+            self.dbapi.update_brick(br['id'], {'status': 'deploying'})
+
+        # one UPDATE where the database can return the row it wrote
+        if sa_api.get_engine().dialect.implicit_returning:
+            self.assertEqual(['UPDATE'], tests_base.statement_kinds(scope))
+        else:
+            self.assertEqual(['SELECT', 'UPDATE'],
+                             tests_base.statement_kinds(scope))
+
     def test_update_brick_that_does_not_exist(self):
         new_uuid = bricks_utils.generate_uuid()
 
@@ -82,6 +217,480 @@ class DbBrickTestCase(base.DbTestCase):
         bricks = self.dbapi.get_brick_list()
         self.assertEqual(0, len(bricks))
 
+    def test_destroy_brick_statements(self):
+        br = self._create_test_brick()
+        with instrumentation.scope('test') as scope:
+            self.dbapi.destroy_brick(br['id'])
+
+        self.assertEqual(['UPDATE'], tests_base.statement_kinds(scope))
+
+    def test_create_brick_statements(self):
+        with instrumentation.scope('test') as scope:
+            self._create_test_brick()
+
+        self.assertEqual(['INSERT'], tests_base.statement_kinds(scope))
+
+    def test_create_bricks(self):
+        values_list = [utils.get_test_brick(id=i, uuid=None,
+                                            instance_id='instance-%d' % i)
+                       for i in range(1, 6)]
+        with mock.patch.object(sa_api, 'BULK_WRITE_BATCH', 2):
+            with instrumentation.scope('test') as scope:
+                uuids = self.dbapi.create_bricks(values_list)
+
+        self.assertEqual(['INSERT'] * 3, tests_base.statement_kinds(scope))
+        bricks = self.dbapi.get_brick_list()
+        self.assertEqual(sorted(uuids),
+                         sorted(brick.uuid for brick in bricks))
+        # the caller's values are left alone
+        self.assertEqual([None] * 5,
+                         [values['uuid'] for values in values_list])
+
+    def test_update_bricks(self):
+        ids = [self._create_test_brick(
+            id=i, uuid=bricks_utils.generate_uuid())['id']
+            for i in range(1, 6)]
+        self.dbapi.destroy_brick(ids[0])
+        with mock.patch.object(sa_api, 'BULK_WRITE_BATCH', 2):
+            with instrumentation.scope('test') as scope:
+                count = self.dbapi.update_bricks(ids,
+                                                 {'status': 'deploying'})
+
+        self.assertEqual(4, count)
+        self.assertEqual(['UPDATE'] * 3, tests_base.statement_kinds(scope))
+        for brick_id in ids[1:]:
+            self.assertEqual('deploying',
+                             self.dbapi.get_brick(brick_id).status)
+
+    def test_update_bricks_values_per_brick(self):
+        ids = [self._create_test_brick(
+            id=i, uuid=bricks_utils.generate_uuid())['id']
+            for i in range(1, 4)]
+
+        count = self.dbapi.update_bricks(
+            ids, [{'configuration': {'n': brick_id}} for brick_id in ids])
+
+        self.assertEqual(3, count)
+        for brick_id in ids:
+            self.assertEqual({'n': brick_id},
+                             self.dbapi.get_brick(brick_id).configuration)
+
+    def test_update_bricks_values_mismatch(self):
+        self.assertRaises(exception.BulkValuesMismatch,
+                          self.dbapi.update_bricks, [1, 2], [{}])
+
+    def test_destroy_bricks(self):
+        ids = [self._create_test_brick(
+            id=i, uuid=bricks_utils.generate_uuid())['id']
+            for i in range(1, 4)]
+        with instrumentation.scope('test') as scope:
+            count = self.dbapi.destroy_bricks(ids[:2] + [1337])
+
+        self.assertEqual(2, count)
+        self.assertEqual(['UPDATE'], tests_base.statement_kinds(scope))
+        self.assertEqual([ids[2]],
+                         [brick.id for brick in self.dbapi.get_brick_list()])
+
+    def _create_deleted_bricks(self, ids, deleted_at):
+        timeutils.set_time_override(deleted_at)
+        self.addCleanup(timeutils.clear_time_override)
+        for brick_id in ids:
+            brick = self._create_test_brick(
+                id=brick_id, uuid=bricks_utils.generate_uuid())
+            self.dbapi.destroy_brick(brick['id'])
+        timeutils.clear_time_override()
+        return list(ids)
+
+    def _shadow_ids(self):
+        query = sa_api.model_query(sa_api.models.ShadowBrick.id)
+        return sorted(row.id for row in query)
+
+    def _shadow_log_chunks(self):
+        chunk = sa_api.models.ShadowBrickLogChunk
+        query = sa_api.model_query(chunk.brick_id, chunk.seq, chunk.data)
+        return sorted(tuple(row) for row in query)
+
+    @mock.patch.object(sa_api.greenthread, 'sleep')
+    def test_archive_deleted_bricks(self, sleep_fn):
+        live = self._create_test_brick(id=1)
+        old = self._create_deleted_bricks(range(10, 15),
+                                          datetime.datetime(2014, 1, 1))
+        recent = self._create_test_brick(
+            id=2, uuid=bricks_utils.generate_uuid())
+        self.dbapi.destroy_brick(recent['id'])
+
+        count = self.dbapi.archive_deleted_bricks(
+            datetime.datetime(2014, 2, 1), 2, delay=0.5)
+
+        self.assertEqual(5, count)
+        self.assertEqual(old, self._shadow_ids())
+        # three batches, the last short one ends the run
+        self.assertEqual([mock.call(0.5)] * 2, sleep_fn.call_args_list)
+        rows = sa_api.model_query(sa_api.models.Brick.id)
+        self.assertEqual([live['id'], recent['id']],
+                         sorted(row.id for row in rows))
+
+    @mock.patch.object(sa_api.greenthread, 'sleep')
+    def test_archive_deleted_bricks_archives_logs(self, sleep_fn):
+        old = self._create_deleted_bricks([10],
+                                          datetime.datetime(2014, 1, 1))
+        self.dbapi.append_brick_log(old[0], 'deploying\n')
+        self.dbapi.append_brick_log(old[0], 'deployed\n')
+        self.dbapi.append_brick_log(1, 'deployed\n')
+
+        self.dbapi.archive_deleted_bricks(datetime.datetime(2014, 2, 1), 10)
+
+        self.assertEqual([], self.dbapi.get_brick_log(old[0]))
+        self.assertEqual(1, len(self.dbapi.get_brick_log(1)))
+        self.assertEqual([(old[0], 1, 'deploying\n'),
+                          (old[0], 2, 'deployed\n')],
+                         self._shadow_log_chunks())
+
+    @mock.patch.object(sa_api.greenthread, 'sleep')
+    def test_purge_shadow_bricks_purges_logs(self, sleep_fn):
+        old = self._create_deleted_bricks([10],
+                                          datetime.datetime(2014, 1, 1))
+        self.dbapi.append_brick_log(old[0], 'deployed\n')
+        self.dbapi.archive_deleted_bricks(datetime.datetime(2014, 2, 1), 10)
+
+        self.dbapi.purge_shadow_bricks(datetime.datetime(2014, 2, 1), 10)
+
+        self.assertEqual([], self._shadow_log_chunks())
+
+    @mock.patch.object(sa_api.greenthread, 'sleep')
+    def test_archive_deleted_bricks_drops_health_and_stats(self, sleep_fn):
+        self.config(stats_archives=['60:10'], group='conductor')
+        timeutils.set_time_override(datetime.datetime(2014, 1, 1))
+        self.addCleanup(timeutils.clear_time_override)
+        for brick_id, instance_id in [(10, 'gone'), (11, 'moved'),
+                                      (1, 'moved')]:
+            self._create_test_brick(id=brick_id, instance_id=instance_id,
+                                    uuid=bricks_utils.generate_uuid())
+            self.dbapi.update_brick_health('compute-1', [
+                {'instance_id': instance_id, 'domain_state': 'running',
+                 'channel': True, 'occupant': True}])
+            self.dbapi.add_brick_stats([dict(
+                self._stats_sample(timeutils.utcnow_ts(), 10.0),
+                instance_id=instance_id)])
+        self.dbapi.destroy_bricks([10, 11])
+        timeutils.clear_time_override()
+
+        self.dbapi.archive_deleted_bricks(datetime.datetime(2014, 2, 1), 10)
+
+        for model in (sa_api.models.BrickHealth, sa_api.models.BrickStats):
+            query = sa_api.model_query(model.instance_id)
+            self.assertEqual(['moved'], [row.instance_id for row in query])
+
+    @mock.patch.object(sa_api.greenthread, 'sleep')
+    def test_archive_deleted_bricks_max_rows(self, sleep_fn):
+        old = self._create_deleted_bricks(range(10, 15),
+                                          datetime.datetime(2014, 1, 1))
+
+        count = self.dbapi.archive_deleted_bricks(
+            datetime.datetime(2014, 2, 1), 2, max_rows=3)
+
+        self.assertEqual(3, count)
+        self.assertEqual(old[:3], self._shadow_ids())
+
+    @mock.patch.object(sa_api.greenthread, 'sleep')
+    def test_purge_shadow_bricks(self, sleep_fn):
+        old = self._create_deleted_bricks(range(10, 13),
+                                          datetime.datetime(2014, 1, 1))
+        newer = self._create_deleted_bricks([20],
+                                            datetime.datetime(2014, 3, 1))
+        self.dbapi.archive_deleted_bricks(datetime.datetime(2014, 4, 1), 10)
+        self.assertEqual(old + newer, self._shadow_ids())
+
+        count = self.dbapi.purge_shadow_bricks(
+            datetime.datetime(2014, 2, 1), 10)
+
+        self.assertEqual(3, count)
+        self.assertEqual(newer, self._shadow_ids())
+
+    def test_append_brick_log(self):
+        first = self.dbapi.append_brick_log(1, 'line 1\n')
+        second = self.dbapi.append_brick_log(1, 'line 2\n')
+        other = self.dbapi.append_brick_log(2, 'other\n')
+
+        self.assertEqual((1, 2, 1), (first.seq, second.seq, other.seq))
+        chunks = self.dbapi.get_brick_log(1)
+        self.assertEqual(['line 1\n', 'line 2\n'],
+                         [chunk.data for chunk in chunks])
+
+    def test_append_brick_log_taken_seq(self):
+        self.dbapi.append_brick_log(1, 'line 1\n')
+        real_scalar = sa_api.orm.Query.scalar
+        taken = []
+
+        def scalar(query):
+            # the first append loses the race for seq 2
+            last_seq = real_scalar(query)
+            if not taken:
+                taken.append(last_seq)
+                self.dbapi.append_brick_log(1, 'line 2\n')
+            return last_seq
+
+        with mock.patch.object(sa_api.orm.Query, 'scalar', scalar):
+            chunk = self.dbapi.append_brick_log(1, 'line 3\n')
+
+        self.assertEqual(3, chunk.seq)
+
+    def test_get_brick_log_range(self):
+        for i in range(1, 6):
+            self.dbapi.append_brick_log(1, 'line %d\n' % i)
+
+        self.assertEqual([4, 5], [chunk.seq for chunk in
+                                  self.dbapi.get_brick_log(1, since_seq=3)])
+        self.assertEqual([3, 4, 5], [chunk.seq for chunk in
+                                     self.dbapi.get_brick_log(1, last=3)])
+        self.assertEqual([5], [chunk.seq for chunk in
+                               self.dbapi.get_brick_log(1, since_seq=3,
+                                                        last=1)])
+        self.assertEqual([], self.dbapi.get_brick_log(2))
+
     def test_destroy_brick_that_does_not_exist(self):
         self.assertRaises(exception.BrickNotFound,
                           self.dbapi.destroy_brick, 1337)
+
+    def test_update_brick_health(self):
+        self.dbapi.update_brick_health('compute-1', [
+            {'instance_id': 'abc123', 'domain_state': 'running',
+             'channel': True, 'occupant': True}])
+
+        health = self.dbapi.get_brick_health('abc123')
+        self.assertEqual('compute-1', health.host)
+        self.assertEqual('running', health.domain_state)
+        self.assertTrue(health.occupant)
+        self.assertIsNotNone(health.checked_at)
+
+    def test_update_brick_health_replaces_previous(self):
+        self.dbapi.update_brick_health('compute-1', [
+            {'instance_id': 'abc123', 'domain_state': 'running',
+             'channel': True, 'occupant': True}])
+        self.dbapi.update_brick_health('compute-2', [
+            {'instance_id': 'abc123', 'domain_state': 'shutoff',
+             'channel': False, 'occupant': False}])
+
+        health = self.dbapi.get_brick_health('abc123')
+        self.assertEqual('compute-2', health.host)
+        self.assertEqual('shutoff', health.domain_state)
+        self.assertFalse(health.channel)
+
+    def test_get_brick_health_that_does_not_exist(self):
+        self.assertRaises(exception.BrickHealthNotFound,
+                          self.dbapi.get_brick_health, 'abc123')
+
+    def _stats_sample(self, timestamp, cpu):
+        return {'instance_id': 'abc123', 'timestamp': timestamp,
+                'cpu': cpu, 'mem_used': 512.0, 'mem_total': 1024.0,
+                'disk_read': 0, 'disk_write': 0, 'net_rx': 10, 'net_tx': 20}
+
+    @mock.patch.object(timeutils, 'utcnow_ts')
+    def test_add_brick_stats_downsamples(self, utcnow_ts):
+        self.config(stats_archives=['60:10', '600:10'], group='conductor')
+        utcnow_ts.return_value = 5500
+        self.dbapi.add_brick_stats([self._stats_sample(5400, 10.0)])
+        self.dbapi.add_brick_stats([self._stats_sample(5460, 30.0)])
+
+        fine = self.dbapi.get_brick_stats('abc123')
+        self.assertEqual([10.0, 30.0], [s.cpu for s in fine])
+        self.assertEqual(60, fine[0].resolution)
+
+        coarse = self.dbapi.get_brick_stats('abc123', resolution=600)
+        self.assertEqual(1, len(coarse))
+        self.assertEqual(20.0, coarse[0].cpu)
+        self.assertEqual(512.0, coarse[0].mem_used)
+
+    @mock.patch.object(timeutils, 'utcnow_ts')
+    def test_add_brick_stats_wraps_ring(self, utcnow_ts):
+        self.config(stats_archives=['60:10'], group='conductor')
+        utcnow_ts.return_value = 700
+        self.dbapi.add_brick_stats([self._stats_sample(0, 10.0)])
+        # ten minutes later the same slot comes around again
+        self.dbapi.add_brick_stats([self._stats_sample(600, 50.0)])
+
+        stats = self.dbapi.get_brick_stats('abc123')
+        self.assertEqual([50.0], [s.cpu for s in stats])
+
+    def test_get_brick_stats_invalid_resolution(self):
+        self.config(stats_archives=['60:10'], group='conductor')
+        self.assertRaises(exception.InvalidStatsResolution,
+                          self.dbapi.get_brick_stats, 'abc123', 7)
+
+    def _create_counted_bricks(self):
+        self.addCleanup(sa_api._BRICK_COUNTS.clear)
+        for i, (status, tenant) in enumerate([('init', 'a'), ('init', 'b'),
+                                              ('deploydone', 'a')]):
+            self.dbapi.create_brick(utils.get_test_brick(
+                id=i + 1, uuid=bricks_utils.generate_uuid(),
+                instance_id=bricks_utils.generate_uuid(),
+                status=status, tenant_id=tenant))
+
+    def test_get_brick_counts(self):
+        self._create_counted_bricks()
+        self.assertEqual({'init': 2, 'deploydone': 1},
+                         self.dbapi.get_brick_counts('status'))
+        self.assertEqual({'init': 1, 'deploydone': 1},
+                         self.dbapi.get_brick_counts(
+                             'status', filters={'tenant_id': 'a'}))
+        self.assertEqual({'a': 2, 'b': 1},
+                         self.dbapi.get_brick_counts('tenant_id'))
+
+    def test_get_brick_counts_invalid_group(self):
+        self.assertRaises(exception.InvalidBrickColumn,
+                          self.dbapi.get_brick_counts, 'configuration')
+
+    def test_get_brick_counts_cached(self):
+        self._create_counted_bricks()
+        self.dbapi.get_brick_counts('status')
+        with instrumentation.scope('test') as scope:
+            self.assertEqual({'init': 2, 'deploydone': 1},
+                             self.dbapi.get_brick_counts('status'))
+        self.assertEqual(0, scope.statements)
+
+    def test_get_brick_counts_invalidated_by_writes(self):
+        self._create_counted_bricks()
+        self.dbapi.get_brick_counts('status')
+        self.dbapi.update_brick(1, {'status': 'deploydone'})
+        self.assertEqual({'init': 1, 'deploydone': 2},
+                         self.dbapi.get_brick_counts('status'))
+        self.dbapi.destroy_brick(1)
+        self.assertEqual({'init': 1, 'deploydone': 1},
+                         self.dbapi.get_brick_counts('status'))
+
+    @mock.patch.object(timeutils, 'utcnow_ts')
+    def test_get_brick_counts_expire(self, utcnow_ts):
+        self.config(brick_counts_ttl=10, group='database')
+        utcnow_ts.return_value = 1000
+        self._create_counted_bricks()
+        self.dbapi.get_brick_counts('status')
+        # a write from another process does not clear this one's cache
+        sa_api.get_session().execute(
+            models.Brick.__table__.update().values(status='deploydone'))
+
+        utcnow_ts.return_value = 1009
+        self.assertEqual({'init': 2, 'deploydone': 1},
+                         self.dbapi.get_brick_counts('status'))
+        utcnow_ts.return_value = 1010
+        self.assertEqual({'deploydone': 3},
+                         self.dbapi.get_brick_counts('status'))
+
+
+class DbUnitOfWorkTestCase(base.DbTestCase):
+
+    def setUp(self):
+        super(DbUnitOfWorkTestCase, self).setUp()
+        self.dbapi = dbapi.get_instance()
+        self.brick = self.dbapi.create_brick(utils.get_test_brick())
+
+    def test_get_brick_from_identity_map(self):
+        with self.dbapi.unit_of_work():
+            self.dbapi.get_brick(self.brick.id)
+            with instrumentation.scope('test') as scope:
+                brick = self.dbapi.get_brick(self.brick.id)
+                self.dbapi.get_brick(self.brick.uuid)
+        self.assertEqual(self.brick.uuid, brick.uuid)
+        self.assertEqual(0, scope.statements)
+
+    def test_get_brick_outside_unit_of_work(self):
+        self.dbapi.get_brick(self.brick.id)
+        with instrumentation.scope('test') as scope:
+            self.dbapi.get_brick(self.brick.id)
+        self.assertEqual(['SELECT'], tests_base.statement_kinds(scope))
+
+    def test_get_brick_identity_map_filters(self):
+        with self.dbapi.unit_of_work():
+            self.dbapi.get_brick(self.brick.id)
+            self.assertRaises(exception.BrickNotFound,
+                              self.dbapi.get_brick, self.brick.id,
+                              tenant_id='other')
+
+    def test_write_empties_identity_map(self):
+        with self.dbapi.unit_of_work():
+            self.dbapi.get_brick(self.brick.id)
+            self.dbapi.update_brick(self.brick.id, {'status': 'deploydone'})
+            self.assertEqual('deploydone',
+                             self.dbapi.get_brick(self.brick.id).status)
+            self.dbapi.destroy_brick(self.brick.id)
+            self.assertRaises(exception.BrickNotFound,
+                              self.dbapi.get_brick, self.brick.id)
+
+    def test_sessions_shared_and_closed(self):
+        with self.dbapi.unit_of_work():
+            session = sa_api.get_session()
+            with self.dbapi.unit_of_work():
+                self.assertIs(session, sa_api.get_session())
+            self.assertIs(session, sa_api.get_session())
+        self.assertIsNone(sa_api._current_unit_of_work())
+        self.assertIsNot(session, sa_api.get_session())
+
+
+class DbReadRoutingTestCase(base.DbTestCase):
+
+    def setUp(self):
+        super(DbReadRoutingTestCase, self).setUp()
+        self.dbapi = dbapi.get_instance()
+        self.config(slave_connection='sqlite://', group='database')
+
+        self.context = context.RequestContext()
+        local.store.context = self.context
+        self.addCleanup(delattr, local.store, 'context')
+
+        # hand out primary sessions, recording which were for the slave
+        self.slave_sessions = 0
+        get_session = sa_api.db_session.get_session
+
+        def fake_get_session(slave_session=False, **kwargs):
+            self.slave_sessions += slave_session
+            return get_session(**kwargs)
+
+        patcher = mock.patch.object(sa_api.db_session, 'get_session',
+                                    side_effect=fake_get_session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_go_to_slave(self):
+        self.dbapi.get_brick_list()
+        self.dbapi.get_brickconfig_list()
+        self.dbapi.get_configfile_list()
+
+        self.assertEqual(3, self.slave_sessions)
+
+    def test_reads_without_slave_go_to_primary(self):
+        self.config(slave_connection='', group='database')
+
+        self.dbapi.get_brick_list()
+
+        self.assertEqual(0, self.slave_sessions)
+
+    @mock.patch.object(timeutils, 'utcnow_ts')
+    def test_reads_after_write_go_to_primary(self, utcnow_ts):
+        utcnow_ts.return_value = 1000
+        brick = self.dbapi.create_brick(utils.get_test_brick())
+        self.assertEqual(1000, self.context.last_write_at)
+
+        utcnow_ts.return_value = 1004
+        self.dbapi.get_brick(brick.id)
+        self.assertEqual(0, self.slave_sessions)
+
+        utcnow_ts.return_value = 1005
+        self.dbapi.get_brick(brick.id)
+        self.assertEqual(1, self.slave_sessions)
+
+    def test_last_write_travels_with_context(self):
+        self.dbapi.create_brick(utils.get_test_brick())
+
+        values = self.context.to_dict()
+        self.assertEqual(self.context.last_write_at, values['last_write_at'])
+
+    def test_get_query_metrics(self):
+        self.config(slave_connection='', group='database')
+        self.dbapi.get_brick_list()
+        before = self.dbapi.get_query_metrics()['primary']
+
+        self.dbapi.get_brick_list()
+        self.dbapi.get_brick_list()
+
+        after = self.dbapi.get_query_metrics()['primary']
+        self.assertEqual(before['statements'] + 2, after['statements'])
+        self.assertTrue(after['seconds'] >= before['seconds'])
@@ -1,11 +1,18 @@
 """Tests for manipulating Bricks objects via the DB API"""
 
+import hashlib
+
 import six
+import sqlalchemy as sa
 
 from bricks.common import exception
 from bricks.common import utils as bricks_utils
 from bricks.db import api as dbapi
+from bricks.db.sqlalchemy import api as sa_api
+from bricks.db.sqlalchemy import instrumentation
+from bricks.db.sqlalchemy import models
 
+from bricks.tests import base as tests_base
 from bricks.tests.db import base
 from bricks.tests.db import utils
 
@@ -61,6 +68,42 @@ class DbBrickConfigTestCase(base.DbTestCase):
 
         self.assertEqual(res.uuid, new_uuid)
 
+    def test_update_brickconfig_expected(self):
+        bc = self._create_test_brickconfig()
+
+        self.dbapi.update_brickconfig(bc['id'], {'name': 'renamed'},
+                                      expected={'updated_at': None})
+        self.assertRaises(exception.PreconditionFailed,
+                          self.dbapi.update_brickconfig, bc['id'],
+                          {'name': 'again'}, expected={'updated_at': None})
+        self.assertRaises(exception.BrickConfigNotFound,
+                          self.dbapi.update_brickconfig, 1337,
+                          {'name': 'again'}, expected={'updated_at': None})
+        self.assertEqual('renamed', self.dbapi.get_brickconfig(bc['id']).name)
+
+    def test_update_configfile_expected(self):
+        cf = self.dbapi.create_configfile(utils.get_test_configfile())
+        expected = {'contents_sha256': cf['contents_sha256']}
+
+        self.dbapi.update_configfile(cf['id'], {'contents': 'RUN: changed'},
+                                     expected=expected)
+        self.assertRaises(exception.PreconditionFailed,
+                          self.dbapi.update_configfile, cf['id'],
+                          {'contents': 'RUN: again'}, expected=expected)
+        self.assertEqual('RUN: changed',
+                         self.dbapi.get_configfile(cf['id']).contents)
+
+    def test_update_brickconfig_statements(self):
+        bc = self._create_test_brickconfig()
+        with instrumentation.scope('test') as scope:
+            self.dbapi.update_brickconfig(bc['id'], {'name': 'renamed'})
+
+        if sa_api.get_engine().dialect.implicit_returning:
+            self.assertEqual(['UPDATE'], tests_base.statement_kinds(scope))
+        else:
+            self.assertEqual(['SELECT', 'UPDATE'],
+                             tests_base.statement_kinds(scope))
+
     def test_update_brickconfig_that_does_not_exist(self):
         new_uuid = bricks_utils.generate_uuid()
 
@@ -78,3 +121,126 @@ class DbBrickConfigTestCase(base.DbTestCase):
     def test_destroy_brickconfig_that_does_not_exist(self):
         self.assertRaises(exception.BrickConfigNotFound,
                           self.dbapi.destroy_brickconfig, 1337)
+
+    def test_destroy_brickconfig_statements(self):
+        bc = self._create_test_brickconfig()
+        with instrumentation.scope('test') as scope:
+            self.dbapi.destroy_brickconfig(bc['id'])
+
+        self.assertEqual(['DELETE'], tests_base.statement_kinds(scope))
+
+    def test_destroy_brickconfig_in_use(self):
+        bc = self._create_test_brickconfig()
+        self._create_test_brick(brickconfig_uuid=bc['uuid'])
+
+        self.assertRaises(exception.BrickConfigInUse,
+                          self.dbapi.destroy_brickconfig, bc['id'])
+        self.assertEqual(bc['uuid'],
+                         self.dbapi.get_brickconfig(bc['id']).uuid)
+
+    def test_update_configfile_statements(self):
+        cf = self.dbapi.create_configfile(utils.get_test_configfile())
+        with instrumentation.scope('test') as scope:
+            self.dbapi.update_configfile(cf['id'], {'name': 'renamed'})
+
+        if sa_api.get_engine().dialect.implicit_returning:
+            self.assertEqual(['UPDATE'], tests_base.statement_kinds(scope))
+        else:
+            self.assertEqual(['SELECT', 'UPDATE'],
+                             tests_base.statement_kinds(scope))
+
+    def test_destroy_configfile_statements(self):
+        cf = self.dbapi.create_configfile(utils.get_test_configfile())
+        with instrumentation.scope('test') as scope:
+            self.dbapi.destroy_configfile(cf['id'])
+
+        # a locking SELECT and the DELETE, then an UPDATE and a DELETE to
+        # drop the last reference to the contents blob
+        self.assertEqual(['DELETE', 'DELETE', 'SELECT', 'UPDATE'],
+                         tests_base.statement_kinds(scope))
+        self.assertRaises(exception.ConfigFileNotFound,
+                          self.dbapi.get_configfile, cf['id'])
+
+    def test_create_configfiles(self):
+        values_list = [utils.get_test_configfile(id=i, uuid=None,
+                                                 name='file-%d' % i)
+                       for i in range(1, 4)]
+        with instrumentation.scope('test') as scope:
+            self.dbapi.create_configfiles(values_list)
+
+        # one blob of the shared contents, then the configfiles
+        self.assertEqual(['INSERT', 'INSERT', 'UPDATE'],
+                         tests_base.statement_kinds(scope))
+        configfiles = self.dbapi.get_configfile_list()
+        self.assertEqual(['file-1', 'file-2', 'file-3'],
+                         sorted(cf.name for cf in configfiles))
+        self.assertEqual([(values_list[0]['contents'], 3)],
+                         self._blobs())
+
+    def _blobs(self):
+        table = models.ConfigFileBlob.__table__
+        return [tuple(row) for row in sa_api.get_session().execute(
+            sa.select([table.c.contents, table.c.refcount]).order_by(
+                table.c.contents))]
+
+    def test_configfile_contents_deduplicated(self):
+        first = self.dbapi.create_configfile(
+            utils.get_test_configfile(id=1, uuid=None, contents='RUN: ls'))
+        second = self.dbapi.create_configfile(
+            utils.get_test_configfile(id=2, uuid=None, contents='RUN: ls'))
+
+        self.assertEqual(hashlib.sha256('RUN: ls').hexdigest(),
+                         first.contents_sha256)
+        self.assertEqual(first.contents_sha256, second.contents_sha256)
+        self.assertEqual([('RUN: ls', 2)], self._blobs())
+        self.assertEqual('RUN: ls', self.dbapi.get_configfile(2).contents)
+
+    def test_create_configfile_ignores_given_sha256(self):
+        cf = self.dbapi.create_configfile(utils.get_test_configfile(
+            contents='RUN: ls', contents_sha256='0' * 64))
+        self.assertEqual(hashlib.sha256('RUN: ls').hexdigest(),
+                         cf.contents_sha256)
+
+    def test_update_configfile_contents(self):
+        self.dbapi.create_configfile(
+            utils.get_test_configfile(id=1, uuid=None, contents='RUN: ls'))
+        self.dbapi.create_configfile(
+            utils.get_test_configfile(id=2, uuid=None, contents='RUN: ls'))
+
+        cf = self.dbapi.update_configfile(1, {'contents': 'RUN: pwd'})
+        self.assertEqual(hashlib.sha256('RUN: pwd').hexdigest(),
+                         cf.contents_sha256)
+        self.assertEqual('RUN: pwd', self.dbapi.get_configfile(1).contents)
+        self.assertEqual([('RUN: ls', 1), ('RUN: pwd', 1)], self._blobs())
+
+        self.dbapi.update_configfile(2, {'contents': 'RUN: pwd'})
+        self.assertEqual([('RUN: pwd', 2)], self._blobs())
+
+    def test_update_configfile_same_contents(self):
+        cf = self.dbapi.create_configfile(
+            utils.get_test_configfile(contents='RUN: ls'))
+        with instrumentation.scope('test') as scope:
+            self.dbapi.update_configfile(cf['id'], {'contents': 'RUN: ls'})
+
+        self.assertEqual(['SELECT', 'SELECT'],
+                         tests_base.statement_kinds(scope))
+        self.assertEqual([('RUN: ls', 1)], self._blobs())
+
+    def test_destroy_configfile_drops_blob(self):
+        self.dbapi.create_configfile(
+            utils.get_test_configfile(id=1, uuid=None, contents='RUN: ls'))
+        self.dbapi.create_configfile(
+            utils.get_test_configfile(id=2, uuid=None, contents='RUN: ls'))
+
+        self.dbapi.destroy_configfile(1)
+        self.assertEqual([('RUN: ls', 1)], self._blobs())
+        self.dbapi.destroy_configfile(2)
+        self.assertEqual([], self._blobs())
+
+    def test_get_configfile_list_lazy_contents(self):
+        self.dbapi.create_configfile(
+            utils.get_test_configfile(contents='RUN: ls'))
+        configfile = self.dbapi.get_configfile_list()[0]
+        self.assertEqual(hashlib.sha256('RUN: ls').hexdigest(),
+                         configfile.contents_sha256)
+        self.assertEqual('RUN: ls', configfile.contents)
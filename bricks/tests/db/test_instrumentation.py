@@ -0,0 +1,100 @@
+"""Tests for counting the statements of the DB API"""
+
+import mock
+
+from bricks.common import utils as bricks_utils
+from bricks.db import api as dbapi
+from bricks.db.sqlalchemy import instrumentation
+
+from bricks.tests.db import base
+from bricks.tests.db import utils
+
+
+class DbInstrumentationTestCase(base.DbTestCase):
+
+    def setUp(self):
+        super(DbInstrumentationTestCase, self).setUp()
+        self.dbapi = dbapi.get_instance()
+        self.brickconfig = self.dbapi.create_brickconfig(
+            utils.get_test_brickconfig())
+
+    def test_scope_counts_statements(self):
+        with instrumentation.scope('test') as scope:
+            self.dbapi.get_brick_list()
+            self.dbapi.get_brick_list()
+        self.assertEqual(2, scope.statements)
+        self.assertEqual([2], scope.shapes.values())
+        self.assertIsNone(instrumentation.current_scope())
+
+    def test_nested_scope_counts_innermost(self):
+        with instrumentation.scope('outer') as outer:
+            self.dbapi.get_brick_list()
+            with instrumentation.scope('inner') as inner:
+                self.dbapi.get_brick_list()
+            self.assertIs(outer, instrumentation.current_scope())
+        self.assertEqual(1, outer.statements)
+        self.assertEqual(1, inner.statements)
+
+    def test_unit_of_work_scope_metrics(self):
+        before = self.dbapi.get_scope_metrics().get(
+            'uow-test', {'calls': 0, 'statements': 0})
+        with self.dbapi.unit_of_work('uow-test'):
+            self.dbapi.get_brickconfig(self.brickconfig.uuid)
+
+        after = self.dbapi.get_scope_metrics()['uow-test']
+        self.assertEqual(before['calls'] + 1, after['calls'])
+        self.assertEqual(before['statements'] + 1, after['statements'])
+
+    @mock.patch.object(instrumentation.LOG, 'warning')
+    def test_n_plus_one_logged(self, warning):
+        self.config(n_plus_one_threshold=3, group='database')
+        with instrumentation.scope('n-plus-one-test'):
+            for _i in range(3):
+                self.dbapi.get_configfile_list(
+                    filters={'brickconfig_uuid': bricks_utils.generate_uuid()})
+
+        self.assertEqual(1, warning.call_count)
+        self.assertEqual(
+            1, self.dbapi.get_scope_metrics()['n-plus-one-test']['n_plus_one'])
+
+    @mock.patch.object(instrumentation.LOG, 'warning')
+    def test_n_plus_one_below_threshold(self, warning):
+        self.config(n_plus_one_threshold=3, group='database')
+        with instrumentation.scope('test'):
+            self.dbapi.get_brick_list()
+            self.dbapi.get_brick_list()
+        self.assertFalse(warning.called)
+
+    @mock.patch.object(instrumentation.LOG, 'warning')
+    def test_n_plus_one_batched_not_logged(self, warning):
+        self.config(n_plus_one_threshold=3, group='database')
+        for i in range(1, 5):
+            self.dbapi.create_brick(utils.get_test_brick(
+                id=i, uuid=bricks_utils.generate_uuid(), instance_id=None))
+        with instrumentation.scope('batched-test') as scope:
+            bricks = list(self.dbapi.iter_bricks(chunk_size=1))
+
+        self.assertEqual(4, len(bricks))
+        self.assertEqual(5, scope.statements)
+        self.assertFalse(warning.called)
+        self.assertEqual(
+            0, self.dbapi.get_scope_metrics()['batched-test']['n_plus_one'])
+
+    def test_shape_ignores_in_list_length(self):
+        self.assertEqual(
+            instrumentation._shape('SELECT id FROM brick WHERE id IN (?)'),
+            instrumentation._shape('SELECT id FROM brick WHERE id IN (?)'))
+        self.assertEqual(
+            'SELECT id FROM brick WHERE id IN (...)',
+            instrumentation._shape(
+                'SELECT id FROM brick WHERE id IN (?, ?, ?)'))
+
+    @mock.patch.object(instrumentation.LOG, 'warning')
+    def test_slow_query_logged_with_call_site(self, warning):
+        self.config(slow_query_threshold=1e-9, group='database')
+        self.dbapi.get_brick_list()
+
+        self.assertEqual(1, warning.call_count)
+        site = warning.call_args[0][1]['site']
+        self.assertIn('test_instrumentation.py', site)
+        self.assertIn('test_slow_query_logged_with_call_site', site)
@@ -17,7 +17,6 @@ def get_test_brick(**kw):
         'tenant_id': kw.get('tenant_id', 'mister-tenant'),
         'status': kw.get('status', states.NOSTATE),
         'configuration': kw.get('configuration', {'test': 'test'}),
-        'deploy_log': kw.get('deploy_log', 'this\nis\na\ntest\n'),
         'created_at': kw.get('created_at'),
         'updated_at': kw.get('updated_at'),
     }
@@ -59,6 +58,7 @@ def get_test_configfile(**kw):
         'description': kw.get('description',
                               'this is just a test dockerfile'),
         'contents': kw.get('contents', 'RUN: ls'),
+        'contents_sha256': kw.get('contents_sha256'),
 
         'created_at': kw.get('created_at'),
         'updated_at': kw.get('updated_at'),
@@ -19,6 +19,7 @@ policy_data = """
       "configfile:delete": "rule:admin_api",
       "configfile:update": "rule:admin_api",
       "configfile:get_one": "",
-      "configfile:get_all": ""
+      "configfile:get_all": "",
+      "metrics:get_all": "rule:admin_api"
 }
 """
@@ -0,0 +1,177 @@
+import os
+import socket
+
+import eventlet
+import fixtures
+
+from bricks.common import exception
+from bricks.mortar import channel
+from bricks.openstack.common import jsonutils
+from bricks.tests import base
+
+
+class FakeOccupant(object):
+    """Accepts channel connections and answers frames like an occupant."""
+
+    def __init__(self, socket_file):
+        self.server = eventlet.listen(socket_file, family=socket.AF_UNIX)
+        self.connections = []
+        self.frames = []
+        self._thread = eventlet.spawn(self._serve)
+
+    def _serve(self):
+        while True:
+            conn, _addr = self.server.accept()
+            self.connections.append(conn)
+            eventlet.spawn(self._handle, conn)
+
+    def _handle(self, conn):
+        for line in conn.makefile():
+            frame = jsonutils.loads(line)
+            self.frames.append(frame)
+            conn.sendall(jsonutils.dumps({'type': 'ack',
+                                          'reply_to': frame['id'],
+                                          'ok': True}) + '\n')
+
+    def send(self, frame):
+        self.connections[-1].sendall(jsonutils.dumps(frame) + '\n')
+
+    def close(self):
+        self._thread.kill()
+        self.server.close()
+        for conn in self.connections:
+            conn.close()
+
+
+class OccupantChannelTestCase(base.TestCase):
+
+    def setUp(self):
+        super(OccupantChannelTestCase, self).setUp()
+        self.config(channel_reconnect_interval=0, group='mortar')
+        self.config(channel_request_timeout=1, group='mortar')
+        tempdir = self.useFixture(fixtures.TempDir()).path
+        self.socket_file = os.path.join(tempdir, 'bricks.socket')
+        self.occupant = FakeOccupant(self.socket_file)
+        self.addCleanup(self.occupant.close)
+
+        self.notifications = []
+        self.channel = channel.OccupantChannel(
+            'abc123', self.socket_file,
+            lambda *args: self.notifications.append(args))
+        self.addCleanup(self.channel.stop)
+
+    def _wait_for(self, predicate):
+        for _i in range(100):
+            if predicate():
+                return
+            eventlet.sleep(0.01)
+        self.fail('timed out')
+
+    def test_push_task(self):
+        self.channel.start()
+        self._wait_for(lambda: self.channel.connected)
+
+        self.assertTrue(self.channel.push_task({'Dockerfile': 'RUN: ls'}))
+        self.assertEqual('task', self.occupant.frames[0]['type'])
+        self.assertEqual({'Dockerfile': 'RUN: ls'},
+                         self.occupant.frames[0]['files'])
+
+    def test_requests_share_one_connection(self):
+        self.channel.start()
+        self._wait_for(lambda: self.channel.connected)
+
+        self.assertTrue(self.channel.ping())
+        self.assertTrue(self.channel.push_task({}))
+        self.assertEqual(1, len(self.occupant.connections))
+
+    def test_state_notification(self):
+        self.channel.start()
+        self._wait_for(lambda: self.channel.connected)
+
+        self.occupant.send({'type': 'state', 'state': 'TASK-COMPLETE'})
+        self._wait_for(lambda: self.notifications)
+
+        self.assertEqual('TASK-COMPLETE', self.channel.state)
+        self.assertEqual('abc123', self.notifications[0][0])
+
+    def test_log_chunks_kept(self):
+        self.channel.start()
+        self._wait_for(lambda: self.channel.connected)
+
+        self.occupant.send({'type': 'log', 'data': 'one\ntwo\n'})
+        self._wait_for(lambda: self.notifications)
+
+        self.assertEqual(['one', 'two'], list(self.channel.log))
+
+    def test_reconnects_after_guest_reboot(self):
+        self.channel.start()
+        self._wait_for(lambda: self.channel.connected)
+
+        self.occupant.connections[0].shutdown(socket.SHUT_RDWR)
+        self._wait_for(lambda: len(self.occupant.connections) == 2)
+        self._wait_for(lambda: self.channel.connected)
+
+        self.assertTrue(self.channel.ping())
+
+    def test_request_not_connected(self):
+        self.assertRaises(exception.OccupantChannelError,
+                          self.channel.request, 'ping')
+        self.assertFalse(self.channel.ping())
+
+    def test_request_waits_for_connect(self):
+        self.channel.start()
+
+        self.assertFalse(self.channel.connected)
+        self.assertTrue(self.channel.ping())
+
+    def test_request_connect_timeout(self):
+        self.occupant.close()
+        os.unlink(self.socket_file)
+        self.channel.start()
+
+        self.assertRaises(exception.OccupantChannelError,
+                          self.channel.request, 'ping')
+
+    def test_notify_error_keeps_channel(self):
+        def notify(instance_id, frame):
+            self.notifications.append(frame)
+            raise ValueError()
+
+        self.channel._notify = notify
+        self.channel.start()
+        self._wait_for(lambda: self.channel.connected)
+
+        self.occupant.send({'type': 'log', 'data': 'one'})
+        self._wait_for(lambda: self.notifications)
+
+        self.assertTrue(self.channel.ping())
+        self.assertEqual(1, len(self.occupant.connections))
+
+    def test_non_object_frame_dropped(self):
+        self.channel.start()
+        self._wait_for(lambda: self.channel.connected)
+
+        self.occupant.send(['state'])
+        self.occupant.send({'type': 'state', 'state': 'TASK-COMPLETE'})
+        self._wait_for(lambda: self.notifications)
+
+        self.assertEqual(1, len(self.notifications))
+        self.assertTrue(self.channel.ping())
+        self.assertEqual(1, len(self.occupant.connections))
+
+
+class ChannelManagerTestCase(base.TestCase):
+
+    def test_sync(self):
+        self.useFixture(fixtures.MonkeyPatch(
+            'bricks.mortar.channel.OccupantChannel.start', lambda self: None))
+        channels = channel.ChannelManager(lambda i: '/nowhere/%s' % i,
+                                          lambda *args: None)
+
+        channels.sync(['a', 'b'])
+        self.assertIn('a', channels)
+        self.assertIn('b', channels)
+
+        channels.sync(['b'])
+        self.assertNotIn('a', channels)
+        self.assertEqual('/nowhere/b', channels.get('b').socket_file)
@@ -4,6 +4,8 @@ import mock
 from oslo.config import cfg
 
 from bricks.mortar import manager
+from bricks.mortar import utils
+from bricks.objects import mortar_task
 from bricks.openstack.common import context
 from bricks.tests.db import base
 from bricks import objects
@@ -16,6 +18,7 @@ class ManagerTestCase(base.DbTestCase):
 
     def setUp(self):
         super(ManagerTestCase, self).setUp()
+        self.config(state_file=':memory:', group='mortar')
         self.service = manager.MortarManager('test-host', 'test-topic')
         self.context = context.get_admin_context()
 
@@ -24,7 +27,7 @@ class ManagerTestCase(base.DbTestCase):
 
     @mock.patch('bricks.mortar.utils.do_tail_brick_log')
     def test_tail_log(self, do_tail_fn):
-        def tailer(ctx, brick_log):
+        def tailer(ctx, brick_log, channels=None):
             brick_log.log = "asdf1234"
             return brick_log
         do_tail_fn.side_effect = tailer
@@ -41,6 +44,64 @@ class ManagerTestCase(base.DbTestCase):
         self.assertEqual(sut_bl.instance_id, bl.instance_id)
         self.assertEqual(sut_bl.length, bl.length)
 
+    @mock.patch('bricks.mortar.utils.ChannelReconciler')
+    @mock.patch('bricks.conductor.rpcapi.ConductorAPI.do_report_health')
+    @mock.patch('bricks.mortar.utils.do_health_check')
+    def test_check_instances_reports_health(self, health_fn, report_fn,
+                                            reconciler_cls):
+        report = objects.MortarHealthReport()
+        report.host = 'test-host'
+        report.instances = []
+        health_fn.return_value = report
+
+        self.service.start()
+        self.service.do_check_instances(self.context, ['x', 'y'])
+        self.service._worker_pool.waitall()
+
+        health_fn.assert_called_once_with(self.context, ['x', 'y'],
+                                          channels=None)
+        report_fn.assert_called_once_with(self.context, report)
+
+    @mock.patch('bricks.mortar.utils.ChannelReconciler')
+    @mock.patch('bricks.conductor.rpcapi.ConductorAPI.do_report_health')
+    @mock.patch('bricks.mortar.utils.do_health_check')
+    def test_check_instances_reconciles_once(self, health_fn, report_fn,
+                                             reconciler_cls):
+        self.service.start()
+        self.service.do_check_instances(self.context, ['x', 'y'])
+        self.service.do_check_instances(self.context, ['x', 'y', 'z'])
+        self.service._worker_pool.waitall()
+
+        self.assertEqual(1, reconciler_cls.call_count)
+        reconciler_cls.return_value.run.assert_called_once_with(['x', 'y'])
+
+    @mock.patch('bricks.conductor.rpcapi.ConductorAPI.do_report_last_task')
+    def test_check_last_task_from_state_cache(self, report_fn):
+        self.service.start()
+        self.service._state_cache.set_state('x', mortar_task.COMPLETE)
+
+        with mock.patch('__builtin__.open') as open_fn:
+            self.service.do_check_last_task(self.context, 'x')
+
+        self.assertEqual(0, open_fn.call_count)
+        report_fn.assert_called_once_with(self.context, 'x',
+                                          mortar_task.COMPLETE)
+
+    @mock.patch('bricks.mortar.utils.get_local_instances')
+    def test_follow_brick_logs_local_only(self, local_fn):
+        local_fn.return_value = ['x', 'not-a-brick']
+        self.service.start()
+        self.service._brick_instances = set(['x', 'elsewhere'])
+        self.service._state_cache.set_state('elsewhere', mortar_task.COMPLETE)
+
+        with mock.patch.object(self.service._state_cache,
+                               'follow') as follow_fn:
+            self.service.follow_brick_logs(self.context)
+
+        follow_fn.assert_called_once_with(
+            'x', utils.instance_log('x'))
+        self.assertNotIn('elsewhere', list(self.service._state_cache))
+
     def test__spawn_worker(self):
         func_mock = mock.Mock()
         args = (1, 2, "test")
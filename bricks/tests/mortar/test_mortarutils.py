@@ -1,3 +1,11 @@
+import os
+import socket
+
+import eventlet
+import fixtures
+import libvirt
+import mock
+
 from bricks.mortar import utils
 from bricks.objects import mortar_task
 from bricks.openstack.common import context
@@ -21,3 +29,209 @@ RUN: ls
 
         results = utils.do_execute(self.context, fake_execution_list)
         print results
+
+
+class HealthCheckTestCase(base.DbTestCase):
+
+    def setUp(self):
+        super(HealthCheckTestCase, self).setUp()
+        self.context = context.get_admin_context()
+
+    def _domain(self, uuid, state):
+        domain = mock.Mock()
+        domain.UUIDString.return_value = uuid
+        domain.state.return_value = [state, 0]
+        return domain
+
+    @mock.patch.object(utils, 'occupant_alive')
+    @mock.patch('os.path.exists')
+    @mock.patch.object(utils, 'BricksLibvirt')
+    def test_health_check_local_instances_only(self, libvirt_cls, exists,
+                                               alive):
+        conn = libvirt_cls.return_value.__enter__.return_value
+        conn.listAllDomains.return_value = [
+            self._domain('local-running', libvirt.VIR_DOMAIN_RUNNING),
+            self._domain('local-off', libvirt.VIR_DOMAIN_SHUTOFF),
+            self._domain('not-a-brick', libvirt.VIR_DOMAIN_RUNNING)]
+        exists.return_value = True
+        alive.return_value = True
+
+        report = utils.do_health_check(
+            self.context, ['local-running', 'local-off', 'elsewhere'])
+
+        self.assertEqual(1, conn.listAllDomains.call_count)
+        health = dict((i['instance_id'], i) for i in report.instances)
+        self.assertEqual(set(['local-running', 'local-off']),
+                         set(health.keys()))
+        self.assertEqual('running', health['local-running']['domain_state'])
+        self.assertTrue(health['local-running']['occupant'])
+        # occupants are only probed on running domains
+        self.assertFalse(health['local-off']['occupant'])
+        self.assertEqual(1, alive.call_count)
+
+
+class OccupantAliveTestCase(base.DbTestCase):
+
+    def setUp(self):
+        super(OccupantAliveTestCase, self).setUp()
+        self.socket_file = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, 'bricks.socket')
+
+    def _listen(self):
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(self.socket_file)
+        server.listen(1)
+        return server
+
+    def test_alive_on_connect(self):
+        server = self._listen()
+
+        self.assertTrue(utils.occupant_alive(self.socket_file))
+
+        # nothing is written to occupants that don't speak Ping
+        conn, _addr = server.accept()
+        self.addCleanup(conn.close)
+        self.assertEqual('', conn.recv(len(utils.PING)))
+
+    def test_ping(self):
+        self.config(occupant_ping=True, group='mortar')
+        server = self._listen()
+        pong = eventlet.spawn(self._pong, server)
+
+        self.assertTrue(utils.occupant_alive(self.socket_file))
+        self.assertEqual(utils.PING, pong.wait())
+
+    def _pong(self, server):
+        conn, _addr = server.accept()
+        try:
+            ping = conn.recv(len(utils.PING))
+            conn.sendall(utils.PONG)
+            return ping
+        finally:
+            conn.close()
+
+    def test_not_listening(self):
+        self.assertFalse(utils.occupant_alive(self.socket_file))
+
+
+class DomainStatsTestCase(base.DbTestCase):
+
+    def _record(self, uuid, cpu_time, rd_bytes):
+        domain = mock.Mock()
+        domain.UUIDString.return_value = uuid
+        return (domain, {'cpu.time': cpu_time,
+                         'vcpu.current': 2,
+                         'balloon.current': 2048,
+                         'balloon.maximum': 4096,
+                         'block.count': 1,
+                         'block.0.rd.bytes': rd_bytes,
+                         'block.0.wr.bytes': 0})
+
+    @mock.patch('time.time')
+    @mock.patch.object(utils, 'BricksLibvirt')
+    def test_collect_one_call_per_interval(self, libvirt_cls, now):
+        conn = libvirt_cls.return_value.__enter__.return_value
+        collector = utils.DomainStatsCollector()
+
+        now.return_value = 100.0
+        conn.getAllDomainStats.return_value = [
+            self._record('brick', 0, 0),
+            self._record('not-a-brick', 0, 0)]
+        self.assertEqual([], collector.collect(['brick']))
+
+        now.return_value = 110.0
+        conn.getAllDomainStats.return_value = [
+            self._record('brick', 10 * 10 ** 9, 1000),
+            self._record('not-a-brick', 0, 0)]
+        samples = collector.collect(['brick'])
+
+        self.assertEqual(2, conn.getAllDomainStats.call_count)
+        self.assertEqual(1, len(samples))
+        self.assertEqual('brick', samples[0]['instance_id'])
+        # one full cpu of two for the whole interval
+        self.assertEqual(50.0, samples[0]['cpu'])
+        self.assertEqual(100.0, samples[0]['disk_read'])
+        self.assertEqual(2048, samples[0]['mem_used'])
+
+
+DOMAIN_XML = """<domain type="kvm">
+  <name>instance-00000001</name>
+  <devices>
+    <disk type="file" device="disk"/>
+%s  </devices>
+</domain>
+"""
+
+CHANNELS_XML = """    <channel type="unix">
+      <source mode="bind" path="/var/lib/nova/instances/bricks.socket"/>
+      <target type="virtio" name="org.clouda.0"/>
+    </channel>
+    <channel type="file">
+      <source path="/var/lib/nova/instances/bricks.log"/>
+      <target type="virtio" name="org.clouda.1"/>
+    </channel>
+"""
+
+
+class ChannelReconcilerTestCase(base.DbTestCase):
+
+    def setUp(self):
+        super(ChannelReconcilerTestCase, self).setUp()
+        self.addCleanup(utils._XML_CACHE.clear)
+        instances_path = self.useFixture(fixtures.TempDir()).path
+        self.useFixture(fixtures.MonkeyPatch(
+            'bricks.mortar.utils.INSTANCES_PATH', instances_path))
+        self._write_xml(instances_path, 'configured', CHANNELS_XML)
+        self._write_xml(instances_path, 'bare', '')
+
+    def _write_xml(self, instances_path, instance_id, channels):
+        os.mkdir(os.path.join(instances_path, instance_id))
+        with open(os.path.join(instances_path, instance_id,
+                               'libvirt.xml'), 'w') as f:
+            f.write(DOMAIN_XML % channels)
+
+    def _domain(self, uuid):
+        domain = mock.Mock()
+        domain.UUIDString.return_value = uuid
+        return domain
+
+    def test_channels_missing(self):
+        self.assertFalse(utils.channels_missing('configured'))
+        self.assertTrue(utils.channels_missing('bare'))
+
+    def test_config_xml_configured(self):
+        self.assertFalse(utils.config_xml('configured'))
+
+    @mock.patch.object(utils, 'config_xml')
+    @mock.patch.object(utils, 'BricksLibvirt')
+    def test_run(self, libvirt_cls, config_xml):
+        conn = libvirt_cls.return_value.__enter__.return_value
+        conn.listAllDomains.return_value = [self._domain('configured'),
+                                            self._domain('bare'),
+                                            self._domain('not-a-brick')]
+        config_xml.return_value = True
+
+        progress = utils.ChannelReconciler().run(['configured', 'bare'])
+
+        self.assertEqual(1, conn.listAllDomains.call_count)
+        config_xml.assert_called_once_with('bare')
+        self.assertEqual({'total': 2, 'checked': 2, 'missing': 1,
+                          'provisioned': 1, 'failed': 0}, progress)
+
+
+class InstanceXmlTestCase(base.DbTestCase):
+
+    @mock.patch('os.path.getmtime')
+    @mock.patch.object(utils.etree, 'parse')
+    def test_parsed_once_until_changed(self, parse, mtime):
+        self.addCleanup(utils._XML_CACHE.clear)
+        mtime.return_value = 100.0
+
+        utils.instance_xml('abc123')
+        utils.instance_xml('abc123')
+        self.assertEqual(1, parse.call_count)
+
+        mtime.return_value = 200.0
+        utils.instance_xml('abc123')
+        self.assertEqual(2, parse.call_count)
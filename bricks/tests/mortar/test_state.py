@@ -0,0 +1,90 @@
+import os
+
+import fixtures
+import mock
+
+from bricks.mortar import state
+from bricks.objects import mortar_task
+from bricks.tests import base
+
+
+class StateCacheTestCase(base.TestCase):
+
+    def setUp(self):
+        super(StateCacheTestCase, self).setUp()
+        tempdir = self.useFixture(fixtures.TempDir()).path
+        self.state_file = os.path.join(tempdir, 'mortar_state.sqlite')
+        self.log_file = os.path.join(tempdir, 'bricks.log')
+        self.cache = state.StateCache(self.state_file)
+
+    def _append(self, data):
+        with open(self.log_file, 'a') as log_fp:
+            log_fp.write(data)
+
+    def test_follow_reads_last_state(self):
+        self._append('building\n%s\nstep 1\n%s\n' % (
+            mortar_task.RUNNING, mortar_task.COMPLETE))
+
+        record = self.cache.follow('abc123', self.log_file)
+
+        self.assertEqual(mortar_task.COMPLETE, record.state)
+        self.assertEqual(os.path.getsize(self.log_file), record.log_offset)
+
+    def test_follow_only_reads_new_data(self):
+        self._append('%s\n' % mortar_task.RUNNING)
+        self.cache.follow('abc123', self.log_file)
+        self._append('%s\n' % mortar_task.ERROR)
+
+        with mock.patch.object(state, 'open', create=True,
+                               side_effect=open) as open_fn:
+            record = self.cache.follow('abc123', self.log_file)
+            self.cache.follow('abc123', self.log_file)
+
+        self.assertEqual(mortar_task.ERROR, record.state)
+        # the second pass found nothing new and left the log alone
+        self.assertEqual(1, open_fn.call_count)
+
+    def test_follow_waits_for_complete_lines(self):
+        self._append(mortar_task.COMPLETE[:4])
+
+        record = self.cache.follow('abc123', self.log_file)
+        self.assertIsNone(record.state)
+        self.assertEqual(0, record.log_offset)
+
+        self._append('%s\n' % mortar_task.COMPLETE[4:])
+        record = self.cache.follow('abc123', self.log_file)
+        self.assertEqual(mortar_task.COMPLETE, record.state)
+
+    def test_follow_truncated_log(self):
+        self._append('padding\n' * 10)
+        self.cache.follow('abc123', self.log_file)
+        open(self.log_file, 'w').write('%s\n' % mortar_task.RUNNING)
+
+        record = self.cache.follow('abc123', self.log_file)
+        self.assertEqual(mortar_task.RUNNING, record.state)
+
+    def test_follow_no_log(self):
+        self.assertIsNone(self.cache.follow('abc123', self.log_file))
+        self.assertNotIn('abc123', self.cache)
+
+    def test_records_survive_restart(self):
+        self._append('%s\n' % mortar_task.COMPLETE)
+        self.cache.follow('abc123', self.log_file)
+        self.cache.set_state('def456', mortar_task.RUNNING)
+        self.cache.close()
+
+        cache = state.StateCache(self.state_file)
+        self.assertEqual(mortar_task.COMPLETE, cache.get('abc123').state)
+        self.assertEqual(os.path.getsize(self.log_file),
+                         cache.get('abc123').log_offset)
+        self.assertEqual(mortar_task.RUNNING, cache.get('def456').state)
+
+    def test_forget(self):
+        self.cache.set_state('abc123', mortar_task.RUNNING)
+        self.cache.set_state('def456', mortar_task.RUNNING)
+
+        self.cache.forget(['abc123', 'unknown'])
+        self.cache.close()
+
+        cache = state.StateCache(self.state_file)
+        self.assertEqual(['def456'], list(cache))
@@ -88,3 +88,58 @@ class TestBrickObject(base.DbTestCase):
             self.assertIsInstance(c, models.Brick)
         for c in _convert_many_brick():
             self.assertIsInstance(c, objects.Brick)
+
+    def test_objectify_list(self):
+        def _get_many_db_brick():
+            bricks = []
+            for i in range(5):
+                c = models.Brick()
+                c.update(self.fake_brick)
+                c.id = i
+                bricks.append(c)
+            return bricks
+
+        @objects.objectify_list(objects.Brick)
+        def _convert_many_brick():
+            return _get_many_db_brick()
+
+        db_bricks = _get_many_db_brick()
+        for db_brick, brick in zip(db_bricks, _convert_many_brick()):
+            expected = objects.Brick._from_db_object(objects.Brick(),
+                                                     db_brick)
+            self.assertEqual(dict(expected.items()), dict(brick.items()))
+            self.assertEqual(set(), brick.obj_what_changed())
+
+    def test_objectify_list_lazy_fields(self):
+        for i in range(3):
+            self.dbapi.create_brick(utils.get_test_brick(
+                id=i, uuid=bricks_utils.generate_uuid()))
+
+        with mock.patch.object(self.dbapi, 'get_brick_columns',
+                               wraps=self.dbapi.get_brick_columns) as get:
+            bricks = self.dbapi.get_brick_list()
+            self.assertFalse(get.called)
+
+            self.assertEqual(self.fake_brick['configuration'],
+                             bricks[0].configuration)
+            self.assertEqual(self.fake_brick['configuration'],
+                             bricks[2].configuration)
+            self.assertEqual(self.fake_brick['configuration'],
+                             bricks[1].configuration)
+
+            # one query loaded every lazy field of the whole list
+            get.assert_called_once_with(mock.ANY, ('configuration',))
+            self.assertEqual([0, 1, 2], sorted(get.call_args[0][0]))
+        for brick in bricks:
+            self.assertEqual(set(), brick.obj_what_changed())
+
+    def test_lazy_field_not_fetched(self):
+        brick = objects.Brick()
+        brick.id = 1
+        brick.obj_reset_changes()
+
+        with mock.patch.object(self.dbapi, 'get_brick_columns',
+                               autospec=True) as get:
+            get.return_value = []
+            self.assertFalse(hasattr(brick, 'configuration'))
+            get.assert_called_once_with([1], objects.Brick.obj_lazy_fields)
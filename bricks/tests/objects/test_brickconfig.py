@@ -35,6 +35,7 @@ class TestBrickConfigObject(base.DbTestCase):
             mock_get_brickconfig.return_value = self.fake_brickconfig
             with mock.patch.object(self.dbapi, 'update_brickconfig',
                                    autospec=True) as mock_update_brickconfig:
+                mock_update_brickconfig.return_value = self.fake_brickconfig
 
                 c = objects.BrickConfig.get_by_uuid(self.context, uuid)
                 c.ports = [1,2,3]
@@ -42,7 +43,7 @@ class TestBrickConfigObject(base.DbTestCase):
 
                 mock_get_brickconfig.assert_called_once_with(uuid)
                 mock_update_brickconfig.assert_called_once_with(
-                    uuid, {'ports': [1,2,3]})
+                    uuid, {'ports': [1,2,3]}, expected=None)
 
     def test_refresh(self):
         uuid = self.fake_brickconfig['uuid']
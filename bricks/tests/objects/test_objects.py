@@ -20,6 +20,7 @@ import netaddr
 import six
 
 from bricks.common import exception
+from bricks.common import json_codec
 from bricks.objects import base
 from bricks.objects import utils
 from bricks.openstack.common import context
@@ -147,6 +148,30 @@ class TestUtils(test_base.TestCase):
         self.assertEqual(utils.str_or_none(1), '1')
         self.assertIsNone(utils.str_or_none(None))
 
+    def test_db_validator(self):
+        naive_dt = datetime.datetime(1955, 11, 5)
+        for typefn, values in [
+                (int, [1, '2', True]),
+                (utils.str_or_none, [None, u'foo', 'bar', 1]),
+                (utils.float_or_none, [None, 1.5, 2]),
+                (utils.dict_or_none, [None, {'a': 1}, "{'b': 2}"]),
+                (utils.list_or_none, [None, [1], "[2]"]),
+                (utils.datetime_or_str_or_none,
+                 [None, naive_dt, '1955-11-05T00:00:00Z'])]:
+            validator = utils.db_validator(typefn)
+            self.assertIsNot(typefn, validator)
+            for value in values:
+                self.assertEqual(typefn(value), validator(value))
+                self.assertEqual(type(typefn(value)), type(validator(value)))
+
+        self.assertIs(bool, utils.db_validator(bool))
+
+    def test_raw_json_kept(self):
+        raw = json_codec.RawJSON(u'{"a": 1}')
+        for typefn in utils.JSON_TYPES:
+            self.assertIs(raw, typefn(raw))
+            self.assertIs(raw, utils.db_validator(typefn)(raw))
+
     def test_ip_or_none(self):
         ip4 = netaddr.IPAddress('1.2.3.4', 4)
         ip6 = netaddr.IPAddress('1::2', 6)
@@ -272,6 +297,40 @@ class _TestObject(object):
         obj.obj_reset_changes()
         self.assertEqual({}, obj.obj_get_changes())
 
+    def test_reset_some_changes(self):
+        obj = MyObj()
+        obj.foo = 123
+        obj.bar = 'test'
+        obj.obj_reset_changes(['bar', 'unknown'])
+        self.assertEqual(set(['foo']), obj.obj_what_changed())
+
+    def test_json_field_decoded_on_access(self):
+        class MyJSONObj(MyObj):
+            fields = {'data': utils.dict_or_none}
+
+        obj = MyJSONObj()
+        obj.data = json_codec.RawJSON(u'{"a": true}')
+        # written back as read
+        self.assertIs(json_codec.RawJSON,
+                      type(obj.obj_get_changes()['data']))
+        self.assertEqual({'a': True},
+                         obj.obj_to_primitive()['bricks_object.data']['data'])
+        self.assertEqual({'a': True}, obj.data)
+        self.assertEqual({'a': True}, obj._data)
+        self.assertEqual({'data': {'a': True}}, obj.obj_get_changes())
+
+    def test_fields_in_slots(self):
+        class MySubObj(MyObj):
+            fields = dict(MyObj.fields, baz=int)
+
+        obj = MySubObj()
+        obj.foo = 1
+        obj.baz = 2
+        self.assertFalse(hasattr(obj, '__dict__'))
+        self.assertEqual(('_baz',), MySubObj.__slots__)
+        self.assertRaises(AttributeError, setattr, obj, 'unknown', 1)
+        self.assertEqual(set(['foo', 'baz']), obj.obj_what_changed())
+
     def test_object_property(self):
         obj = MyObj()
         obj.foo = 1
@@ -516,3 +575,38 @@ class TestObjectSerializer(test_base.TestCase):
             for item in thing2:
                 self.assertIsInstance(item, MyObj)
 
+    def test_object_list_round_trip(self):
+        ser = base.BricksObjectSerializer()
+        ctxt = context.get_admin_context()
+        objs = []
+        for i in range(3):
+            obj = MyObj()
+            obj.foo = i
+            obj.bar = 'bar'
+            obj.created_at = datetime.datetime(1955, 11, 5)
+            obj.obj_reset_changes(['foo', 'created_at'])
+            objs.append(obj)
+
+        primitive = ser.serialize_entity(ctxt, objs)
+        self.assertEqual([o.obj_to_primitive() for o in objs], primitive)
+
+        objs2 = ser.deserialize_entity(ctxt, primitive)
+        for obj, obj2 in zip(objs, objs2):
+            self.assertIsInstance(obj2, MyObj)
+            self.assertEqual(ctxt, obj2._context)
+            self.assertEqual(dict(obj.items()), dict(obj2.items()))
+            self.assertEqual(set(['bar']), obj2.obj_what_changed())
+
+    def test_mixed_list_serialization(self):
+        ser = base.BricksObjectSerializer()
+        ctxt = context.get_admin_context()
+        obj = MyObj()
+        obj.foo = 1
+
+        primitive = ser.serialize_entity(ctxt, [obj, 1, {'foo': 'bar'}])
+        self.assertEqual([1, {'foo': 'bar'}], primitive[1:])
+
+        thing = ser.deserialize_entity(ctxt, primitive)
+        self.assertIsInstance(thing[0], MyObj)
+        self.assertEqual(1, thing[0].foo)
+        self.assertEqual([1, {'foo': 'bar'}], thing[1:])
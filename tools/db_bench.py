@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""
+Benchmark the hot brick queries of the DB API against a seeded database.
+
+Seeds a database with a synthetic fleet of bricks, then times each query
+shape the conductor, mortar reports and the API issue, once with the
+brick table indexed as it was before the composite indexes
+(3a8f2c61d0b7) and once with them, printing per-query latency and the
+database's query plan.
+
+    python tools/db_bench.py --bricks 100000
+    python tools/db_bench.py --connection mysql://bricks:pw@localhost/bench
+
+The database is reused between runs when it already holds enough bricks.
+"""
+
+import argparse
+import random
+import sys
+import time
+import uuid
+
+from oslo.config import cfg
+import sqlalchemy as sa
+
+from bricks.common import states
+from bricks.db import api as dbapi
+from bricks.db.sqlalchemy import models
+from bricks.openstack.common.db.sqlalchemy import session as db_session
+
+import fleet
+
+CONF = cfg.CONF
+
+# index sets of the brick table before and after the composite indexes
+BEFORE = [('brick_deleted', ['deleted']),
+          ('brick_instance_uuid', ['instance_id'])]
+AFTER = [('brick_deleted_status_id', ['deleted', 'status', 'id']),
+         ('brick_deleted_tenant_id_id', ['deleted', 'tenant_id', 'id']),
+         ('brick_instance_id_deleted', ['instance_id', 'deleted'])]
+
+TENANTS = 2000
+
+
+def seed(engine, count):
+    """Fill the brick table up to count bricks, returning sample keys."""
+    table = models.Brick.__table__
+    existing = engine.execute(
+        sa.select([sa.func.count()]).select_from(table)).scalar()
+
+    # topping up an existing fleet carries on from where it stopped
+    rand = random.Random(existing)
+    pick_status = fleet.status_picker(rand)
+    for start in range(existing, count, fleet.SEED_BATCH):
+        rows = []
+        for i in range(start, min(start + fleet.SEED_BATCH, count)):
+            rows.append({
+                'id': i + 1,
+                'uuid': fleet.random_uuid(rand),
+                'brickconfig_uuid': str(uuid.UUID(int=i % 50)),
+                'instance_id': fleet.random_uuid(rand),
+                'tenant_id': 'tenant-%d' % (i % TENANTS),
+                'status': pick_status(),
+                'configuration': {'network': 'net-1'},
+                'deleted': rand.random() < fleet.DELETED_RATIO})
+        engine.execute(table.insert(), rows)
+        sys.stdout.write('\rseeded %d bricks' % (start + len(rows)))
+        sys.stdout.flush()
+    if existing < count:
+        sys.stdout.write('\n')
+
+    row = engine.execute(sa.select([table.c.instance_id, table.c.tenant_id])
+                         .where(sa.not_(table.c.deleted))
+                         .order_by(table.c.id.desc()).limit(1)).first()
+    return {'instance_id': row[0], 'tenant_id': row[1]}
+
+
+def set_indexes(engine, drop, create):
+    table = models.Brick.__table__
+    existing = set(index['name']
+                   for index in sa.inspect(engine).get_indexes('brick'))
+    for name, columns in drop:
+        if name in existing:
+            sa.Index(name, *[table.c[c] for c in columns]).drop(engine)
+    for name, columns in create:
+        if name not in existing:
+            sa.Index(name, *[table.c[c] for c in columns]).create(engine)
+    engine.execute('ANALYZE')
+
+
+def queries(conn, keys):
+    """The query shapes to time, as (name, callable) pairs."""
+    return [
+        ('get_brick(instance_id)',
+         lambda: conn.get_brick(None, instance_id=keys['instance_id'])),
+        ('get_brick_list(status=deploying)',
+         lambda: conn.get_brick_list(
+             filters={'status': states.DEPLOYING})),
+        ('get_brick_list(tenant_id, limit=50)',
+         lambda: conn.get_brick_list(
+             filters={'tenant_id': keys['tenant_id']}, limit=50)),
+        ('iter_bricks(status=init)',
+         lambda: list(conn.iter_bricks(filters={'status': states.INIT}))),
+        ('iter_bricks(columns=instance_id)',
+         lambda: list(conn.iter_bricks(columns=['instance_id']))),
+    ]
+
+
+class StatementRecorder(object):
+    """Remembers the first statement run since it was last reset."""
+
+    def __init__(self, engine):
+        self.statement = None
+        sa.event.listen(engine, 'before_cursor_execute', self)
+
+    def __call__(self, conn, cursor, statement, parameters, context,
+                 executemany):
+        if self.statement is None:
+            self.statement = (statement, parameters)
+
+
+def explain(engine, statement, parameters):
+    if engine.dialect.name == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN '
+    return [' | '.join(str(col) for col in row)
+            for row in engine.execute(prefix + statement, parameters)]
+
+
+def run(engine, conn, keys, repeat):
+    recorder = StatementRecorder(engine)
+    for name, query in queries(conn, keys):
+        timings = []
+        for _i in range(repeat):
+            recorder.statement = None
+            start = time.time()
+            query()
+            timings.append((time.time() - start) * 1000)
+        timings.sort()
+
+        print('%-40s median %8.2fms  p95 %8.2fms' % (
+            name, timings[len(timings) // 2],
+            timings[int(len(timings) * 0.95) - 1]))
+        for line in explain(engine, *recorder.statement):
+            print('    %s' % line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--connection',
+                        default='sqlite:////tmp/bricks-bench.sqlite',
+                        help='SQLAlchemy URL of the database to seed.')
+    parser.add_argument('--bricks', type=int, default=100000,
+                        help='Number of bricks to seed.')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='Runs of each query.')
+    args = parser.parse_args()
+
+    CONF([], project='bricks', default_config_files=[])
+    CONF.set_override('connection', args.connection, group='database')
+    engine = db_session.get_engine()
+    models.Base.metadata.create_all(engine)
+    keys = seed(engine, args.bricks)
+    conn = dbapi.get_instance()
+
+    print('\n== before composite indexes ==')
+    set_indexes(engine, drop=AFTER, create=BEFORE)
+    run(engine, conn, keys, args.repeat)
+
+    print('\n== after composite indexes ==')
+    set_indexes(engine, drop=BEFORE, create=AFTER)
+    run(engine, conn, keys, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
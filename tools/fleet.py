@@ -0,0 +1,32 @@
+"""
+The synthetic fleet the DB benchmarks seed.
+
+How bricks spread over states and how many are deleted, shared by
+db_bench.py and fleet_bench.py so that their numbers describe the same
+fleet. Values are drawn from a random.Random, so a fleet seeded twice
+from the same seed is the same fleet.
+"""
+
+import uuid
+
+from bricks.common import states
+
+# rough shape of a production fleet
+STATUS_WEIGHTS = [(states.DEPLOYDONE, 88), (states.DEPLOYING, 3),
+                  (states.INIT, 2), (states.DEPLOYFAIL, 5),
+                  (states.NOSTATE, 2)]
+DELETED_RATIO = 0.2
+SEED_BATCH = 5000
+
+
+def status_picker(rand):
+    """Return a function picking brick states with STATUS_WEIGHTS."""
+    population = []
+    for status, weight in STATUS_WEIGHTS:
+        population.extend([status] * weight)
+    return lambda: rand.choice(population)
+
+
+def random_uuid(rand):
+    """Return a random uuid string drawn from rand."""
+    return str(uuid.UUID(int=rand.getrandbits(128), version=4))
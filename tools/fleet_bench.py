@@ -0,0 +1,394 @@
+#!/usr/bin/env python
+"""
+Benchmark the DB API against a synthetic fleet.
+
+Empties the database, seeds it with brickconfigs, their configfiles and
+bricks spread over tenants and brick states, then times each Connection
+method and the query patterns of the conductor's periodic tasks, along
+with the statements each runs. Results can be written as JSON and
+compared with those of another commit.
+
+    python tools/fleet_bench.py --bricks 100000 --output before.json
+    python tools/fleet_bench.py --bricks 100000 --compare before.json
+    python tools/fleet_bench.py --connection mysql://bricks:pw@localhost/bench
+
+Everything in the database given by --connection is dropped.
+"""
+
+import argparse
+import datetime
+import json
+import random
+import subprocess
+import sys
+import time
+import uuid
+
+from oslo.config import cfg
+
+from bricks.common import states
+from bricks.db import api as dbapi
+from bricks.db.sqlalchemy import models
+from bricks.openstack.common.db.sqlalchemy import session as db_session
+
+import fleet
+
+CONF = cfg.CONF
+CONF.import_opt('brick_counts_ttl', 'bricks.db.sqlalchemy.api',
+                group='database')
+
+# distinct configfile bodies, cloned brickconfigs share them
+BODIES = 20
+# instances with health and usage samples
+MONITORED = 500
+
+
+def _progress(what, done):
+    sys.stdout.write('\rseeded %d %s' % (done, what))
+    sys.stdout.flush()
+
+
+def seed(conn, args, rand):
+    """Fill the database with the fleet, returning sample keys."""
+
+    brickconfig_uuids = []
+    for i in range(args.brickconfigs):
+        brickconfig_uuids.append(str(uuid.UUID(int=i + 1)))
+        conn.create_brickconfig({
+            'uuid': brickconfig_uuids[-1],
+            'name': 'app-%d' % i,
+            'version': 'v1.%d' % (i % 10),
+            'is_public': i % 4 == 0,
+            'tenant_id': 'tenant-%d' % (i % args.tenants),
+            'ports': [80, 443],
+            'environ': {'DEBUG': {'default': '0', 'weight': 1}},
+            'email_template': 'Your {{ brick.uuid }} is ready.'})
+
+    configfiles = []
+    for brickconfig_uuid in brickconfig_uuids:
+        for j in range(args.configfiles):
+            configfiles.append({
+                'uuid': fleet.random_uuid(rand),
+                'brickconfig_uuid': brickconfig_uuid,
+                'name': 'file-%d' % j,
+                'description': None,
+                'contents': ('RUN: setup %d\n' % rand.randrange(BODIES) +
+                             '# {{ brick.configuration.network }}\n' * 20)})
+    for start in range(0, len(configfiles), fleet.SEED_BATCH):
+        conn.create_configfiles(configfiles[start:start + fleet.SEED_BATCH])
+    _progress('brickconfigs and configfiles', len(brickconfig_uuids))
+    sys.stdout.write('\n')
+
+    pick_status = fleet.status_picker(rand)
+    now = datetime.datetime.utcnow()
+    for start in range(0, args.bricks, fleet.SEED_BATCH):
+        rows = []
+        for i in range(start, min(start + fleet.SEED_BATCH, args.bricks)):
+            rows.append({
+                'uuid': fleet.random_uuid(rand),
+                'brickconfig_uuid': rand.choice(brickconfig_uuids),
+                'instance_id': fleet.random_uuid(rand),
+                'tenant_id': 'tenant-%d' % (i % args.tenants),
+                'status': pick_status(),
+                'configuration': {'network': 'net-1',
+                                  'current_version': 'v1.0'},
+                'deployed_at': now,
+                'deleted': rand.random() < fleet.DELETED_RATIO})
+        conn.create_bricks(rows)
+        _progress('bricks', start + len(rows))
+    sys.stdout.write('\n')
+
+    live = list(conn.iter_bricks(columns=['uuid', 'instance_id',
+                                          'tenant_id']))
+    rand.shuffle(live)
+    monitored = [brick.instance_id for brick in live[:MONITORED]]
+    timestamp = int(time.time())
+    conn.update_brick_health('bench-host', [
+        {'instance_id': instance_id, 'domain_state': 'running',
+         'channel': True, 'occupant': True}
+        for instance_id in monitored])
+    for minute in range(10):
+        conn.add_brick_stats([
+            {'instance_id': instance_id,
+             'timestamp': timestamp - 60 * minute,
+             'cpu': rand.random() * 100, 'mem_used': 256.0,
+             'mem_total': 512.0}
+            for instance_id in monitored])
+    for brick in live[:10]:
+        conn.append_brick_log(brick.id, 'Step 1 : FROM ubuntu\n' * 50)
+
+    return {'live': live, 'brickconfig_uuids': brickconfig_uuids,
+            'configfiles': conn.get_configfile_list(limit=100),
+            'monitored': monitored}
+
+
+def _pool(items):
+    """Hand out items one at a time, for calls that use them up."""
+    items = list(items)
+    return lambda: items.pop()
+
+
+def initiate_initialized_bricks(conn):
+    """The queries of ConductorManager.initiate_initialized_bricks."""
+    with conn.unit_of_work():
+        for brick in conn.iter_bricks(filters={'status': states.INIT}):
+            conn.get_brickconfig(brick.brickconfig_uuid)
+            list(conn.get_configfile_list(
+                filters={'brickconfig_uuid': brick.brickconfig_uuid}))
+
+
+def set_bricks_versions(conn):
+    """The reads of ConductorManager.set_bricks_versions."""
+    with conn.unit_of_work():
+        list(conn.iter_bricks(columns=['brickconfig_uuid',
+                                       'configuration']))
+        conn.get_brickconfig_list()
+
+
+def benchmarks(conn, keys, repeat, rand):
+    """The calls to time, as (name, callable) pairs."""
+    live = keys['live']
+    brick = live[0]
+    configfile = keys['configfiles'][0]
+    brickconfig_uuid = keys['brickconfig_uuids'][0]
+    tenant_id = brick.tenant_id
+    instance_id = keys['monitored'][0]
+    # bricks the destructive calls use up, apart from the read samples
+    spare = _pool(b.id for b in live[1:1 + repeat * 2])
+    batch = [b.id for b in live[-100:]]
+    # archive and purge whatever is deleted by now
+    cutoff = datetime.datetime.utcnow() + datetime.timedelta(days=1)
+
+    def new_brick():
+        return {'uuid': fleet.random_uuid(rand),
+                'brickconfig_uuid': brickconfig_uuid,
+                'instance_id': fleet.random_uuid(rand),
+                'tenant_id': tenant_id, 'status': states.NOSTATE,
+                'configuration': {'network': 'net-1'}}
+
+    def new_brickconfig():
+        return {'uuid': fleet.random_uuid(rand),
+                'name': 'bench', 'version': 'v1.0', 'is_public': False,
+                'tenant_id': tenant_id, 'ports': [80],
+                'environ': {'DEBUG': {'default': '0', 'weight': 1}}}
+
+    def new_configfile():
+        return {'uuid': fleet.random_uuid(rand),
+                'brickconfig_uuid': brickconfig_uuid,
+                'name': 'bench', 'description': None,
+                'contents': 'RUN: bench %s' % fleet.random_uuid(rand)}
+
+    # brickconfigs and configfiles the destructive calls use up, made
+    # before any timing
+    spare_brickconfigs = _pool(conn.create_brickconfig(new_brickconfig()).id
+                               for _i in range(repeat))
+    spare_configfiles = _pool(conn.create_configfiles(
+        [new_configfile() for _i in range(repeat)]))
+    statuses = [{'status': states.DEPLOYDONE if i % 2 else
+                 states.DEPLOYFAIL} for i in range(len(batch))]
+
+    return [
+        # bricks
+        ('get_brick(id)', lambda: conn.get_brick(brick.id)),
+        ('get_brick(uuid, tenant_id)',
+         lambda: conn.get_brick(brick.uuid, tenant_id=tenant_id)),
+        ('get_brick(instance_id)',
+         lambda: conn.get_brick(None, instance_id=brick.instance_id)),
+        ('get_brick_list(limit=50)',
+         lambda: conn.get_brick_list(limit=50)),
+        ('get_brick_list(tenant_id, limit=50)',
+         lambda: conn.get_brick_list(filters={'tenant_id': tenant_id},
+                                     limit=50)),
+        ('get_brick_list(status=deploying)',
+         lambda: conn.get_brick_list(filters={'status': states.DEPLOYING})),
+        ('get_brick_list(limit=1000)+configuration',
+         lambda: [b.configuration
+                  for b in conn.get_brick_list(limit=1000)]),
+        ('get_brick_rows(id, limit=1)',
+         lambda: conn.get_brick_rows(['id'], limit=1)),
+        ('get_brick_columns(100, configuration)',
+         lambda: conn.get_brick_columns(batch, ['configuration'])),
+        ('iter_bricks(status=init)',
+         lambda: list(conn.iter_bricks(filters={'status': states.INIT}))),
+        ('iter_bricks(columns=instance_id)',
+         lambda: list(conn.iter_bricks(columns=['instance_id']))),
+        ('get_brick_counts(status)',
+         lambda: conn.get_brick_counts('status')),
+        ('get_brick_counts(tenant_id)',
+         lambda: conn.get_brick_counts('tenant_id')),
+        ('create_brick', lambda: conn.create_brick(new_brick())),
+        ('create_bricks(100)',
+         lambda: conn.create_bricks([new_brick() for _i in range(100)])),
+        ('update_brick(status)',
+         lambda: conn.update_brick(brick.id, {'status': states.DEPLOYDONE})),
+        ('update_bricks(100, status)',
+         lambda: conn.update_bricks(batch, {'status': states.DEPLOYDONE})),
+        ('update_bricks(100, status per brick)',
+         lambda: conn.update_bricks(batch, statuses)),
+        ('destroy_brick', lambda: conn.destroy_brick(spare())),
+        ('destroy_bricks(1)', lambda: conn.destroy_bricks([spare()])),
+        ('archive_deleted_bricks(batch=1000)',
+         lambda: conn.archive_deleted_bricks(cutoff, 1000, max_rows=1000)),
+        ('purge_shadow_bricks(batch=1000)',
+         lambda: conn.purge_shadow_bricks(cutoff, 1000, max_rows=1000)),
+        ('append_brick_log',
+         lambda: conn.append_brick_log(brick.id, 'Step 2 : RUN ls\n')),
+        ('get_brick_log(last=10)',
+         lambda: conn.get_brick_log(brick.id, last=10)),
+        # brickconfigs and configfiles
+        ('get_brickconfig(uuid)',
+         lambda: conn.get_brickconfig(brickconfig_uuid)),
+        ('get_brickconfig_list', lambda: conn.get_brickconfig_list()),
+        ('get_brickconfig_columns(ports)',
+         lambda: conn.get_brickconfig_columns(range(1, 101), ['ports'])),
+        ('create_brickconfig',
+         lambda: conn.create_brickconfig(new_brickconfig())),
+        ('update_brickconfig(version)',
+         lambda: conn.update_brickconfig(brickconfig_uuid,
+                                         {'version': 'v2.0'})),
+        ('destroy_brickconfig',
+         lambda: conn.destroy_brickconfig(spare_brickconfigs())),
+        ('get_configfile(uuid)',
+         lambda: conn.get_configfile(configfile.uuid)),
+        ('get_configfile_list(brickconfig_uuid)',
+         lambda: conn.get_configfile_list(
+             filters={'brickconfig_uuid': brickconfig_uuid})),
+        ('get_configfile_columns(100, contents)',
+         lambda: conn.get_configfile_columns(
+             [cf.id for cf in keys['configfiles']], ['contents'])),
+        ('create_configfile',
+         lambda: conn.create_configfile(new_configfile())),
+        ('create_configfiles(100)',
+         lambda: conn.create_configfiles(
+             [new_configfile() for _i in range(100)])),
+        ('update_configfile(contents)',
+         lambda: conn.update_configfile(
+             configfile.uuid,
+             {'contents': 'RUN: %s' % fleet.random_uuid(rand)})),
+        ('destroy_configfile',
+         lambda: conn.destroy_configfile(spare_configfiles())),
+        # health and usage
+        ('update_brick_health(500)',
+         lambda: conn.update_brick_health('bench-host', [
+             {'instance_id': i, 'domain_state': 'running',
+              'channel': True, 'occupant': True}
+             for i in keys['monitored']])),
+        ('get_brick_health', lambda: conn.get_brick_health(instance_id)),
+        ('add_brick_stats(500)',
+         lambda: conn.add_brick_stats([
+             {'instance_id': i, 'timestamp': int(time.time()), 'cpu': 1.0}
+             for i in keys['monitored']])),
+        ('get_brick_stats', lambda: conn.get_brick_stats(instance_id)),
+        # periodic tasks
+        ('task:initiate_initialized_bricks',
+         lambda: initiate_initialized_bricks(conn)),
+        ('task:set_bricks_versions', lambda: set_bricks_versions(conn)),
+    ]
+
+
+def run(conn, keys, repeat, rand):
+    results = {}
+    for name, call in benchmarks(conn, keys, repeat, rand):
+        timings = []
+        before = conn.get_query_metrics()['primary']['statements']
+        for _i in range(repeat):
+            start = time.time()
+            call()
+            timings.append((time.time() - start) * 1000)
+        statements = conn.get_query_metrics()['primary']['statements']
+        timings.sort()
+
+        results[name] = {
+            'median_ms': timings[len(timings) // 2],
+            'p95_ms': timings[max(int(len(timings) * 0.95) - 1, 0)],
+            'min_ms': timings[0],
+            'statements': (statements - before) / float(repeat)}
+        print('%-42s median %9.2fms  p95 %9.2fms  %7.1f statements' % (
+            name, results[name]['median_ms'], results[name]['p95_ms'],
+            results[name]['statements']))
+    return results
+
+
+def compare(results, fleet, path):
+    with open(path) as f:
+        baseline = json.load(f)
+    print('\n== against %s (%s) ==' % (path, baseline['commit']))
+    if baseline['fleet'] != fleet:
+        print('warning: seeded with a different fleet, %s' %
+              baseline['fleet'])
+    for name in sorted(results):
+        old = baseline['results'].get(name)
+        if old is None:
+            continue
+        new = results[name]
+        change = ((new['median_ms'] - old['median_ms']) /
+                  max(old['median_ms'], 0.001) * 100)
+        print('%-42s %9.2fms -> %9.2fms  %+7.1f%%  statements %.1f -> '
+              '%.1f' % (name, old['median_ms'], new['median_ms'], change,
+                        old['statements'], new['statements']))
+
+
+def _commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD']).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--connection',
+                        default='sqlite:////tmp/bricks-fleet-bench.sqlite',
+                        help='SQLAlchemy URL of the database to seed.')
+    parser.add_argument('--brickconfigs', type=int, default=200,
+                        help='Number of brickconfigs to seed.')
+    parser.add_argument('--configfiles', type=int, default=5,
+                        help='Number of configfiles per brickconfig.')
+    parser.add_argument('--bricks', type=int, default=50000,
+                        help='Number of bricks to seed.')
+    parser.add_argument('--tenants', type=int, default=2000,
+                        help='Number of tenants the bricks belong to.')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='Runs of each call.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the fleet generator.')
+    parser.add_argument('--output',
+                        help='Write the results to this JSON file.')
+    parser.add_argument('--compare',
+                        help='Compare against the results in this JSON '
+                             'file.')
+    args = parser.parse_args()
+
+    CONF([], project='bricks', default_config_files=[])
+    CONF.set_override('connection', args.connection, group='database')
+    # time the queries rather than the cache in front of them
+    CONF.set_override('brick_counts_ttl', 0, group='database')
+    engine = db_session.get_engine()
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    conn = dbapi.get_instance()
+
+    # the values of the timed calls carry on from those of the fleet
+    rand = random.Random(args.seed)
+    keys = seed(conn, args, rand)
+    results = run(conn, keys, args.repeat, rand)
+
+    fleet = {'brickconfigs': args.brickconfigs,
+             'configfiles': args.configfiles,
+             'bricks': args.bricks,
+             'tenants': args.tenants,
+             'seed': args.seed}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'commit': _commit(),
+                       'dialect': engine.dialect.name,
+                       'fleet': fleet,
+                       'repeat': args.repeat,
+                       'results': results}, f, indent=2, sort_keys=True)
+    if args.compare:
+        compare(results, fleet, args.compare)
+
+
+if __name__ == '__main__':
+    main()
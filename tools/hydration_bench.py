@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Benchmark turning brick rows into Brick objects.
+
+Builds a list of brick rows shaped like the ones sqlalchemy returns for a
+brick list, then times hydrating them one object at a time through the
+field setters (_from_db_object) against the bulk path objectify_list
+uses (_from_db_objects). The bulk path is also timed reading the
+configuration of every brick, as a list scan does, and with rows whose
+configuration was decoded as the rows were read rather than on access.
+
+    python tools/hydration_bench.py --rows 10000
+    python tools/hydration_bench.py --codec json
+"""
+
+import argparse
+import datetime
+import time
+import uuid
+
+from oslo.config import cfg
+
+from bricks.common import json_codec
+from bricks.common import states
+from bricks.db.sqlalchemy import models
+from bricks import objects
+
+CONF = cfg.CONF
+
+
+def make_rows(count, decoded=False):
+    """Brick rows, with the configuration as read from the database, or
+    already decoded.
+    """
+    now = datetime.datetime.utcnow()
+    configuration = json_codec.RawJSON(json_codec.dumps(
+        {'network': 'net-1', 'keypair': 'key-1', 'flavour': 'm1.small',
+         'name': 'brick', 'current_version': '1.0'}))
+    if decoded:
+        configuration = json_codec.loads(configuration)
+    rows = []
+    for i in range(count):
+        row = models.Brick()
+        row.update({
+            'id': i + 1,
+            'uuid': unicode(uuid.uuid4()),
+            'brickconfig_uuid': unicode(uuid.UUID(int=i % 50)),
+            'instance_id': unicode(uuid.uuid4()),
+            'tenant_id': u'tenant-%d' % (i % 2000),
+            'status': unicode(states.DEPLOYDONE),
+            'configuration': configuration,
+            'deployed_at': now,
+            'created_at': now,
+            'updated_at': now})
+        rows.append(row)
+    return rows
+
+
+def per_object(rows):
+    return [objects.Brick._from_db_object(objects.Brick(), row)
+            for row in rows]
+
+
+def bulk(rows):
+    return objects.Brick._from_db_objects(rows)
+
+
+def bulk_scan(rows):
+    bricks = objects.Brick._from_db_objects(rows)
+    for brick in bricks:
+        brick.configuration
+    return bricks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=10000,
+                        help='Number of brick rows to hydrate.')
+    parser.add_argument('--repeat', type=int, default=10,
+                        help='Runs of each path.')
+    parser.add_argument('--codec', choices=json_codec.CODECS,
+                        help='JSON codec, defaults to that of '
+                             '[database]json_codec.')
+    args = parser.parse_args()
+
+    CONF([], project='bricks', default_config_files=[])
+    CONF.set_override('json_codec', args.codec, group='database')
+    print('json codec: %s' % json_codec.codec().__name__)
+
+    rows = make_rows(args.rows)
+    decoded_rows = make_rows(args.rows, decoded=True)
+    for name, hydrate, hydrated in [
+            ('_from_db_object', per_object, rows),
+            ('_from_db_objects', bulk, rows),
+            ('_from_db_objects+read', bulk_scan, rows),
+            ('_from_db_objects+read, decoded rows', bulk_scan,
+             decoded_rows)]:
+        timings = []
+        for _i in range(args.repeat):
+            start = time.time()
+            hydrate(hydrated)
+            timings.append((time.time() - start) * 1000)
+        timings.sort()
+        print('%-36s median %8.2fms  min %8.2fms  (%d rows)' % (
+            name, timings[len(timings) // 2], timings[0], args.rows))
+
+if __name__ == '__main__':
+    main()
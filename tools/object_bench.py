@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+Benchmark the memory and speed of Brick objects.
+
+Hydrates a fleet of Brick objects from shared rows, so that the memory
+measured is the overhead of the objects themselves rather than of their
+values, then times the dict-like API the conductor and API use on them.
+
+    python tools/object_bench.py --objects 100000
+"""
+
+import argparse
+import datetime
+import gc
+import resource
+import time
+
+from bricks.common import states
+from bricks import objects
+
+ROW = {
+    'id': 1,
+    'uuid': u'1be26c0b-03f2-4d2e-ae87-c02d7f33c123',
+    'brickconfig_uuid': u'1be26c0b-03f2-4d2e-ae87-c02d7f33c781',
+    'instance_id': u'1be26c0b-03f2-4d2e-ae87-c02d7f33c999',
+    'tenant_id': u'tenant-1',
+    'status': unicode(states.DEPLOYDONE),
+    'configuration': {'network': 'net-1'},
+    'deployed_at': None,
+    'created_at': datetime.datetime.utcnow(),
+    'updated_at': None,
+}
+
+
+def rss_bytes():
+    with open('/proc/self/statm') as statm:
+        pages = int(statm.read().split()[1])
+    return pages * resource.getpagesize()
+
+
+def timed(name, count, fn):
+    start = time.time()
+    fn()
+    elapsed = time.time() - start
+    print('%-24s %8.2fms  %6.2fus per object' % (
+        name, elapsed * 1000, elapsed * 1e6 / count))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--objects', type=int, default=100000,
+                        help='Number of Brick objects to build.')
+    args = parser.parse_args()
+    count = args.objects
+
+    gc.collect()
+    gc.disable()
+    before = rss_bytes()
+    bricks = [objects.Brick._from_db_object(objects.Brick(), ROW)
+              for _i in xrange(count)]
+    used = rss_bytes() - before
+    gc.enable()
+    print('%d bricks: %.1fMiB resident, %d bytes per object' % (
+        count, used / 1048576.0, used // count))
+
+    timed('hydrate', count, lambda: [
+        objects.Brick._from_db_object(objects.Brick(), ROW)
+        for _i in xrange(count)])
+    timed('get field', count, lambda: [brick.status for brick in bricks])
+    timed('__getitem__', count, lambda: [brick['status']
+                                         for brick in bricks])
+    timed('set field', count, lambda: [
+        setattr(brick, 'status', states.DEPLOYING) for brick in bricks])
+    timed('obj_get_changes', count, lambda: [brick.obj_get_changes()
+                                             for brick in bricks])
+    timed('obj_reset_changes', count, lambda: [brick.obj_reset_changes()
+                                               for brick in bricks])
+    timed('iteritems', count, lambda: [list(brick.iteritems())
+                                       for brick in bricks])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Benchmark round-tripping objects through the RPC serializer.
+
+Times BricksObjectSerializer turning a brick list into primitives and
+back, the way a brick list crosses RPC between the conductor and the
+API, along with the JSON encoding of the message in between.
+
+    python tools/serializer_bench.py --bricks 10000
+"""
+
+import argparse
+import datetime
+import time
+
+from bricks.common import states
+from bricks import objects
+from bricks.objects import base
+from bricks.openstack.common import context
+from bricks.openstack.common import jsonutils
+
+
+def make_bricks(count):
+    now = datetime.datetime.utcnow()
+    bricks = []
+    for i in range(count):
+        brick = objects.Brick()
+        brick.id = i + 1
+        brick.uuid = u'1be26c0b-03f2-4d2e-ae87-%012d' % i
+        brick.brickconfig_uuid = u'1be26c0b-03f2-4d2e-ae87-c02d7f33c781'
+        brick.instance_id = u'2be26c0b-03f2-4d2e-ae87-%012d' % i
+        brick.tenant_id = u'tenant-%d' % (i % 2000)
+        brick.status = states.DEPLOYDONE
+        brick.configuration = {'network': 'net-1'}
+        brick.deployed_at = now
+        brick.created_at = now
+        brick.obj_reset_changes()
+        bricks.append(brick)
+    return bricks
+
+
+def timed(name, repeat, fn):
+    timings = []
+    for _i in range(repeat):
+        start = time.time()
+        result = fn()
+        timings.append((time.time() - start) * 1000)
+    timings.sort()
+    print('%-12s median %8.2fms  min %8.2fms' % (
+        name, timings[len(timings) // 2], timings[0]))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--bricks', type=int, default=10000,
+                        help='Number of bricks in the list.')
+    parser.add_argument('--repeat', type=int, default=10,
+                        help='Runs of each step.')
+    args = parser.parse_args()
+
+    ser = base.BricksObjectSerializer()
+    ctxt = context.get_admin_context()
+    bricks = make_bricks(args.bricks)
+
+    primitive = timed('serialize', args.repeat,
+                      lambda: ser.serialize_entity(ctxt, bricks))
+    message = timed('dumps', args.repeat,
+                    lambda: jsonutils.dumps(primitive))
+    primitive = timed('loads', args.repeat,
+                      lambda: jsonutils.loads(message))
+    timed('deserialize', args.repeat,
+          lambda: ser.deserialize_entity(ctxt, primitive))
+
+
+if __name__ == '__main__':
+    main()